@@ -1,29 +1,50 @@
 # backend/app.py
 
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 import os
 import shutil
-import uuid
-from deepgram import DeepgramClient, PrerecordedOptions
 from dotenv import load_dotenv
 from fastapi.responses import StreamingResponse
 import json
 import asyncio
+import logging
 from enum import Enum
 import time
-import subprocess
 import requests
-import re
+from concurrent.futures import ThreadPoolExecutor
+import yt_dlp
+import httpx
 from youtube_transcript_api import YouTubeTranscriptApi
 from youtube_transcript_api.formatters import TextFormatter
 from supadata import Supadata, SupadataError
-import PyPDF2
 import numpy as np
-from sentence_transformers import SentenceTransformer
 from auth import router as auth_router
+import llm_gateway
+from response_cache import response_cache
+from embedding_service import EMBEDDING_MODEL_NAME, embedding_service
+from vector_index import VectorIndex, vector_index_store
+from map_reduce import bounded_map, map_reduce, reduce_to_fit
+from chunking import chunk_spans, chunk_texts
+from history_compactor import history_compactor
+from context_budget import ContextBudget, count_message_tokens, count_tokens, tokenizer_name, truncate_to_tokens
+from transcript_store import transcript_store
+from document_store import document_id, document_store
+from sse_stream import DONE_FRAME, SSE_HEADERS, stream_relay
+from json_stream import JsonArrayStream
+import http_pool
+from subtitle_parser import parse_subtitles
+from upload_spool import UploadSpool, file_size, iter_file, spool_multipart_file
+from audio_cache import audio_cache
+import pdf_extractor
+from pdf_extractor import PDFExtractionError
+import deepgram_client
+from audio_segmenter import AudioProcessingError, container_extension, split_on_silence, transcode_stream, transcode_stats
+import tempfile
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI()
 
@@ -59,18 +80,9 @@ if not SUPADATA_API_KEY:
 supadata = Supadata(api_key=SUPADATA_API_KEY)
 
 
-# Initialize Groq client if API key is available
-groq_client = None
-if GROQ_API_KEY:
-    try:
-        from groq import Groq
-        groq_client = Groq(api_key=GROQ_API_KEY)
-    except ImportError:
-        print("Warning: Groq package not installed. Install with: pip install groq")
-
-# Create uploads directory if it doesn't exist
-UPLOAD_DIR = "uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+# All Groq calls go through the shared async gateway in llm_gateway.py
+if GROQ_API_KEY and not llm_gateway.is_available():
+    print("Warning: Groq package not installed. Install with: pip install groq")
 
 # Define the teaching modes
 class TeachingMode(str, Enum):
@@ -80,16 +92,51 @@ class TeachingMode(str, Enum):
     COLLEGE = "college"
     PHD = "phd"
 
+@app.on_event("shutdown")
+async def shutdown_llm_gateway():
+    await llm_gateway.close()
+    await http_pool.close()
+    pdf_extractor.close()
+
 # endpoint returns hello world
 @app.get("/")
 async def root():
     return {"message": "Hello World"}
 
-async def transcribe_audio(file_path):
+@app.get("/api/metrics")
+async def metrics():
+    """
+    Runtime counters for the caching and batching layers
+    """
+    return {
+        "response_cache": response_cache.stats(),
+        "embeddings": embedding_service.stats(),
+        "transcript_store": transcript_store.stats(),
+        "vector_indexes": vector_index_store.stats(),
+        "documents": document_store.stats(),
+        "audio_cache": audio_cache.stats(),
+        "audio_transcode": transcode_stats(),
+        "chat_history": history_compactor.stats(),
+        "chat_streams": stream_relay.stats(),
+    }
+
+# Downmix uploads to 16kHz mono Opus with ffmpeg before sending them to Deepgram
+AUDIO_TRANSCODE = os.getenv("AUDIO_TRANSCODE", "true").lower() == "true"
+
+async def transcribe_audio(audio_file, content_type, on_progress=None):
+    """
+    Transcribe an audio file object with Deepgram, streaming it straight from
+    memory or its spooled temp file. on_progress(bytes_read, total_bytes) is
+    called as chunks of the upload are consumed.
+
+    With AUDIO_TRANSCODE the upload is piped through ffmpeg on the way out,
+    falling back to the original bytes if ffmpeg is missing or cannot read it.
+    """
     if not DEEPGRAM_API_KEY:
         # Return mock transcription with timestamps for development
         return {
             "transcript": "This is a mock transcription for development purposes. Please set the DEEPGRAM_API_KEY environment variable for actual transcription.",
+            "sentences": [],
             "words": [
                 {"word": "This", "start": 0.0, "end": 0.3},
                 {"word": "is", "start": 0.3, "end": 0.5},
@@ -101,102 +148,275 @@ async def transcribe_audio(file_path):
                 {"word": "purposes", "start": 2.5, "end": 3.1}
             ]
         }
-    
-    try:
-        
-        
-        # Initialize the Deepgram client
-        deepgram = DeepgramClient(DEEPGRAM_API_KEY)
-        
-        # Open the audio file
-        with open(file_path, 'rb') as buffer_data:
-            # Configure transcription options
-            payload = { 'buffer': buffer_data }
-            options = PrerecordedOptions(
-                smart_format=True,
-                model="nova-2",
-                language="en-US",
-                utterances=True,  # Enable utterances to get paragraph breaks
-                detect_topics=True,  # Detect topic changes
-                punctuate=True,
-                diarize=True,  # Speaker diarization if multiple speakers
-            )
-            
-            # Send the audio to Deepgram and get the response
-            response = deepgram.listen.prerecorded.v("1").transcribe_file(payload, options)
-            
-            # Extract full transcript
-            transcript = response.results.channels[0].alternatives[0].transcript
-            
-            # Extract sentences with timestamps            
-            paragraphs = response.results.channels[0].alternatives[0].paragraphs.paragraphs
 
-            
-            # Format word timestamps
-            formatted_sentences = []
-
-            for paragraph in paragraphs:
-                for sentence in paragraph.sentences:
-                    formatted_sentences.append({
-                        "text": sentence.text,
-                        "start": sentence.start,
-                        "end": sentence.end
-                    })
-            
-            return {
-                "transcript": transcript,
-                "sentences": formatted_sentences
-            }
+    total_bytes = file_size(audio_file)
+
+    async def body():
+        bytes_sent = 0
+        async for chunk in iter_file(audio_file):
+            bytes_sent += len(chunk)
+            if on_progress:
+                on_progress(bytes_sent, total_bytes)
+            yield chunk
+
+    try:
+        if AUDIO_TRANSCODE:
+            start_position = audio_file.tell()
+            try:
+                return await deepgram_client.transcribe(transcode_stream(body()), "audio/ogg")
+            except AudioProcessingError as e:
+                logger.warning("Transcode failed, sending original audio: %s", e)
+                audio_file.seek(start_position)
+        return await deepgram_client.transcribe(body(), content_type, content_length=total_bytes)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error during transcription: {str(e)}")
+        # The cause tells callers that retry (chunked mode) whether another attempt can help
+        raise HTTPException(status_code=500, detail=f"Error during transcription: {str(e)}") from e
+
+# Chunked mode: how many segments are transcribed at once, and retries per segment
+CHUNKED_TRANSCRIBE_CONCURRENCY = int(os.getenv("CHUNKED_TRANSCRIBE_CONCURRENCY", "4"))
+CHUNKED_TRANSCRIBE_RETRIES = int(os.getenv("CHUNKED_TRANSCRIBE_RETRIES", "2"))
+
+def is_transient_transcription_error(error):
+    """
+    True when a failed transcription may succeed if retried: timeouts,
+    dropped connections, rate limiting and Deepgram server errors
+    """
+    cause = error.__cause__
+    if isinstance(cause, deepgram_client.DeepgramError):
+        return cause.retryable
+    return isinstance(cause, (httpx.TransportError, asyncio.TimeoutError))
+
+async def transcribe_audio_chunked(audio_file, content_type, filename=None, on_segment=None):
+    """
+    Transcribe long audio by splitting it at silences with ffmpeg, transcribing
+    the segments concurrently (each retried on its own) and stitching the
+    sentence timestamps back into one timeline.
+    on_segment(segments_done, segments_total) is called as segments finish.
+    """
+    if not DEEPGRAM_API_KEY:
+        return await transcribe_audio(audio_file, content_type)
+
+    extension = container_extension(filename, content_type)
+    with tempfile.TemporaryDirectory(prefix="transcribe_") as workdir:
+        # ffmpeg needs a seekable file to cut segments from
+        source_path = os.path.join(workdir, f"source{extension}")
+        def write_source():
+            with open(source_path, "wb") as source:
+                shutil.copyfileobj(audio_file, source)
+        await asyncio.to_thread(write_source)
+
+        try:
+            segments = await split_on_silence(source_path, workdir)
+        except AudioProcessingError as e:
+            raise HTTPException(status_code=500, detail=f"Error splitting audio: {str(e)}")
+
+        finished = {"count": 0}
+        async def transcribe_segment(_, segment):
+            for attempt in range(CHUNKED_TRANSCRIBE_RETRIES + 1):
+                try:
+                    with open(segment.path, "rb") as segment_file:
+                        result = await transcribe_audio(segment_file, content_type)
+                    break
+                except HTTPException as e:
+                    if attempt == CHUNKED_TRANSCRIBE_RETRIES or not is_transient_transcription_error(e):
+                        raise
+                    await asyncio.sleep(2 ** attempt)
+            finished["count"] += 1
+            if on_segment:
+                on_segment(finished["count"], len(segments))
+            return result
+
+        results, _ = await bounded_map(segments, transcribe_segment, CHUNKED_TRANSCRIBE_CONCURRENCY)
+
+    return stitch_segment_transcripts(segments, results)
+
+def stitch_segment_transcripts(segments, results):
+    """
+    Merge per-segment transcriptions, shifting sentence times by each segment's offset
+    """
+    transcript_parts = []
+    sentences = []
+    for segment, result in zip(segments, results):
+        if result["transcript"].strip():
+            transcript_parts.append(result["transcript"].strip())
+        for sentence in result["sentences"]:
+            sentences.append({
+                "text": sentence["text"],
+                "start": round(sentence["start"] + segment.offset, 3),
+                "end": round(sentence["end"] + segment.offset, 3)
+            })
+    return {
+        "transcript": " ".join(transcript_parts),
+        "sentences": sentences
+    }
+
+def audio_cache_key(digest, chunked):
+    """
+    Audio cache key for a recording. Chunked transcriptions split sentences at
+    segment boundaries, so each mode's results are cached separately.
+    """
+    return f"{digest}-chunked" if chunked else digest
 
 @app.post("/api/transcribe")
-async def transcribe_audio_endpoint(file: UploadFile = File(...)):
+async def transcribe_audio_endpoint(request: Request, chunked: bool = False):
     """
-    Endpoint to upload an audio file and get its transcription
+    Endpoint to upload an audio file (multipart form field "file") and get
+    its transcription. With ?chunked=true long recordings are split and
+    transcribed in parallel.
     """
-    # Validate file type (optional)
-    if not file.content_type.startswith('audio/'):
-        raise HTTPException(status_code=400, detail="File must be an audio file")
-    
-    # Create a unique filename
-    file_extension = os.path.splitext(file.filename)[1]
-    unique_filename = f"{uuid.uuid4()}{file_extension}"
-    file_path = os.path.join(UPLOAD_DIR, unique_filename)
-    
-    # Save uploaded file
+    # The form is parsed here rather than by FastAPI so the audio is hashed while it is spooled
     try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error saving file: {str(e)}")
-    
-    # Transcribe the audio
+        spool, filename, content_type = await spool_multipart_file(
+            request.stream(), request.headers.get("content-type", "")
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid upload: {str(e)}")
+
     try:
-        transcription_result = await transcribe_audio(file_path)
-        
-        # Return the transcription with timestamps
-        return {
-            "success": True,
-            "filename": file.filename,
-            "transcription": transcription_result["transcript"],
-            "sentences": transcription_result["sentences"]
-        }
-    except Exception as e:
-        # Clean up the file in case of error
-        if os.path.exists(file_path):
-            os.remove(file_path)
-        raise e
+        # Validate file type (optional)
+        if not (content_type or "").startswith('audio/'):
+            raise HTTPException(status_code=400, detail="File must be an audio file")
+
+        # Re-uploads of the same recording are answered from the audio cache
+        cache_key = audio_cache_key(spool.digest, chunked)
+        transcription_result = audio_cache.get(cache_key, spool.size)
+        if transcription_result is None:
+            if chunked:
+                transcription_result = await transcribe_audio_chunked(spool.file, content_type, filename)
+            else:
+                # Stream the spooled upload to Deepgram directly instead of copying it into uploads/ first
+                transcription_result = await transcribe_audio(spool.file, content_type)
+            if DEEPGRAM_API_KEY:
+                audio_cache.put(cache_key, transcription_result)
+    finally:
+        spool.close()
+
+    # Return the transcription with timestamps
+    return {
+        "success": True,
+        "filename": filename,
+        "transcription": transcription_result["transcript"],
+        "sentences": transcription_result["sentences"]
+    }
+
+# Minimum time between progress events on the streaming transcription endpoint
+TRANSCRIBE_PROGRESS_INTERVAL_SECONDS = float(os.getenv("TRANSCRIBE_PROGRESS_INTERVAL_SECONDS", "0.25"))
+
+@app.post("/api/transcribe-stream")
+async def transcribe_stream_endpoint(request: Request, chunked: bool = False):
+    """
+    Transcribe audio sent as the raw request body (Content-Type audio/*),
+    reporting upload and transcription progress as server-sent events.
+    The body is never written to uploads/; it stays in memory up to
+    UPLOAD_SPOOL_MAX_MEMORY_BYTES and spills to a temp file beyond that.
+    """
+    content_type = request.headers.get("content-type", "")
+    if not content_type.startswith("audio/"):
+        raise HTTPException(status_code=400, detail="Request body must be audio")
+
+    return StreamingResponse(
+        generate_transcription_events(request, content_type, chunked),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+async def generate_transcription_events(request: Request, content_type: str, chunked: bool = False):
+    """
+    Receive the upload, transcribe it and yield progress, result and completion events
+    """
+    filename = request.headers.get("x-filename", "upload")
+    expected_bytes = int(request.headers.get("content-length") or 0) or None
+    interval = TRANSCRIBE_PROGRESS_INTERVAL_SECONDS
+
+    def progress_event(stage, done_bytes, total_bytes, **extra):
+        return f"data: {json.dumps({'type': 'progress', 'stage': stage, 'bytes': done_bytes, 'total_bytes': total_bytes, **extra})}\n\n"
+
+    spool = UploadSpool()
+    transcription = None
+    try:
+        # Upload stage
+        last_report = 0.0
+        async for chunk in request.stream():
+            if not chunk:
+                continue
+            await spool.write(chunk)
+            now = time.perf_counter()
+            if now - last_report >= interval:
+                last_report = now
+                yield progress_event("upload", spool.size, expected_bytes)
+        yield progress_event("upload", spool.size, spool.size)
+
+        if spool.size == 0:
+            yield f"data: {json.dumps({'error': 'Empty upload'})}\n\n"
+            return
+
+        # The content hash was computed while spooling; a known recording skips Deepgram
+        cache_key = audio_cache_key(spool.digest, chunked)
+        cached = audio_cache.get(cache_key, spool.size)
+        if cached is not None:
+            yield f"data: {json.dumps({'type': 'result', 'success': True, 'cached': True, 'filename': filename, 'transcription': cached['transcript'], 'sentences': cached['sentences']})}\n\n"
+            yield f"data: {json.dumps({'done': True})}\n\n"
+            return
+
+        # Transcription stage
+        spool.rewind()
+        sent = {"bytes": 0}
+        segments = {"done": 0, "total": None}
+        if chunked:
+            transcription = asyncio.ensure_future(transcribe_audio_chunked(
+                spool.file,
+                content_type,
+                filename,
+                on_segment=lambda done, total: segments.update(done=done, total=total)
+            ))
+        else:
+            transcription = asyncio.ensure_future(transcribe_audio(
+                spool.file,
+                content_type,
+                on_progress=lambda bytes_sent, _: sent.update(bytes=bytes_sent)
+            ))
+        while not transcription.done():
+            await asyncio.wait({transcription}, timeout=interval)
+            if chunked:
+                yield progress_event("transcribe", spool.size, spool.size, segments_done=segments["done"], segments_total=segments["total"])
+            else:
+                stage = "transcribe" if sent["bytes"] < spool.size else "processing"
+                yield progress_event(stage, sent["bytes"], spool.size)
+
+        result = transcription.result()
+        if DEEPGRAM_API_KEY:
+            audio_cache.put(cache_key, result)
+        yield f"data: {json.dumps({'type': 'result', 'success': True, 'cached': False, 'filename': filename, 'transcription': result['transcript'], 'sentences': result['sentences']})}\n\n"
+        yield f"data: {json.dumps({'done': True})}\n\n"
+    except HTTPException as e:
+        yield f"data: {json.dumps({'error': e.detail})}\n\n"
     finally:
-        # Clean up after processing (optional - you might want to keep files)
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        if transcription is not None and not transcription.done():
+            transcription.cancel()
+        spool.close()
+
+# Prompt template versions are part of the response cache key.
+# Bump the matching version whenever a prompt or its parsing changes.
+SUMMARY_PROMPT_VERSION = "summary-v1"
+QUIZ_PROMPT_VERSION = "quiz-v1"
+CONCEPT_DETECTIVE_PROMPT_VERSION = "concept-detective-v1"
+
+TRUNCATION_MARKER = "\n[Transcript truncated due to length...]"
 
-def generate_bullet_summary(transcript):
+def fit_to_prompt(render_messages, model, max_tokens, text):
+    """
+    Render chat messages around as much of `text` as fits the model's context
+    window. render_messages(text) must build the complete message list.
+    """
+    budget = ContextBudget(model, max_tokens)
+    budget.reserve_messages(render_messages(""))
+    return render_messages(budget.fit(text, marker=TRUNCATION_MARKER))
+
+async def generate_bullet_summary(transcript):
     """
     Generate a bullet-point summary of a transcript using Groq API
     """
-    if not GROQ_API_KEY or not groq_client:
+    if not llm_gateway.is_available():
         # Return mock summary if Groq API is not available
         return """
         • This is a mock summary for development purposes.
@@ -206,8 +426,42 @@ def generate_bullet_summary(transcript):
         """
         
     try:
-        # Define the prompt for generating bullet point summaries
-        prompt = f"""
+        summary, _ = await summarize_long_text(transcript)
+        return summary
+    except Exception as e:
+        return f"Error generating summary: {str(e)}"
+
+SUMMARY_MODEL = "llama-3.3-70b-versatile"  # Using newer Llama 3.3 70B model
+SUMMARY_TEMPERATURE = 0.3  # Lower temperature for more focused responses
+SUMMARY_MAX_TOKENS = 1024
+
+def summary_cache_key(transcript):
+    return response_cache.make_key(
+        kind="summary",
+        version=SUMMARY_PROMPT_VERSION,
+        model=SUMMARY_MODEL,
+        temperature=SUMMARY_TEMPERATURE,
+        transcript=transcript,
+    )
+
+def summary_input_budget():
+    """
+    Tokens of text that fit in one summary prompt
+    """
+    budget = ContextBudget(SUMMARY_MODEL, SUMMARY_MAX_TOKENS)
+    budget.reserve_messages(render_summary_messages(""))
+    return budget.remaining
+
+def build_summary_messages(transcript):
+    """
+    Chat messages asking for a bullet-point summary of the transcript,
+    trimmed to the summary model's context window
+    """
+    return fit_to_prompt(render_summary_messages, SUMMARY_MODEL, SUMMARY_MAX_TOKENS, transcript)
+
+def render_summary_messages(transcript):
+    # Define the prompt for generating bullet point summaries
+    prompt = f"""
         Create a concise and well-organized bullet point summary for the provided transcript.
 
         - Identify key points and important details from the transcript.
@@ -255,90 +509,385 @@ def generate_bullet_summary(transcript):
         {transcript}
         """
         
-        # Call Groq API to generate the summary
-        response = groq_client.chat.completions.create(
-            model="llama-3.3-70b-versatile",  # Using newer Llama 3.3 70B model
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that creates concise, well-organized bullet point summaries."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3,  # Lower temperature for more focused responses
-            max_tokens=1024
-        )
-        
-        # Extract the summary from the response
-        summary = response.choices[0].message.content
-        return summary
-    except Exception as e:
-        return f"Error generating summary: {str(e)}"
+    return [
+        {"role": "system", "content": "You are a helpful assistant that creates concise, well-organized bullet point summaries."},
+        {"role": "user", "content": prompt}
+    ]
+
+async def create_bullet_summary(transcript):
+    """
+    Generate a bullet-point summary, served from the response cache when the
+    same transcript was summarized before. Raises on API errors.
+    """
+    cache_key = summary_cache_key(transcript)
+    cached_summary = await response_cache.get(cache_key)
+    if cached_summary is not None:
+        return cached_summary
+
+    # Call Groq API to generate the summary
+    summary = await llm_gateway.chat_completion(
+        model=SUMMARY_MODEL,
+        messages=build_summary_messages(transcript),
+        temperature=SUMMARY_TEMPERATURE,
+        max_tokens=SUMMARY_MAX_TOKENS
+    )
+
+    await response_cache.set(cache_key, summary)
+    return summary
+
+async def stream_bullet_summary(transcript):
+    """
+    Stream a bullet-point summary as content deltas. A cached summary is
+    yielded whole; a freshly generated one is cached once it completes.
+    """
+    cache_key = summary_cache_key(transcript)
+    cached_summary = await response_cache.get(cache_key)
+    if cached_summary is not None:
+        yield cached_summary
+        return
+
+    parts = []
+    async for delta in llm_gateway.stream_chat_completion(
+        model=SUMMARY_MODEL,
+        messages=build_summary_messages(transcript),
+        temperature=SUMMARY_TEMPERATURE,
+        max_tokens=SUMMARY_MAX_TOKENS
+    ):
+        parts.append(delta)
+        yield delta
+
+    await response_cache.set(cache_key, "".join(parts))
+
+# Texts longer than this are summarized section by section (map) and then combined (reduce)
+MAP_REDUCE_THRESHOLD_TOKENS = int(os.getenv("MAP_REDUCE_THRESHOLD_TOKENS", "4000"))
+MAP_REDUCE_SECTION_TOKENS = int(os.getenv("MAP_REDUCE_SECTION_TOKENS", "3000"))
+MAP_REDUCE_CONCURRENCY = int(os.getenv("MAP_REDUCE_CONCURRENCY", "4"))
+# Model for the per-section notes (map step); the reduce step uses SUMMARY_MODEL
+MAP_REDUCE_SECTION_MODEL = os.getenv("MAP_REDUCE_SECTION_MODEL", SUMMARY_MODEL)
+MAP_REDUCE_SECTION_MAX_TOKENS = 1024
+
+async def summarize_section(section, section_index, section_count):
+    """
+    Turn one section of a long transcript into detailed bullet notes (map step).
+    Served from the response cache when available. Raises on API errors.
+    """
+    cache_key = response_cache.make_key(
+        kind="summary_section",
+        version=SUMMARY_PROMPT_VERSION,
+        model=MAP_REDUCE_SECTION_MODEL,
+        temperature=SUMMARY_TEMPERATURE,
+        transcript=section,
+    )
+    cached_notes = await response_cache.get(cache_key)
+    if cached_notes is not None:
+        return cached_notes
+
+    prompt = f"""
+        The following is part {section_index + 1} of {section_count} of a longer transcript.
+
+        Write detailed bullet-point notes covering every topic, argument, example and
+        conclusion in this part. Do not add an introduction or a closing remark; these
+        notes will be merged with the notes for the other parts.
+
+        Transcript part:
+        {section}
+        """
+
+    notes = await llm_gateway.chat_completion(
+        model=MAP_REDUCE_SECTION_MODEL,
+        messages=[
+            {"role": "system", "content": "You are a helpful assistant that takes thorough, well-organized notes."},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=SUMMARY_TEMPERATURE,
+        max_tokens=MAP_REDUCE_SECTION_MAX_TOKENS
+    )
+
+    await response_cache.set(cache_key, notes)
+    return notes
+
+def split_sections(text) -> List[str]:
+    """
+    Split a long text at sentence boundaries into sections for the map step
+    """
+    return chunk_texts(text, chunk_spans(text, max_tokens=MAP_REDUCE_SECTION_TOKENS, count_tokens=count_tokens))
+
+async def map_transcript_sections(text) -> Tuple[List[str], Dict[str, float]]:
+    """
+    Split a long text into sections and take notes on all of them concurrently
+    """
+    sections = split_sections(text)
+    return await bounded_map(
+        sections,
+        lambda i, section: summarize_section(section, i, len(sections)),
+        max_concurrency=MAP_REDUCE_CONCURRENCY,
+    )
+
+async def summarize_long_text(text) -> Tuple[str, Dict[str, float]]:
+    """
+    Summarize text of any length. Short texts take a single pass; longer ones
+    are split with split_sections, each section is summarized concurrently and
+    the partial notes are reduced into the final bullet summary, over as many
+    levels as it takes for them to fit one prompt.
+
+    Returns (summary, timings) with per-stage wall-clock times in milliseconds.
+    """
+    started = time.perf_counter()
+    if count_tokens(text) <= MAP_REDUCE_THRESHOLD_TOKENS:
+        summary = await create_bullet_summary(text)
+        return summary, {"total_ms": round((time.perf_counter() - started) * 1000.0, 1)}
+
+    sections = split_sections(text)
+
+    async def reduce_notes(notes):
+        return await create_bullet_summary(await reduce_section_notes(notes))
+
+    summary, timings = await map_reduce(
+        sections,
+        lambda i, section: summarize_section(section, i, len(sections)),
+        reduce_notes,
+        max_concurrency=MAP_REDUCE_CONCURRENCY,
+    )
+    timings["total_ms"] = round((time.perf_counter() - started) * 1000.0, 1)
+    return summary, timings
+
+def combine_section_notes(notes):
+    """
+    Join per-section notes into the input of the reduce step
+    """
+    return "\n\n".join(
+        f"## Part {i + 1} of {len(notes)}\n{part}" for i, part in enumerate(notes)
+    )
+
+# Tokens combine_section_notes adds per part (header and separator)
+SECTION_NOTES_OVERHEAD_TOKENS = 16
+
+async def reduce_section_notes(notes) -> str:
+    """
+    Return the input of the final reduce step. When the combined notes are
+    too long for one summary prompt, groups of notes that fit are summarized
+    first, recursively, rather than letting fit_to_prompt cut them.
+    """
+    notes, _ = await reduce_to_fit(
+        notes,
+        lambda group: create_bullet_summary(combine_section_notes(group)),
+        combine_section_notes,
+        max_tokens=summary_input_budget(),
+        count_tokens=count_tokens,
+        max_concurrency=MAP_REDUCE_CONCURRENCY,
+        part_overhead_tokens=SECTION_NOTES_OVERHEAD_TOKENS,
+    )
+    return combine_section_notes(notes)
+
+# Minimum time between progress events on the streaming endpoints
+PROGRESS_EVENT_INTERVAL_SECONDS = float(os.getenv("PROGRESS_EVENT_INTERVAL_SECONDS", "0.25"))
+
+async def summary_stream_events(text):
+    """
+    Summarize text of any length, yielding event payloads as work progresses:
+    section progress while a long text is mapped, then summary_delta events
+    as the final summary streams, then the complete summary.
+    """
+    if count_tokens(text) <= MAP_REDUCE_THRESHOLD_TOKENS:
+        reduce_input = text
+    else:
+        sections = split_sections(text)
+        finished = {"count": 0}
+
+        async def map_section(i, section):
+            notes = await summarize_section(section, i, len(sections))
+            finished["count"] += 1
+            return notes
+
+        mapping = asyncio.ensure_future(bounded_map(sections, map_section, MAP_REDUCE_CONCURRENCY))
+        try:
+            while not mapping.done():
+                await asyncio.wait({mapping}, timeout=PROGRESS_EVENT_INTERVAL_SECONDS)
+                yield {"type": "progress", "stage": "summarize", "sections_done": finished["count"], "sections_total": len(sections)}
+        finally:
+            mapping.cancel()
+        notes, _ = mapping.result()
+        reduce_input = await reduce_section_notes(notes)
+
+    parts = []
+    async for delta in stream_bullet_summary(reduce_input):
+        parts.append(delta)
+        yield {"type": "summary_delta", "delta": delta}
+    yield {"type": "summary", "summary": "".join(parts)}
+
+# Transcripts are registered once and then referenced by ID, so chat turns and
+# generation requests do not resend the full text
+class DocumentRequest(BaseModel):
+    text: str
+
+class DocumentResponse(BaseModel):
+    document_id: str
+    chars: int
+
+@app.post("/api/documents", response_model=DocumentResponse)
+async def register_document(request: DocumentRequest):
+    """
+    Store a transcript or document and return its content-hash ID.
+    Registering the same text again returns the same ID.
+    """
+    if not request.text:
+        raise HTTPException(status_code=400, detail="Text is required")
+    doc_id = await asyncio.to_thread(document_store.put, request.text)
+    return {"document_id": doc_id, "chars": len(request.text)}
+
+@app.get("/api/documents/{doc_id}")
+async def get_document(doc_id: str):
+    """
+    Return the text of a registered document
+    """
+    text = await asyncio.to_thread(document_store.get, doc_id)
+    if text is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return {"document_id": doc_id, "text": text}
+
+class DocumentReference(BaseModel):
+    # Either the ID from /api/documents or the transcript text itself
+    document_id: Optional[str] = None
+    transcript: Optional[str] = None
+
+async def resolve_document(request: DocumentReference) -> Tuple[str, str]:
+    """
+    Return (document ID, text) for the document a request refers to.
+    Inline transcripts are registered so later requests can use the ID.
+    """
+    if request.document_id:
+        text = await asyncio.to_thread(document_store.get, request.document_id)
+        if text is None:
+            raise HTTPException(status_code=404, detail="Unknown or expired document_id, register the transcript again")
+        return request.document_id, text
+    if not request.transcript:
+        raise HTTPException(status_code=400, detail="Transcript or document_id is required")
+    # Hashing, compressing and writing a long transcript would block the event loop
+    return await asyncio.to_thread(document_store.put, request.transcript), request.transcript
 
 # Define request and response models for the summary endpoint
-class SummaryRequest(BaseModel):
-    transcript: str
+class SummaryRequest(DocumentReference):
+    pass
 
 class SummaryResponse(BaseModel):
     success: bool
     summary: str
+    timings: Optional[Dict[str, float]] = None
 
 @app.post("/api/generate-summary", response_model=SummaryResponse)
 async def generate_summary_endpoint(request: SummaryRequest):
     """
     Endpoint to generate a bullet-point summary from a transcript
     """
+    _, transcript = await resolve_document(request)
     try:
-        if not request.transcript:
-            raise HTTPException(status_code=400, detail="Transcript is required")
-            
-        # Truncate very long transcripts to prevent API limits
-        # Most LLM APIs have context limits
-        max_length = 16000  # Adjust based on the model's context window
-        truncated_transcript = request.transcript[:max_length]
-        if len(request.transcript) > max_length:
-            truncated_transcript += "\n[Transcript truncated due to length...]"
-            
-        summary = generate_bullet_summary(truncated_transcript)
+        if not llm_gateway.is_available():
+            return {
+                "success": True,
+                "summary": await generate_bullet_summary(transcript)
+            }
+
+        # Long transcripts are summarized in full with a parallel map-reduce pass
+        try:
+            summary, timings = await summarize_long_text(transcript)
+        except Exception as e:
+            summary, timings = f"Error generating summary: {str(e)}", None
         
         return {
             "success": True,
-            "summary": summary
+            "summary": summary,
+            "timings": timings
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating summary: {str(e)}")
 
-def generate_quiz_questions(transcript, num_questions=5):
+@app.post("/api/generate-summary-stream")
+async def generate_summary_stream_endpoint(request: SummaryRequest):
     """
-    Generate multiple-choice quiz questions based on a transcript using Groq API
+    Generate a summary like /api/generate-summary, but stream the markdown
+    as server-sent events while it is written. Shares the response cache
+    with the other summary paths, so a cached summary arrives at once.
     """
-    if not GROQ_API_KEY or not groq_client:
-        # Return mock questions if Groq API is not available
-        return [
-            {
-                "question": "What is the main topic of this mock transcript?",
-                "options": [
-                    "Artificial Intelligence",
-                    "Machine Learning",
-                    "Data Science",
-                    "Mock Data"
-                ],
-                "correct_answer": 3
-            },
-            {
-                "question": "This is a mock question because...",
-                "options": [
-                    "The GROQ_API_KEY is not set",
-                    "The transcript is too short",
-                    "The system is in testing mode",
-                    "All of the above"
-                ],
-                "correct_answer": 0
-            }
-        ]
-    
+    _, transcript = await resolve_document(request)
+    return StreamingResponse(
+        generate_summary_events(transcript),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+async def generate_summary_events(transcript):
+    """
+    Yield section progress for long texts, summary_delta events as the
+    summary streams, then the complete summary
+    """
+    started = time.perf_counter()
+
+    def elapsed_ms():
+        return round((time.perf_counter() - started) * 1000.0, 1)
+
     try:
+        if not llm_gateway.is_available():
+            summary = await generate_bullet_summary(transcript)
+            yield f"data: {json.dumps({'type': 'summary_delta', 'delta': summary})}\n\n"
+            yield f"data: {json.dumps({'type': 'summary', 'summary': summary})}\n\n"
+        else:
+            first_delta_ms = None
+            async for payload in summary_stream_events(transcript):
+                if payload["type"] == "summary":
+                    payload["first_delta_ms"] = first_delta_ms
+                elif payload["type"] == "summary_delta" and first_delta_ms is None:
+                    first_delta_ms = elapsed_ms()
+                yield f"data: {json.dumps(payload)}\n\n"
+    except Exception as e:
+        yield f"data: {json.dumps({'type': 'error', 'stage': 'summary', 'error': str(e)})}\n\n"
+    yield f"data: {json.dumps({'done': True, 'elapsed_ms': elapsed_ms()})}\n\n"
+
+QUIZ_MODEL = "llama-3.3-70b-versatile"  # Using newer Llama 3.3 70B model
+QUIZ_TEMPERATURE = 0.5  # Slightly higher temperature for creative questions
+QUIZ_MAX_TOKENS = 2048
+
+MOCK_QUIZ_QUESTIONS = [
+    {
+        "question": "What is the main topic of this mock transcript?",
+        "options": [
+            "Artificial Intelligence",
+            "Machine Learning",
+            "Data Science",
+            "Mock Data"
+        ],
+        "correct_answer": 3
+    },
+    {
+        "question": "This is a mock question because...",
+        "options": [
+            "The GROQ_API_KEY is not set",
+            "The transcript is too short",
+            "The system is in testing mode",
+            "All of the above"
+        ],
+        "correct_answer": 0
+    }
+]
+
+def quiz_cache_key(transcript, num_questions):
+    return response_cache.make_key(
+        kind="quiz",
+        version=QUIZ_PROMPT_VERSION,
+        model=QUIZ_MODEL,
+        temperature=QUIZ_TEMPERATURE,
+        num_questions=num_questions,
+        transcript=transcript,
+    )
+
+def build_quiz_messages(transcript, num_questions):
+    """
+    Quiz prompt messages, with the transcript trimmed to the context window
+    """
+    def render_messages(transcript):
         # Define the prompt for generating quiz questions
         prompt = f"""
         Create a quiz with {num_questions} multiple-choice questions based on the following transcript.
-        
+    
         Requirements:
         - Generate exactly {num_questions} questions (or fewer if the transcript is very short)
         - Each question should have 4 options (A, B, C, D)
@@ -346,12 +895,12 @@ def generate_quiz_questions(transcript, num_questions=5):
         - Questions should test understanding of key concepts from the transcript
         - Questions should vary in difficulty (some easy, some moderate, some challenging)
         - Include the correct answer index (0-based, where 0 is the first option)
-        
+    
         Format your response as a JSON array of objects, with each object having:
         - "question": The question text
         - "options": An array of 4 possible answers
         - "correct_answer": The index (0-3) of the correct answer
-        
+    
         Example format:
         [
           {{
@@ -361,30 +910,60 @@ def generate_quiz_questions(transcript, num_questions=5):
           }},
           ...more questions...
         ]
-        
+    
         Important: Your entire response should be valid JSON that can be parsed. Do not include any explanatory text outside the JSON array.
-        
+    
         Transcript:
         {transcript}
         """
-        
+        return [
+            {"role": "system", "content": "You are a helpful assistant that creates educational quizzes. You always respond with valid JSON."},
+            {"role": "user", "content": prompt}
+        ]
+
+    return fit_to_prompt(render_messages, QUIZ_MODEL, QUIZ_MAX_TOKENS, transcript)
+
+def validate_quiz_question(q):
+    """
+    Return the question with a usable correct_answer, or None if it is incomplete
+    """
+    if not isinstance(q, dict) or "question" not in q or "options" not in q or "correct_answer" not in q:
+        return None
+
+    # Ensure correct_answer is an integer
+    if isinstance(q["correct_answer"], str) and q["correct_answer"].isdigit():
+        q["correct_answer"] = int(q["correct_answer"])
+
+    # Ensure correct_answer is within valid range
+    if not isinstance(q["correct_answer"], int) or q["correct_answer"] < 0 or q["correct_answer"] >= len(q["options"]):
+        # Default to first option if invalid
+        q["correct_answer"] = 0
+    return q
+
+async def generate_quiz_questions(transcript, num_questions=5):
+    """
+    Generate multiple-choice quiz questions based on a transcript using Groq API
+    """
+    if not llm_gateway.is_available():
+        # Return mock questions if Groq API is not available
+        return MOCK_QUIZ_QUESTIONS
+
+    cache_key = quiz_cache_key(transcript, num_questions)
+    cached_questions = await response_cache.get(cache_key)
+    if cached_questions is not None:
+        return cached_questions
+
+    try:
         # Call Groq API to generate the questions
-        response = groq_client.chat.completions.create(
-            model="llama-3.3-70b-versatile",  # Using newer Llama 3.3 70B model
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that creates educational quizzes. You always respond with valid JSON."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.5,  # Slightly higher temperature for creative questions
-            max_tokens=2048,
+        quiz_text = await llm_gateway.chat_completion(
+            model=QUIZ_MODEL,
+            messages=build_quiz_messages(transcript, num_questions),
+            temperature=QUIZ_TEMPERATURE,
+            max_tokens=QUIZ_MAX_TOKENS,
             response_format={"type": "json_object"}  # Ensure JSON response
         )
         
-        # Extract the quiz from the response
-        quiz_text = response.choices[0].message.content
-        
         # Parse JSON
-        import json
         try:
             quiz_data = json.loads(quiz_text)
             # If the JSON is wrapped in an object, extract the questions array
@@ -404,20 +983,10 @@ def generate_quiz_questions(transcript, num_questions=5):
                     raise ValueError("Could not extract questions array from response")
                 
             # Validate and clean up questions
-            validated_questions = []
-            for q in questions:
-                if "question" in q and "options" in q and "correct_answer" in q:
-                    # Ensure correct_answer is an integer
-                    if isinstance(q["correct_answer"], str) and q["correct_answer"].isdigit():
-                        q["correct_answer"] = int(q["correct_answer"])
-                    
-                    # Ensure correct_answer is within valid range
-                    if not isinstance(q["correct_answer"], int) or q["correct_answer"] < 0 or q["correct_answer"] >= len(q["options"]):
-                        # Default to first option if invalid
-                        q["correct_answer"] = 0
-                        
-                    validated_questions.append(q)
+            validated_questions = [q for q in map(validate_quiz_question, questions) if q is not None]
             
+            if validated_questions:
+                await response_cache.set(cache_key, validated_questions)
             return validated_questions
         except Exception as e:
             return [{"question": f"Error parsing quiz questions: {str(e)}",
@@ -429,9 +998,64 @@ def generate_quiz_questions(transcript, num_questions=5):
                 "options": ["Error", "Try again", "Check API key", "Contact support"],
                 "correct_answer": 2}]
 
+async def stream_quiz_questions(transcript, num_questions=5):
+    """
+    Yield validated quiz questions one at a time, each as soon as the model
+    has finished writing it.
+
+    The model's output is parsed incrementally (see json_stream), so the
+    first question arrives long before the rest are generated. Shares its
+    prompt and response cache with generate_quiz_questions; a cached quiz is
+    yielded at once. Raises if generation fails before any question is done.
+    If the output holds no parseable question (prose, or an array cut off
+    before its first object), falls back to generate_quiz_questions.
+    """
+    if not llm_gateway.is_available():
+        for question in MOCK_QUIZ_QUESTIONS:
+            yield question
+        return
+
+    cache_key = quiz_cache_key(transcript, num_questions)
+    cached_questions = await response_cache.get(cache_key)
+    if cached_questions is not None:
+        for question in cached_questions:
+            yield question
+        return
+
+    # JSON mode cannot be streamed, so the array is picked out of the text as it arrives
+    parser = JsonArrayStream()
+    questions = []
+    stream = llm_gateway.stream_chat_completion(
+        model=QUIZ_MODEL,
+        messages=build_quiz_messages(transcript, num_questions),
+        temperature=QUIZ_TEMPERATURE,
+        max_tokens=QUIZ_MAX_TOKENS
+    )
+    try:
+        async for delta in stream:
+            for element in parser.feed(delta):
+                question = validate_quiz_question(element)
+                if question is None:
+                    continue
+                questions.append(question)
+                yield question
+            if parser.finished or len(questions) >= num_questions:
+                break
+    finally:
+        await stream.aclose()
+
+    if not questions:
+        # JSON mode guarantees a parseable answer, at the cost of waiting for all of it
+        for question in await generate_quiz_questions(transcript, num_questions):
+            yield question
+        return
+
+    # A quiz cut off by max_tokens is not cached
+    if parser.finished or len(questions) >= num_questions:
+        await response_cache.set(cache_key, questions)
+
 # Define request and response models for the quiz endpoint
-class QuizRequest(BaseModel):
-    transcript: str
+class QuizRequest(DocumentReference):
     num_questions: Optional[int] = 5
 
 class QuizQuestion(BaseModel):
@@ -448,20 +1072,13 @@ async def generate_quiz_endpoint(request: QuizRequest):
     """
     Endpoint to generate a quiz with multiple-choice questions from a transcript
     """
+    _, transcript = await resolve_document(request)
     try:
-        if not request.transcript:
-            raise HTTPException(status_code=400, detail="Transcript is required")
-            
-        # Truncate very long transcripts to prevent API limits
-        max_length = 16000  # Adjust based on the model's context window
-        truncated_transcript = request.transcript[:max_length]
-        if len(request.transcript) > max_length:
-            truncated_transcript += "\n[Transcript truncated due to length...]"
-            
         # Ensure num_questions is within reasonable limits
         num_questions = max(1, min(request.num_questions, 10))
         
-        questions = generate_quiz_questions(truncated_transcript, num_questions)
+        # Long transcripts are trimmed to the model's context window
+        questions = await generate_quiz_questions(transcript, num_questions)
         
         return {
             "success": True,
@@ -470,50 +1087,170 @@ async def generate_quiz_endpoint(request: QuizRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating quiz: {str(e)}")
 
+@app.post("/api/generate-quiz-stream")
+async def generate_quiz_stream_endpoint(request: QuizRequest):
+    """
+    Generate a quiz like /api/generate-quiz, but stream each question as a
+    server-sent event as soon as it has been generated
+    """
+    _, transcript = await resolve_document(request)
+    num_questions = max(1, min(request.num_questions or 5, 10))
+    return StreamingResponse(
+        generate_quiz_events(transcript, num_questions),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+async def generate_quiz_events(transcript, num_questions):
+    """
+    Yield a question event per quiz question, then the full quiz
+    """
+    started = time.perf_counter()
+
+    def elapsed_ms():
+        return round((time.perf_counter() - started) * 1000.0, 1)
+
+    questions = []
+    try:
+        async for question in stream_quiz_questions(transcript, num_questions):
+            yield f"data: {json.dumps({'type': 'question', 'index': len(questions), 'question': question, 'elapsed_ms': elapsed_ms()})}\n\n"
+            questions.append(question)
+        yield f"data: {json.dumps({'type': 'quiz', 'questions': questions})}\n\n"
+    except Exception as e:
+        yield f"data: {json.dumps({'type': 'error', 'stage': 'quiz', 'error': str(e)})}\n\n"
+    yield f"data: {json.dumps({'done': True, 'elapsed_ms': elapsed_ms()})}\n\n"
+
 # Define the chat message model
 class ChatMessage(BaseModel):
     role: str  # "user" or "assistant"
     content: str
 
 # Define the chat request model
-class ChatRequest(BaseModel):
+class ChatRequest(DocumentReference):
     messages: List[ChatMessage]
-    transcript: str
+    # "auto" retrieves relevant chunks only when the transcript exceeds the budget,
+    # "retrieval" always does, "prefix" sends as much of the start as fits
+    context_mode: Optional[str] = "auto"
+    context_token_budget: Optional[int] = None
 
 # Define the chat response model
 class ChatResponse(BaseModel):
     message: str
+
+CHAT_MODEL = "llama-3.3-70b-versatile"  # Using Llama 3.3 70B model
+CHAT_MAX_TOKENS = 1024
+# Upper bound on transcript context tokens in the chat endpoints
+CHAT_CONTEXT_TOKEN_BUDGET = int(os.getenv("CHAT_CONTEXT_TOKEN_BUDGET", "2000"))
+# Upper bound on candidate chunks considered per question
+CHAT_RETRIEVAL_MAX_CANDIDATES = int(os.getenv("CHAT_RETRIEVAL_MAX_CANDIDATES", "64"))
+
+async def build_chat_messages(
+    request: ChatRequest,
+    doc_id: str,
+    transcript: str,
+    system_prompt: str,
+    context_intro: str,
+) -> List[Dict[str, str]]:
+    """
+    Assemble the system prompt, transcript context and conversation history
+    for a chat turn so that together they fit the chat model's context window.
+
+    Older turns are replaced by a running summary (see history_compactor), so
+    the prompt stays bounded however long the session runs. The transcript
+    context gets up to CHAT_CONTEXT_TOKEN_BUDGET tokens (or the request's own
+    budget) but never more than half of the room left when the history needs
+    the rest. History that still does not fit loses its oldest turns first.
+    """
+    history = [{"role": msg.role, "content": msg.content} for msg in request.messages]
+    summary, history = await history_compactor.compact(history)
+    budget = ContextBudget(CHAT_MODEL, CHAT_MAX_TOKENS)
+    budget.reserve(system_prompt)
+    budget.reserve(context_intro)
+    summary_messages = []
+    if summary:
+        summary_messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"})
+        budget.reserve_messages(summary_messages)
+
+    history_tokens = count_message_tokens(history)
+    context_allowance = min(
+        request.context_token_budget or CHAT_CONTEXT_TOKEN_BUDGET,
+        budget.remaining - min(history_tokens, budget.remaining // 2),
+    )
+    transcript_context = await build_transcript_context(request, transcript, context_allowance, doc_id)
+    transcript_context = budget.fit(transcript_context, max_tokens=context_allowance)
+
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "system", "content": f"{context_intro}\n\n{transcript_context}"},
+        *summary_messages,
+        *budget.fit_messages(history),
+    ]
+
+async def build_transcript_context(request: ChatRequest, transcript: str, token_budget: int, doc_id: Optional[str] = None) -> str:
+    """
+    Select the transcript text to send with a chat turn.
+
+    Transcripts within `token_budget` are sent whole. Longer ones are replaced
+    by the chunks most relevant to the latest user message that fit within
+    the budget, kept in transcript order.
+    """
+    mode = request.context_mode or "auto"
+    budget = token_budget
+
+    if budget <= 0:
+        return ""
+    if mode == "prefix":
+        return truncate_to_tokens(transcript, budget, TRUNCATION_MARKER)
+    if mode == "auto" and count_tokens(transcript) <= budget:
+        return transcript
+
+    question = next(
+        (msg.content for msg in reversed(request.messages) if msg.role == "user"),
+        request.messages[-1].content,
+    )
+    index = await get_document_index(transcript, doc_id)
+    if len(index) == 0:
+        return ""
+
+    query_embedding = await get_embeddings([question])
+    candidates = index.search(query_embedding, min(len(index), CHAT_RETRIEVAL_MAX_CANDIDATES))
+
+    selected = []
+    used_tokens = 0
+    for chunk_index, _ in candidates:
+        chunk_tokens = count_tokens(index.chunks[chunk_index])
+        if used_tokens + chunk_tokens > budget:
+            if selected:
+                break
+            continue
+        selected.append(chunk_index)
+        used_tokens += chunk_tokens
+
+    selected.sort()
+    excerpts = "\n[...]\n".join(index.chunks[i] for i in selected)
+    return f"[Excerpts from the transcript most relevant to the latest question]\n\n{excerpts}"
     
 @app.post("/api/chat", response_model=ChatResponse)
 async def chat_with_tutor(request: ChatRequest):
     """
     Endpoint to chat with an AI tutor about the transcript content
     """
+    doc_id, transcript = await resolve_document(request)
     try:
-        if not request.transcript:
-            raise HTTPException(status_code=400, detail="Transcript is required")
-        
         if not request.messages or len(request.messages) == 0:
             raise HTTPException(status_code=400, detail="At least one message is required")
         
-        # Format messages for the LLM
-        formatted_messages = [
-            {"role": "system", "content": get_socratic_system_prompt()},
-        ]
-        
-        # Add transcript context
-        context_message = {
-            "role": "system", 
-            "content": f"The following is the transcript of a lecture that the student wants to discuss:\n\n{request.transcript[:8000]}"
-        }
-        formatted_messages.append(context_message)
-        
-        # Add conversation history
-        for msg in request.messages:
-            formatted_messages.append({"role": msg.role, "content": msg.content})
+        # System prompt, transcript context and history, fitted to the context window
+        formatted_messages = await build_chat_messages(
+            request,
+            doc_id,
+            transcript,
+            get_socratic_system_prompt(),
+            "The following is the transcript of a lecture that the student wants to discuss:"
+        )
         
         # Generate response
-        response = generate_socratic_response(formatted_messages)
+        response = await generate_socratic_response(formatted_messages)
         
         return {
             "message": response
@@ -539,63 +1276,49 @@ def get_socratic_system_prompt():
     Keep your responses concise (3-5 sentences maximum) unless elaboration is necessary to explain a complex concept.
     """
 
-def generate_socratic_response(messages):
+async def generate_socratic_response(messages):
     """
     Generate a Socratic tutor response using the Groq API
     """
-    if not GROQ_API_KEY or not groq_client:
+    if not llm_gateway.is_available():
         # Return mock response if Groq API is not available
         return "I'd be happy to discuss this lecture with you! What specific aspect would you like to explore further? Is there a concept you find particularly challenging or interesting? (Note: This is a mock response as the Groq API key is not configured)"
     
     try:
         # Call Groq API to generate the response
-        response = groq_client.chat.completions.create(
-            model="llama-3.3-70b-versatile",  # Using Llama 3.3 70B model
+        return await llm_gateway.chat_completion(
+            model=CHAT_MODEL,
             messages=messages,
             temperature=0.7,  # Slightly higher temperature for more varied responses
-            max_tokens=1024
+            max_tokens=CHAT_MAX_TOKENS
         )
-        
-        # Extract the response text
-        return response.choices[0].message.content
     except Exception as e:
         return f"I'm having trouble processing your question. Could you try asking in a different way? (Error: {str(e)})"
 
 @app.post("/api/chat-stream")
-async def chat_with_tutor_stream(request: ChatRequest):
+async def chat_with_tutor_stream(request: ChatRequest, http_request: Request):
     """
     Endpoint to chat with an AI tutor with streaming response
     """
+    doc_id, transcript = await resolve_document(request)
     try:
-        if not request.transcript:
-            raise HTTPException(status_code=400, detail="Transcript is required")
-        
         if not request.messages or len(request.messages) == 0:
             raise HTTPException(status_code=400, detail="At least one message is required")
         
-        # Always use the Socratic tutor system prompt
-        system_prompt = get_socratic_system_prompt()
-        
-        # Format messages for the LLM
-        formatted_messages = [
-            {"role": "system", "content": system_prompt},
-        ]
-        
-        # Add transcript context
-        context_message = {
-            "role": "system", 
-            "content": f"The following is the transcript of a lecture that the student wants to discuss:\n\n{request.transcript[:8000]}"
-        }
-        formatted_messages.append(context_message)
-        
-        # Add conversation history
-        for msg in request.messages:
-            formatted_messages.append({"role": msg.role, "content": msg.content})
+        # System prompt, transcript context and history, fitted to the context window
+        formatted_messages = await build_chat_messages(
+            request,
+            doc_id,
+            transcript,
+            get_socratic_system_prompt(),
+            "The following is the transcript of a lecture that the student wants to discuss:"
+        )
         
-        # Return streaming response
+        # Return streaming response; generation stops if the client disconnects
         return StreamingResponse(
-            generate_streaming_response(formatted_messages),
-            media_type="text/event-stream"
+            generate_streaming_response(formatted_messages, http_request),
+            media_type="text/event-stream",
+            headers=SSE_HEADERS
         )
     
     except Exception as e:
@@ -604,120 +1327,109 @@ async def chat_with_tutor_stream(request: ChatRequest):
             yield f"data: {error_json}\n\n"
         return StreamingResponse(error_stream(), media_type="text/event-stream")
 
-async def generate_streaming_response(messages):
+async def mock_streaming_response():
     """
-    Generate a streaming response from the model - optimized version
+    Mock streaming for development without API key
     """
-    if not GROQ_API_KEY or not groq_client:
-        # Mock streaming for development without API key
-        mock_response = "I'd be happy to discuss this lecture with you! What specific aspect would you like to explore further? Is there a concept you find particularly challenging or interesting? (Note: This is a mock response as the Groq API key is not configured)"
-        
-        # Stream by blocks for better performance
-        blocks = mock_response.split('. ')
-        for block in blocks:
-            yield f"data: {json.dumps({'chunk': block + '. '})}\n\n"
-            await asyncio.sleep(0.08)  # Slightly shorter delay
-        
-        yield f"data: {json.dumps({'done': True})}\n\n"
-        return
-    
-    try:
-        # Call Groq API with streaming enabled
-        stream = groq_client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
+    mock_response = "I'd be happy to discuss this lecture with you! What specific aspect would you like to explore further? Is there a concept you find particularly challenging or interesting? (Note: This is a mock response as the Groq API key is not configured)"
+
+    # Stream by blocks for better performance
+    for block in mock_response.split('. '):
+        yield block + '. '
+        await asyncio.sleep(0.08)  # Slightly shorter delay
+
+async def generate_streaming_response(messages, request: Optional[Request] = None):
+    """
+    Stream the model's answer as server-sent events.
+
+    The upstream stream is relayed by stream_relay, which coalesces deltas
+    into frames (the first token is sent at once), sends heartbeat comments
+    while the model is silent, and cancels the upstream request as soon as
+    `request` reports that the client has gone.
+    """
+    if llm_gateway.is_available():
+        stream = llm_gateway.stream_chat_completion(
+            model=CHAT_MODEL,
             messages=messages,
             temperature=0.7,
-            max_tokens=1024,
-            stream=True
+            max_tokens=CHAT_MAX_TOKENS
         )
-        
-        # Buffer for more efficient sending
-        buffer = ""
-        last_send_time = time.time()
-        
-        # Stream the response chunks with optimized buffering
-        for chunk in stream:
-            content = chunk.choices[0].delta.content
-            if content:
-                buffer += content
-                
-                # Send in larger chunks or after a time threshold to reduce overhead
-                current_time = time.time()
-                should_send = (
-                    len(buffer) >= 10 or  # Send if buffer has 10+ characters
-                    '.' in buffer or      # Send if buffer contains sentence end
-                    '\n' in buffer or     # Send if buffer contains newline
-                    current_time - last_send_time > 0.2  # Send at least every 200ms
-                )
-                
-                if should_send and buffer:
-                    yield f"data: {json.dumps({'chunk': buffer})}\n\n"
-                    buffer = ""
-                    last_send_time = current_time
-        
-        # Send any remaining buffered content
-        if buffer:
-            yield f"data: {json.dumps({'chunk': buffer})}\n\n"
-        
+    else:
+        stream = mock_streaming_response()
+
+    try:
+        # Frames are coalesced and pre-encoded by the relay
+        async for frame in stream_relay.frames(stream, request, CHAT_MAX_TOKENS):
+            yield frame
+
+        # Nobody is left to read the rest
+        if request is not None and await request.is_disconnected():
+            return
+
         # Signal completion
-        yield f"data: {json.dumps({'done': True})}\n\n"
-    
+        yield DONE_FRAME
+
     except Exception as e:
         error_message = f"I'm having trouble processing your question. Could you try asking in a different way? (Error: {str(e)})"
         yield f"data: {json.dumps({'chunk': error_message})}\n\n"
         yield f"data: {json.dumps({'done': True})}\n\n"
 
-def get_youtube_subtitles(youtube_url):
+# yt-dlp runs in-process on a small pool of warm worker threads
+YTDLP_MAX_WORKERS = int(os.getenv("YTDLP_MAX_WORKERS", "4"))
+YOUTUBE_SUBTITLE_TIMEOUT_SECONDS = float(os.getenv("YOUTUBE_SUBTITLE_TIMEOUT_SECONDS", "30"))
+ytdlp_executor = ThreadPoolExecutor(max_workers=YTDLP_MAX_WORKERS, thread_name_prefix="yt-dlp")
+
+YTDLP_OPTIONS = {
+    "skip_download": True,
+    "writeautomaticsub": True,
+    "subtitlesformat": "vtt",
+    "quiet": True,
+    "no_warnings": True,
+}
+
+def extract_youtube_info(youtube_url):
+    """
+    Read video metadata and caption tracks with the yt-dlp library (no download)
+    """
+    with yt_dlp.YoutubeDL(YTDLP_OPTIONS) as ydl:
+        return ydl.extract_info(youtube_url, download=False)
+
+async def get_youtube_subtitles(youtube_url, timeout=YOUTUBE_SUBTITLE_TIMEOUT_SECONDS):
     try:
-        # Run yt-dlp to get subtitles using subprocess
-        result = subprocess.run(
-            ["python", "-m", "yt_dlp", "--write-auto-sub", "--sub-format", "vtt", 
-             "--skip-download", "--print-json", youtube_url],
-            capture_output=True, text=True
-        )
-        
-        if result.returncode != 0:
-            return f"Error: Failed to fetch subtitles. {result.stderr}"
+        # Run yt-dlp in-process, off the event loop, bounded by the timeout
+        loop = asyncio.get_running_loop()
+        try:
+            json_output = await asyncio.wait_for(
+                loop.run_in_executor(ytdlp_executor, extract_youtube_info, youtube_url),
+                timeout=timeout
+            )
+        except asyncio.TimeoutError:
+            return "Error: Timed out fetching subtitles"
+        except yt_dlp.utils.DownloadError as e:
+            return f"Error: Failed to fetch subtitles. {str(e)}"
         
-        json_output = json.loads(result.stdout)
         subtitles = json_output.get("automatic_captions", {}).get("en", [])
         
         if not subtitles:
             return "Error: No subtitles found for this video"
         
-        subtitle_url = subtitles[-1]["url"]
+        # Prefer the VTT track; fall back to the last listed format
+        vtt_tracks = [track for track in subtitles if track.get("ext") == "vtt"]
+        subtitle_url = (vtt_tracks or subtitles)[-1]["url"]
         
-        response = requests.get(subtitle_url)
+        try:
+            response = await http_pool.get_http_client().get(subtitle_url, timeout=timeout)
+        except httpx.TimeoutException:
+            return "Error: Timed out downloading subtitles"
         if response.status_code != 200:
             return f"Error: Failed to download subtitles. Status code: {response.status_code}"
         
-        vtt_content = response.text
-        
-        # Extract text content (no timestamps)
-        pattern = r'\d{2}:\d{2}:\d{2}\.\d{3} --> \d{2}:\d{2}:\d{2}\.\d{3}\s*(.*?)(?=\n\d{2}:\d{2}:\d{2}\.\d{3}|$)'
-        matches = re.findall(pattern, vtt_content, re.DOTALL)
-        
-        # Process and clean up the text with better formatting
-        full_transcript = ""
-        current_sentence = ""
-        
-        for text in matches:
-            # Clean up the text
-            clean_text = re.sub(r'align:(?:start|middle|end)\s+position:\d+%\s*', '', text)
-            clean_text = re.sub(r'<[^>]+>', '', clean_text)
-            clean_text = re.sub(r'\s+', ' ', clean_text).strip()
-            
-            if clean_text:
-                # Ensure proper spacing between segments
-                if full_transcript and not full_transcript.endswith(('.', '!', '?', '"', "'", ':', ';')):
-                    full_transcript += " "
-                full_transcript += clean_text
-        
-        # Improve sentence capitalization and spacing
-        full_transcript = re.sub(r'([.!?])\s*([a-z])', lambda m: m.group(1) + ' ' + m.group(2).upper(), full_transcript)
+        # Single pass over the VTT: strip markup, drop rolling-caption repeats, keep timings
+        full_transcript, cues = parse_subtitles(response.text)
         
         return {
-            "full_transcript": full_transcript.strip(),
+            "full_transcript": full_transcript,
+            "sentences": [{"text": cue.text, "start": cue.start, "end": cue.end} for cue in cues],
             "video_title": json_output.get("title", "YouTube Video")
         }
         
@@ -742,12 +1454,30 @@ async def youtube_transcribe_endpoint(request: YouTubeRequest):
         if not request.youtube_url.startswith(("https://www.youtube.com/", "https://youtu.be/")):
             raise HTTPException(status_code=400, detail="Invalid YouTube URL format")
             
+        # Serve transcripts fetched before by any ingest path
+        video_id = extract_video_id(request.youtube_url)
+        stored = transcript_store.get(video_id) if video_id else None
+        if stored:
+            return {
+                "success": True,
+                "video_title": stored["title"] or "YouTube Video",
+                "transcription": stored["transcript"]
+            }
+
         # Get the transcription
-        result = get_youtube_subtitles(request.youtube_url)
+        result = await get_youtube_subtitles(request.youtube_url)
         
         # Check if the result is an error message
         if isinstance(result, str) and result.startswith("Error"):
             raise HTTPException(status_code=500, detail=result)
+
+        if video_id and result.get("full_transcript"):
+            transcript_store.put(
+                video_id,
+                result["full_transcript"],
+                provider="yt-dlp",
+                title=result.get("video_title")
+            )
             
         # Format the response without timestamps/sentences
         return {
@@ -783,31 +1513,22 @@ async def chat_with_direct_answers(request: ChatRequest):
     """
     Endpoint to chat with AI that provides direct answers about the transcript content
     """
+    doc_id, transcript = await resolve_document(request)
     try:
-        if not request.transcript:
-            raise HTTPException(status_code=400, detail="Transcript is required")
-        
         if not request.messages or len(request.messages) == 0:
             raise HTTPException(status_code=400, detail="At least one message is required")
         
-        # Format messages for the LLM
-        formatted_messages = [
-            {"role": "system", "content": get_direct_system_prompt()},
-        ]
-        
-        # Add transcript context
-        context_message = {
-            "role": "system", 
-            "content": f"The following is the transcript of a lecture that the user is asking about:\n\n{request.transcript[:8000]}"
-        }
-        formatted_messages.append(context_message)
-        
-        # Add conversation history
-        for msg in request.messages:
-            formatted_messages.append({"role": msg.role, "content": msg.content})
+        # System prompt, transcript context and history, fitted to the context window
+        formatted_messages = await build_chat_messages(
+            request,
+            doc_id,
+            transcript,
+            get_direct_system_prompt(),
+            "The following is the transcript of a lecture that the user is asking about:"
+        )
         
         # Generate response
-        response = generate_direct_response(formatted_messages)
+        response = await generate_direct_response(formatted_messages)
         
         return {
             "message": response
@@ -815,63 +1536,49 @@ async def chat_with_direct_answers(request: ChatRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating response: {str(e)}")
 
-def generate_direct_response(messages):
+async def generate_direct_response(messages):
     """
     Generate a direct answer response using the Groq API
     """
-    if not GROQ_API_KEY or not groq_client:
+    if not llm_gateway.is_available():
         # Return mock response if Groq API is not available
         return "Based on the transcript, I can tell you that... (Note: This is a mock response as the Groq API key is not configured)"
     
     try:
         # Call Groq API to generate the response
-        response = groq_client.chat.completions.create(
-            model="llama-3.3-70b-versatile",  # Using Llama 3.3 70B model
+        return await llm_gateway.chat_completion(
+            model=CHAT_MODEL,
             messages=messages,
             temperature=0.3,  # Lower temperature for more factual responses
-            max_tokens=1024
+            max_tokens=CHAT_MAX_TOKENS
         )
-        
-        # Extract the response text
-        return response.choices[0].message.content
     except Exception as e:
         return f"I'm having trouble processing your question. Could you try asking in a different way? (Error: {str(e)})"
 
 @app.post("/api/chat-direct-stream")
-async def chat_with_direct_stream(request: ChatRequest):
+async def chat_with_direct_stream(request: ChatRequest, http_request: Request):
     """
     Endpoint to chat with direct answers with streaming response
     """
+    doc_id, transcript = await resolve_document(request)
     try:
-        if not request.transcript:
-            raise HTTPException(status_code=400, detail="Transcript is required")
-        
         if not request.messages or len(request.messages) == 0:
             raise HTTPException(status_code=400, detail="At least one message is required")
         
-        # Use the direct answer system prompt
-        system_prompt = get_direct_system_prompt()
-        
-        # Format messages for the LLM
-        formatted_messages = [
-            {"role": "system", "content": system_prompt},
-        ]
-        
-        # Add transcript context
-        context_message = {
-            "role": "system", 
-            "content": f"The following is the transcript of a lecture that the user is asking about:\n\n{request.transcript[:8000]}"
-        }
-        formatted_messages.append(context_message)
-        
-        # Add conversation history
-        for msg in request.messages:
-            formatted_messages.append({"role": msg.role, "content": msg.content})
+        # System prompt, transcript context and history, fitted to the context window
+        formatted_messages = await build_chat_messages(
+            request,
+            doc_id,
+            transcript,
+            get_direct_system_prompt(),
+            "The following is the transcript of a lecture that the user is asking about:"
+        )
         
-        # Return streaming response
+        # Return streaming response; generation stops if the client disconnects
         return StreamingResponse(
-            generate_streaming_response(formatted_messages),
-            media_type="text/event-stream"
+            generate_streaming_response(formatted_messages, http_request),
+            media_type="text/event-stream",
+            headers=SSE_HEADERS
         )
     
     except Exception as e:
@@ -898,55 +1605,71 @@ async def youtube_transcribe_v2_endpoint(request: YouTubeRequest):
     """
     try:
         print("Starting transcription process...")
-        if not request.youtube_url:
-            raise HTTPException(status_code=400, detail="YouTube URL is required")
-            
-        # Validate URL format
-        if not request.youtube_url.startswith(("https://www.youtube.com/", "https://youtu.be/")):
-            raise HTTPException(status_code=400, detail="Invalid YouTube URL format")
-        
-        # Extract video ID
-        video_id = extract_video_id(request.youtube_url)
-        if not video_id:
-            raise HTTPException(status_code=400, detail="Could not extract video ID from URL")
-            
-        try:
-            text_transcript = supadata.youtube.transcript(
-                video_id=video_id,
-                text=True,
-                lang="en"
-            )
-            
-            formatted_transcript = text_transcript.content
-            
-            return {
-                "success": True,
-                "video_title": "YouTube Video",  # Default title
-                "transcription": formatted_transcript
-            }
-            
-        except Exception as e:
-            error_message = str(e)
-            raise HTTPException(
-            status_code=500,
-            detail="Error processing YouTube transcription")
-            
-                
+        return await fetch_youtube_transcript(request.youtube_url)
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing YouTube transcription: {str(e)}")
 
+async def fetch_youtube_transcript(youtube_url):
+    """
+    Fetch the transcript of a YouTube video through Supadata.
+    Raises HTTPException on invalid URLs or provider errors.
+    """
+    if not youtube_url:
+        raise HTTPException(status_code=400, detail="YouTube URL is required")
+        
+    # Validate URL format
+    if not youtube_url.startswith(("https://www.youtube.com/", "https://youtu.be/")):
+        raise HTTPException(status_code=400, detail="Invalid YouTube URL format")
+    
+    # Extract video ID
+    video_id = extract_video_id(youtube_url)
+    if not video_id:
+        raise HTTPException(status_code=400, detail="Could not extract video ID from URL")
+        
+    # Serve transcripts fetched before by any ingest path
+    stored = transcript_store.get(video_id)
+    if stored:
+        return {
+            "success": True,
+            "video_title": stored["title"] or "YouTube Video",
+            "transcription": stored["transcript"]
+        }
+
+    try:
+        # The Supadata client is synchronous, so keep it off the event loop
+        text_transcript = await asyncio.to_thread(
+            supadata.youtube.transcript,
+            video_id=video_id,
+            text=True,
+            lang="en"
+        )
+    except Exception:
+        raise HTTPException(
+            status_code=500,
+            detail="Error processing YouTube transcription")
+
+    if text_transcript.content:
+        transcript_store.put(video_id, text_transcript.content, provider="supadata")
+
+    return {
+        "success": True,
+        "video_title": "YouTube Video",  # Default title
+        "transcription": text_transcript.content
+    }
+
 # Add new models for PDF processing
 class PDFSummaryResponse(BaseModel):
     success: bool
     summary: str
     questions: List[QuizQuestion]
     transcript: str
+    document_id: Optional[str] = None
     error: Optional[str] = None
 
 @app.post("/api/process-pdf", response_model=PDFSummaryResponse)
-async def process_pdf_endpoint(file: UploadFile = File(...)):
+async def process_pdf_endpoint(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
     """
     Endpoint to process PDF files and generate summaries using RAG
     """
@@ -954,103 +1677,44 @@ async def process_pdf_endpoint(file: UploadFile = File(...)):
         if not file.filename.lower().endswith('.pdf'):
             raise HTTPException(status_code=400, detail="File must be a PDF")
 
-        # Create a temporary file to store the uploaded PDF
-        temp_file_path = os.path.join(UPLOAD_DIR, f"temp_{uuid.uuid4()}.pdf")
+        # Extract text straight from the uploaded bytes, no temp file
         try:
-            # Save the uploaded file temporarily
-            with open(temp_file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-
-            # Extract text from PDF
-            pdf_text = extract_text_from_pdf_file(temp_file_path)
-            
-            # Create chunks
-            chunks = create_chunks(pdf_text)
-            
-            if not chunks:
-                raise HTTPException(status_code=400, detail="Could not extract text from PDF")
-
-            # Generate summary using Groq (simpler approach without RAG for now)
-            if not GROQ_API_KEY or not groq_client:
-                raise HTTPException(
-                    status_code=500, 
-                    detail="GROQ_API_KEY not configured"
-                )
-                
-            prompt = f"""
-            Create a concise and well-organized bullet point summary for the provided transcript.
-
-            - Identify key points and important details from the transcript.
-            - Summarize information in clear and concise bullet points.
-            - Ensure that the bullet points capture the essence of the conversation or content.
-            - Organize the bullets logically to maintain the flow of information.
-
-            # Steps
-
-            1. Read through the transcript to understand the main topics and key details.
-            2. Identify and note down significant points, arguments, or data.
-            3. Summarize these points into clear, concise bullet points.
-            4. Ensure logical flow and organization of bullet points.
-            5. Review the bullet points to ensure they are representative of the transcript's content.
-
-            # Output Format
-
-            1. Use markdown headers (#) for main sections
-            2. Use bullet points (*) for key points
-            3. Organize content into clear sections
-            4. Include:
-            - Main topics/themes
-            - Key points and arguments
-            - Important details and examples
-            - Conclusions or takeaways
-
-            # Examples
-
-            ## Example Input
-            [Transcript of a conversation or presentation.]
-
-            ## Example Output
-            - Introduction of the main topic
-            - Key argument 1: [Summary of the argument]
-            - Key argument 2: [Summary of the argument]
-            - Closing remarks: [Summary of conclusions]
-            (Note: In a realistic example, more detailed key points should be included.) 
+            extracted = await pdf_extractor.extract_pdf(await file.read())
+        except PDFExtractionError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        pdf_text = extracted.text
+        
+        # Create chunks
+        chunks = create_chunks(pdf_text)
+        
+        if not chunks:
+            raise HTTPException(status_code=400, detail="Could not extract text from PDF")
 
-            # Notes
+        # Build the retrieval index once per upload, after the response is sent
+        background_tasks.add_task(get_document_index, pdf_text)
 
-            - Focus on clarity and brevity.
-            - Avoid redundant information.
-            
-            Transcript:
-            {pdf_text}
-            """
-            
-            response = groq_client.chat.completions.create(
-                model="llama-3.3-70b-versatile",  # Using newer Llama 3.3 70B model
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant that creates concise, well-organized bullet point summaries."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3,  # Lower temperature for more focused responses
-                max_tokens=1024
+        # Generate summary using Groq (simpler approach without RAG for now)
+        if not llm_gateway.is_available():
+            raise HTTPException(
+                status_code=500, 
+                detail="GROQ_API_KEY not configured"
             )
-
-            questions = generate_quiz_questions(pdf_text, 5)
-                
-            summary = response.choices[0].message.content
             
-            return {
-                "success": True,
-                "transcript": pdf_text,
-                "summary": summary,
-                "questions": questions,
-                "error": None
-            }
-
-        finally:
-            # Clean up the temporary file
-            if os.path.exists(temp_file_path):
-                os.remove(temp_file_path)
+        # Summary and quiz are independent, so generate them concurrently.
+        # The summary shares its prompt and response cache with /api/generate-summary
+        (summary, _), questions = await asyncio.gather(
+            summarize_long_text(pdf_text),
+            generate_quiz_questions(pdf_text, 5),
+        )
+        
+        return {
+            "success": True,
+            "transcript": pdf_text,
+            "document_id": await asyncio.to_thread(document_store.put, pdf_text),
+            "summary": summary,
+            "questions": questions,
+            "error": None
+        }
                 
     except Exception as e:
         return {
@@ -1061,85 +1725,191 @@ async def process_pdf_endpoint(file: UploadFile = File(...)):
             "error": str(e)
         }
 
-def extract_text_from_pdf_file(file_path: str) -> str:
+@app.post("/api/process-pdf-stream")
+async def process_pdf_stream_endpoint(file: UploadFile = File(...)):
     """
-    Extract text from a PDF file
+    Process a PDF like /api/process-pdf, but stream server-sent events:
+    page extraction progress, the extracted text, the summary as it is
+    generated, then the quiz questions
     """
+    if not file.filename.lower().endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="File must be a PDF")
+
+    # Read the upload before responding; the form file is closed once the handler returns
+    data = await file.read()
+    background_tasks = BackgroundTasks()
+    return StreamingResponse(
+        generate_pdf_events(data, background_tasks),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+        background=background_tasks
+    )
+
+async def generate_pdf_events(data: bytes, background_tasks: BackgroundTasks):
+    """
+    Extract, summarize and quiz a PDF, yielding each step as it happens
+    """
+    started = time.perf_counter()
+
+    def event(payload):
+        return f"data: {json.dumps(payload)}\n\n"
+
+    def done_event():
+        return event({"done": True, "elapsed_ms": round((time.perf_counter() - started) * 1000.0, 1)})
+
+    pages = {"done": 0, "total": None}
+    extraction = asyncio.ensure_future(pdf_extractor.extract_pdf(
+        data,
+        on_progress=lambda done, total: pages.update(done=done, total=total)
+    ))
+    quiz = None
     try:
-        with open(file_path, 'rb') as file:
-            # Create a PDF reader object
-            pdf_reader = PyPDF2.PdfReader(file)
-            # Join text from all pages into one string
-            text = " ".join(page.extract_text() or "" for page in pdf_reader.pages)
-            return text.strip()
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Error reading PDF: {str(e)}")
+        # Extraction stage
+        while not extraction.done():
+            await asyncio.wait({extraction}, timeout=PROGRESS_EVENT_INTERVAL_SECONDS)
+            yield event({"type": "progress", "stage": "extract", "pages_done": pages["done"], "pages_total": pages["total"]})
+        try:
+            extracted = extraction.result()
+        except PDFExtractionError as e:
+            yield event({"type": "error", "stage": "extract", "error": str(e)})
+            yield done_event()
+            return
+
+        pdf_text = extracted.text
+        if not pdf_text.strip():
+            yield event({"type": "error", "stage": "extract", "error": "Could not extract text from PDF"})
+            yield done_event()
+            return
+        yield event({
+            "type": "transcript",
+            "transcript": pdf_text,
+            "document_id": await asyncio.to_thread(document_store.put, pdf_text),
+            "pages": [{"page": page.number, "offset": page.offset} for page in extracted.pages]
+        })
+
+        # Build the retrieval index once per upload, after the stream ends
+        background_tasks.add_task(get_document_index, pdf_text)
+
+        if not llm_gateway.is_available():
+            yield event({"type": "error", "stage": "summary", "error": "GROQ_API_KEY not configured"})
+            yield done_event()
+            return
+
+        # The quiz is generated while the summary streams and sent after it
+        quiz = asyncio.ensure_future(generate_quiz_questions(pdf_text, 5))
+
+        # Summary stage
+        try:
+            async for payload in summary_stream_events(pdf_text):
+                yield event(payload)
+        except Exception as e:
+            yield event({"type": "error", "stage": "summary", "error": str(e)})
+
+        # Quiz stage
+        try:
+            yield event({"type": "quiz", "questions": await quiz})
+        except Exception as e:
+            yield event({"type": "error", "stage": "quiz", "error": str(e)})
+        yield done_event()
+    finally:
+        # Stop outstanding work if the client goes away
+        extraction.cancel()
+        if quiz is not None:
+            quiz.cancel()
 
 # Add the RAG helper functions
+# Retrieval chunks: sentence-aligned, sized in tokens, overlapping their neighbours
+RETRIEVAL_CHUNK_TOKENS = int(os.getenv("RETRIEVAL_CHUNK_TOKENS", "128"))
+RETRIEVAL_CHUNK_OVERLAP_TOKENS = int(os.getenv("RETRIEVAL_CHUNK_OVERLAP_TOKENS", "24"))
+# Bump when chunking or index building changes in a way the settings above do not capture
+RETRIEVAL_INDEX_VERSION = "index-v1"
+
 def create_chunks(text: str, chunk_size: int = 500) -> List[str]:
     """
-    Break the text into chunks of roughly chunk_size characters each.
+    Break the text into sentence-aligned chunks of roughly chunk_size characters each.
     """
-    words = text.split()
-    chunks = []
-    current_chunk = []
-    current_length = 0
-    
-    for word in words:
-        current_length += len(word) + 1  # +1 for space
-        if current_length > chunk_size:
-            chunks.append(" ".join(current_chunk))
-            current_chunk = [word]
-            current_length = len(word)
-        else:
-            current_chunk.append(word)
-    if current_chunk:
-        chunks.append(" ".join(current_chunk))
-    return chunks
+    return chunk_texts(text, chunk_spans(text, max_tokens=max(1, chunk_size // 4)))
 
-def get_embeddings(texts: List[str]) -> List[List[float]]:
+async def get_embeddings(texts: List[str], bulk: bool = False) -> np.ndarray:
     """
-    Get embeddings using Hugging Face Inference API
+    Get embeddings from the shared, resident embedding model.
+    Concurrent callers are coalesced into batches by embedding_service;
+    `bulk` work such as index builds yields to queries.
     """
-        
-    embeddings = []
-    batch_size = 8
-    
-    for i in range(0, len(texts), batch_size):
-        batch = texts[i:i + batch_size]
-        try:
-            time.sleep(1)  # Rate limiting
-            model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
-            batch_embeddings = model.encode(batch)
-            embeddings.extend(batch_embeddings)
-                            
-        except Exception as e:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Error getting embeddings: {str(e)}"
-            )
-            
-    return embeddings
+    try:
+        return await embedding_service.embed(texts, bulk=bulk)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error getting embeddings: {str(e)}"
+        )
 
-def search_relevant_chunks(query_embedding: List[float],
-                         chunk_embeddings: List[List[float]],
-                         chunks: List[str],
-                         top_k: int = 3) -> List[str]:
+def get_document_id(text: str) -> str:
     """
-    Find most relevant chunks using cosine similarity
+    Content hash used to key per-document indexes and caches
     """
-    if not chunks or not chunk_embeddings:
-        return []
+    return document_id(text)
 
-    query_vec = np.array(query_embedding)
-    chunk_mat = np.array(chunk_embeddings)
-    
-    similarities = np.dot(chunk_mat, query_vec) / (
-        np.linalg.norm(chunk_mat, axis=1) * np.linalg.norm(query_vec)
+def document_index_key(doc_id: str) -> str:
+    """
+    Store key of a document's index: the document ID plus a hash of the
+    settings that shape its chunks and vectors, so indexes built with other
+    settings are never reused (they age out of vector_index_store)
+    """
+    settings = response_cache.make_key(
+        version=RETRIEVAL_INDEX_VERSION,
+        chunk_tokens=RETRIEVAL_CHUNK_TOKENS,
+        overlap_tokens=RETRIEVAL_CHUNK_OVERLAP_TOKENS,
+        tokenizer=tokenizer_name(),
+        embedding_model=EMBEDDING_MODEL_NAME,
     )
-    
-    top_indices = np.argsort(similarities)[-top_k:][::-1]
-    return [chunks[i] for i in top_indices]
+    return f"{doc_id}-{settings[:12]}"
+
+# Index builds in progress, so concurrent requests for one document share a build
+_index_builds: Dict[str, asyncio.Task] = {}
+
+async def get_document_index(text: str, doc_id: Optional[str] = None) -> VectorIndex:
+    """
+    Return the vector index for a document, building and persisting it on first use.
+    Pass `doc_id` when it is already known to skip hashing the text.
+    """
+    key = document_index_key(doc_id or get_document_id(text))
+    index = vector_index_store.get(key)
+    if index is not None:
+        return index
+
+    build = _index_builds.get(key)
+    if build is None:
+        build = asyncio.ensure_future(_build_document_index(key, text))
+        _index_builds[key] = build
+        build.add_done_callback(lambda _: _index_builds.pop(key, None))
+    return await asyncio.shield(build)
+
+async def _build_document_index(key: str, text: str) -> VectorIndex:
+    spans = chunk_spans(
+        text,
+        max_tokens=RETRIEVAL_CHUNK_TOKENS,
+        overlap_tokens=RETRIEVAL_CHUNK_OVERLAP_TOKENS,
+        count_tokens=count_tokens,
+    )
+    chunks = chunk_texts(text, spans)
+    embeddings = await get_embeddings(chunks, bulk=True)
+    index = VectorIndex.build(embeddings, chunks, [(span.start, span.end) for span in spans])
+    await asyncio.to_thread(vector_index_store.put, key, index)
+    return index
+
+def search_relevant_chunks(query_embeddings: np.ndarray,
+                         index: VectorIndex,
+                         top_k: int = 3) -> List[List[str]]:
+    """
+    Find the most relevant chunks for one or more queries using cosine similarity.
+    All queries are scored against the index in a single matrix multiply.
+    """
+    if len(index) == 0:
+        return [[] for _ in range(len(np.atleast_2d(query_embeddings)))]
+
+    top_indices, _ = index.search_batch(query_embeddings, top_k)
+    return [[index.chunks[i] for i in row] for row in top_indices]
 
 # Add environment variable check
 ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
@@ -1192,8 +1962,8 @@ async def get_signed_url():
             detail=f"Error getting signed URL: {str(e)}"
         )
 
-class ConceptDetectiveRequest(BaseModel):
-    transcript: str
+class ConceptDetectiveRequest(DocumentReference):
+    pass
 
 class ConceptDetectiveQuestion(BaseModel):
     text: str
@@ -1210,83 +1980,121 @@ class ConceptDetectiveResponse(BaseModel):
     description: str
     levels: List[ConceptDetectiveLevel]
     error: Optional[str] = None
+    timings: Optional[Dict[str, float]] = None
 
-@app.post("/api/generate-concept-detective", response_model=ConceptDetectiveResponse)
-async def generate_concept_detective(request: ConceptDetectiveRequest):
+async def create_concept_detective_game(transcript):
     """
-    Generate a Concept Detective game based on the transcript content
+    Generate the Concept Detective game data for a transcript, served from the
+    response cache when available. Raises on API or JSON errors.
     """
-    try:
-        if not request.transcript:
-            raise HTTPException(status_code=400, detail="Transcript is required")
-            
-        # Truncate very long transcripts to prevent API limits
-        max_length = 16000  # Adjust based on the model's context window
-        truncated_transcript = request.transcript[:max_length]
-        if len(request.transcript) > max_length:
-            truncated_transcript += "\n[Transcript truncated due to length...]"
-            
-        # Use Groq to generate the game data
-        if not GROQ_API_KEY or not groq_client:
-            raise HTTPException(
-                status_code=500, 
-                detail="GROQ_API_KEY not configured"
-            )
-            
+    model = "llama-3.3-70b-versatile"  # Using Llama 3.3 70B model
+    temperature = 0.7  # Higher temperature for more creative analogies
+    cache_key = response_cache.make_key(
+        kind="concept_detective",
+        version=CONCEPT_DETECTIVE_PROMPT_VERSION,
+        model=model,
+        temperature=temperature,
+        transcript=transcript,
+    )
+    cached_game = await response_cache.get(cache_key)
+    if cached_game is not None:
+        return cached_game
+
+    def render_messages(transcript):
         prompt = f"""
-        Create a Concept Detective game based on the following transcript.
+            Create a Concept Detective game based on the following transcript.
         
-        The game should:
-        1. Use a creative analogy (like cookies, islands, pets, game consoles, etc.) that reflects the core idea of the transcript
-        2. Have multiple levels that reflect different layers or subtopics from the material
-        3. Each level should have a brief story using the analogy and 3-5 open-ended questions
+            The game should:
+            1. Use a creative analogy (like cookies, islands, pets, game consoles, etc.) that reflects the core idea of the transcript
+            2. Have multiple levels that reflect different layers or subtopics from the material
+            3. Each level should have a brief story using the analogy and 3-5 open-ended questions
         
-        Format your response as a JSON object with the following structure:
-        {{
-          "analogy": "The creative analogy you've chosen",
-          "description": "A brief description of how the analogy relates to the transcript content",
-          "levels": [
+            Format your response as a JSON object with the following structure:
             {{
-              "title": "Level 1: [Level Title]",
-              "story": "A brief story using the analogy that introduces the level",
-              "questions": [
+              "analogy": "The creative analogy you've chosen",
+              "description": "A brief description of how the analogy relates to the transcript content",
+              "levels": [
                 {{
-                  "text": "Question 1",
-                  "type": "open-ended"
+                  "title": "Level 1: [Level Title]",
+                  "story": "A brief story using the analogy that introduces the level",
+                  "questions": [
+                    {{
+                      "text": "Question 1",
+                      "type": "open-ended"
+                    }},
+                    // More questions...
+                  ]
                 }},
-                // More questions...
+                // More levels...
               ]
-            }},
-            // More levels...
-          ]
-        }}
-        
-        Make sure the questions are thought-provoking and require the user to apply or explain key ideas from the transcript.
-        
-        Transcript:
-        {truncated_transcript}
-        """
+            }}
         
-        response = groq_client.chat.completions.create(
-            model="llama-3.3-70b-versatile",  # Using Llama 3.3 70B model
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that creates educational games. You always respond with valid JSON."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,  # Higher temperature for more creative analogies
-            max_tokens=2048,
-            response_format={"type": "json_object"}  # Ensure JSON response
-        )
+            Make sure the questions are thought-provoking and require the user to apply or explain key ideas from the transcript.
         
-        # Extract the game data from the response
-        game_data = json.loads(response.choices[0].message.content)
+            Transcript:
+            {transcript}
+            """
+        return [
+            {"role": "system", "content": "You are a helpful assistant that creates educational games. You always respond with valid JSON."},
+            {"role": "user", "content": prompt}
+        ]
+
+    game_text = await llm_gateway.chat_completion(
+        model=model,
+        messages=fit_to_prompt(render_messages, model, 2048, transcript),
+        temperature=temperature,
+        max_tokens=2048,
+        response_format={"type": "json_object"}  # Ensure JSON response
+    )
+
+    # Extract the game data from the response
+    game_data = json.loads(game_text)
+    await response_cache.set(cache_key, game_data)
+    return game_data
+
+async def generate_concept_detective_game(transcript) -> Tuple[Dict[str, Any], Dict[str, float]]:
+    """
+    Generate a Concept Detective game for a transcript of any length.
+    Long transcripts are condensed into per-section notes so the game covers all of it.
+
+    Returns (game_data, timings) with per-stage wall-clock times in milliseconds.
+    """
+    started = time.perf_counter()
+    timings = {}
+    game_source = transcript
+    if count_tokens(transcript) > MAP_REDUCE_THRESHOLD_TOKENS:
+        notes, timings = await map_transcript_sections(transcript)
+        game_source = "\n\n".join(notes)
+
+    reduce_started = time.perf_counter()
+    game_data = await create_concept_detective_game(game_source)
+    timings["reduce_ms"] = round((time.perf_counter() - reduce_started) * 1000.0, 1)
+    timings["total_ms"] = round((time.perf_counter() - started) * 1000.0, 1)
+    return game_data, timings
+
+@app.post("/api/generate-concept-detective", response_model=ConceptDetectiveResponse)
+async def generate_concept_detective(request: ConceptDetectiveRequest):
+    """
+    Generate a Concept Detective game based on the transcript content
+    """
+    _, transcript = await resolve_document(request)
+    try:
+        # Use Groq to generate the game data
+        if not llm_gateway.is_available():
+            raise HTTPException(
+                status_code=500, 
+                detail="GROQ_API_KEY not configured"
+            )
+
+        game_data, timings = await generate_concept_detective_game(transcript)
         
         return {
             "success": True,
             "analogy": game_data.get("analogy", ""),
             "description": game_data.get("description", ""),
             "levels": game_data.get("levels", []),
-            "error": None
+            "error": None,
+            "timings": timings
         }
         
     except Exception as e:
@@ -1303,8 +2111,7 @@ class ConceptDetectiveAnswer(BaseModel):
     questionIndex: int
     answer: str
 
-class ConceptDetectiveEvaluationRequest(BaseModel):
-    transcript: str
+class ConceptDetectiveEvaluationRequest(DocumentReference):
     answers: List[ConceptDetectiveAnswer]
 
 class ConceptDetectiveEvaluationResponse(BaseModel):
@@ -1318,21 +2125,13 @@ async def evaluate_concept_detective(request: ConceptDetectiveEvaluationRequest)
     """
     Evaluate the user's answers for the Concept Detective game
     """
+    _, transcript = await resolve_document(request)
     try:
-        if not request.transcript:
-            raise HTTPException(status_code=400, detail="Transcript is required")
-            
         if not request.answers:
             raise HTTPException(status_code=400, detail="Answers are required")
             
-        # Truncate very long transcripts to prevent API limits
-        max_length = 16000  # Adjust based on the model's context window
-        truncated_transcript = request.transcript[:max_length]
-        if len(request.transcript) > max_length:
-            truncated_transcript += "\n[Transcript truncated due to length...]"
-            
         # Use Groq to evaluate the answers
-        if not GROQ_API_KEY or not groq_client:
+        if not llm_gateway.is_available():
             raise HTTPException(
                 status_code=500, 
                 detail="GROQ_API_KEY not configured"
@@ -1347,50 +2146,54 @@ async def evaluate_concept_detective(request: ConceptDetectiveEvaluationRequest)
                 "answer": answer.answer
             })
             
-        prompt = f"""
-        Evaluate the following answers for a Concept Detective game based on the transcript.
-        
-        For each answer, provide:
-        1. A score from 0-4:
-           - 0: Completely incorrect or misunderstanding
-           - 1: Somewhat related but mostly off
-           - 2: Partial understanding with missing or confused parts
-           - 3: Mostly correct with minor flaws
-           - 4: Fully correct, showing clear understanding
-        2. Brief feedback explaining the score and what could be improved
-        
-        Format your response as a JSON object with the following structure:
-        {{
-          "scores": {{
-            "levelIndex-questionIndex": score,
-            // More scores...
-          }},
-          "feedback": {{
-            "levelIndex-questionIndex": "Feedback text",
-            // More feedback...
-          }}
-        }}
-        
-        Transcript:
-        {truncated_transcript}
+        def render_messages(transcript):
+            prompt = f"""
+            Evaluate the following answers for a Concept Detective game based on the transcript.
+        
+            For each answer, provide:
+            1. A score from 0-4:
+               - 0: Completely incorrect or misunderstanding
+               - 1: Somewhat related but mostly off
+               - 2: Partial understanding with missing or confused parts
+               - 3: Mostly correct with minor flaws
+               - 4: Fully correct, showing clear understanding
+            2. Brief feedback explaining the score and what could be improved
+        
+            Format your response as a JSON object with the following structure:
+            {{
+              "scores": {{
+                "levelIndex-questionIndex": score,
+                // More scores...
+              }},
+              "feedback": {{
+                "levelIndex-questionIndex": "Feedback text",
+                // More feedback...
+              }}
+            }}
         
-        Answers to evaluate:
-        {json.dumps(formatted_answers, indent=2)}
-        """
+            Transcript:
+            {transcript}
         
-        response = groq_client.chat.completions.create(
-            model="llama-3.3-70b-versatile",  # Using Llama 3.3 70B model
-            messages=[
+            Answers to evaluate:
+            {json.dumps(formatted_answers, indent=2)}
+            """
+            return [
                 {"role": "system", "content": "You are a helpful assistant that evaluates educational answers. You always respond with valid JSON."},
                 {"role": "user", "content": prompt}
-            ],
+            ]
+
+        # The answers are always sent; the transcript gets the rest of the context window
+        model = "llama-3.3-70b-versatile"  # Using Llama 3.3 70B model
+        evaluation_text = await llm_gateway.chat_completion(
+            model=model,
+            messages=fit_to_prompt(render_messages, model, 2048, transcript),
             temperature=0.3,  # Lower temperature for more consistent evaluation
             max_tokens=2048,
             response_format={"type": "json_object"}  # Ensure JSON response
         )
         
         # Extract the evaluation data from the response
-        evaluation_data = json.loads(response.choices[0].message.content)
+        evaluation_data = json.loads(evaluation_text)
         
         return {
             "success": True,
@@ -1407,10 +2210,121 @@ async def evaluate_concept_detective(request: ConceptDetectiveEvaluationRequest)
             "error": str(e)
         }
 
+class AnalyzeRequest(DocumentReference):
+    # Either a document (by ID or text) or a YouTube URL to ingest first
+    youtube_url: Optional[str] = None
+    num_questions: Optional[int] = 5
+    include_concept_detective: Optional[bool] = False
+
+@app.post("/api/analyze")
+async def analyze_endpoint(request: AnalyzeRequest):
+    """
+    Generate the summary, quiz and optionally the Concept Detective game for one
+    transcript in parallel, streaming each artifact as a server-sent event as soon
+    as it is ready
+    """
+    if not request.document_id and not request.transcript and not request.youtube_url:
+        raise HTTPException(status_code=400, detail="Transcript, document_id or YouTube URL is required")
+
+    # Resolve the document before streaming so an unknown ID is a plain 404
+    doc_id, transcript = None, None
+    if request.document_id or request.transcript:
+        doc_id, transcript = await resolve_document(request)
+
+    return StreamingResponse(
+        generate_analysis_events(request, doc_id, transcript),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
 
+async def run_analysis_stage(name, coro):
+    """
+    Await one analysis stage and turn its result or error into an event payload
+    """
+    started = time.perf_counter()
+    try:
+        payload = await coro
+        payload["type"] = name
+    except Exception as e:
+        payload = {"type": "error", "stage": name, "error": str(e)}
+    payload["elapsed_ms"] = round((time.perf_counter() - started) * 1000.0, 1)
+    return payload
 
+async def generate_analysis_events(request: AnalyzeRequest, doc_id: Optional[str], transcript: Optional[str]):
+    """
+    Fan out the analysis stages concurrently and yield each result as it finishes.
+    The first event carries the document ID for follow-up requests. The summary
+    is also streamed (summary_delta) and quiz questions are sent one by one
+    (quiz_question) as they are generated.
+    """
+    started = time.perf_counter()
 
+    if not transcript:
+        try:
+            youtube_data = await fetch_youtube_transcript(request.youtube_url)
+        except HTTPException as e:
+            yield f"data: {json.dumps({'type': 'error', 'stage': 'transcript', 'error': e.detail})}\n\n"
+            yield f"data: {json.dumps({'done': True})}\n\n"
+            return
+        transcript = youtube_data["transcription"]
+        doc_id = await asyncio.to_thread(document_store.put, transcript)
+        yield f"data: {json.dumps({'type': 'transcript', 'document_id': doc_id, **youtube_data})}\n\n"
+    else:
+        yield f"data: {json.dumps({'type': 'document', 'document_id': doc_id})}\n\n"
+
+    # (is a stage result, payload) for stage results, summary deltas and
+    # quiz questions, in the order they become ready
+    events = asyncio.Queue()
+
+    async def summary_stage():
+        if not llm_gateway.is_available():
+            return {"summary": await generate_bullet_summary(transcript)}
+        summary = ""
+        async for payload in summary_stream_events(transcript):
+            if payload["type"] == "summary":
+                summary = payload["summary"]
+            else:
+                events.put_nowait((False, payload))
+        return {"summary": summary}
+
+    async def quiz_stage():
+        num_questions = max(1, min(request.num_questions or 5, 10))
+        questions = []
+        async for question in stream_quiz_questions(transcript, num_questions):
+            events.put_nowait((False, {"type": "quiz_question", "index": len(questions), "question": question}))
+            questions.append(question)
+        return {"questions": questions}
+
+    async def concept_detective_stage():
+        if not llm_gateway.is_available():
+            raise RuntimeError("GROQ_API_KEY not configured")
+        game_data, timings = await generate_concept_detective_game(transcript)
+        return {
+            "analogy": game_data.get("analogy", ""),
+            "description": game_data.get("description", ""),
+            "levels": game_data.get("levels", []),
+            "timings": timings,
+        }
 
+    async def run_stage(name, coro):
+        events.put_nowait((True, await run_analysis_stage(name, coro)))
 
+    stages = [run_stage("summary", summary_stage()), run_stage("quiz", quiz_stage())]
+    if request.include_concept_detective:
+        stages.append(run_stage("concept_detective", concept_detective_stage()))
 
+    tasks = [asyncio.ensure_future(stage) for stage in stages]
+    try:
+        stages_left = len(tasks)
+        while stages_left:
+            is_stage_result, payload = await events.get()
+            if is_stage_result:
+                stages_left -= 1
+            yield f"data: {json.dumps(payload)}\n\n"
+    finally:
+        # Stop outstanding generations if the client goes away
+        for task in tasks:
+            task.cancel()
 
+    total_ms = round((time.perf_counter() - started) * 1000.0, 1)
+    yield f"data: {json.dumps({'done': True, 'elapsed_ms': total_ms})}\n\n"
@@ -0,0 +1,141 @@
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+AUDIO_CACHE_DIR = os.getenv("AUDIO_CACHE_DIR", os.path.join("cache", "audio"))
+AUDIO_CACHE_MAX_BYTES = int(os.getenv("AUDIO_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# Bump when the transcription options change so old results are not served
+AUDIO_CACHE_VERSION = "nova-2-v1"
+
+
+class AudioTranscriptCache:
+    """
+    Disk cache of transcriptions keyed by the SHA-256 of the uploaded audio.
+
+    Each entry is one JSON file holding the transcript and its sentence
+    timestamps. Total size is bounded by `max_bytes`, evicting the least
+    recently used entries first.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> size in bytes, oldest first
+        self._total_bytes = 0
+        self._counters = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0, "audio_bytes_saved": 0}
+        os.makedirs(self.directory, exist_ok=True)
+        self._load_index()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _load_index(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, name[:-len(".json")], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._entries[key] = size
+            self._total_bytes += size
+
+    def get(self, key: str, audio_bytes: int = 0) -> Optional[Dict[str, Any]]:
+        """
+        Return the stored {"transcript", "sentences"} for `key`, or None.
+        `audio_bytes` is the upload size, counted as saved on a hit.
+        """
+        if key not in self._entries:
+            self._counters["misses"] += 1
+            return None
+
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self._forget(key)
+            self._counters["misses"] += 1
+            return None
+
+        if entry.get("version") != AUDIO_CACHE_VERSION:
+            self._forget(key, remove_file=True)
+            self._counters["misses"] += 1
+            return None
+
+        # Refresh recency on disk too, so the order survives restarts
+        now = time.time()
+        try:
+            os.utime(path, (now, now))
+        except OSError:
+            pass
+        self._entries.move_to_end(key)
+        self._counters["hits"] += 1
+        self._counters["audio_bytes_saved"] += audio_bytes
+        return entry["result"]
+
+    def put(self, key: str, result: Dict[str, Any]):
+        """
+        Store a transcription result and evict old entries beyond max_bytes.
+        """
+        payload = json.dumps(
+            {"version": AUDIO_CACHE_VERSION, "result": result},
+            ensure_ascii=False,
+        ).encode("utf-8")
+        path = self._path(key)
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Warning: could not write audio cache entry: {e}")
+            return
+
+        if key in self._entries:
+            self._total_bytes -= self._entries.pop(key)
+        self._entries[key] = len(payload)
+        self._total_bytes += len(payload)
+        self._counters["writes"] += 1
+
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            oldest = next(iter(self._entries))
+            self._forget(oldest, remove_file=True)
+            self._counters["evictions"] += 1
+
+    def _forget(self, key: str, remove_file: bool = False):
+        size = self._entries.pop(key, None)
+        if size is not None:
+            self._total_bytes -= size
+        if remove_file:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Hit rate, audio bytes not re-uploaded, and disk usage.
+        """
+        lookups = self._counters["hits"] + self._counters["misses"]
+        return {
+            **self._counters,
+            "hit_rate": round(self._counters["hits"] / lookups, 4) if lookups else 0.0,
+            "entries": len(self._entries),
+            "stored_bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+
+# Shared instance used by the transcription endpoints
+audio_cache = AudioTranscriptCache(AUDIO_CACHE_DIR, max_bytes=AUDIO_CACHE_MAX_BYTES)
@@ -0,0 +1,262 @@
+import asyncio
+import mimetypes
+import os
+import re
+from collections import namedtuple
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+FFMPEG_BINARY = os.getenv("FFMPEG_BINARY", "ffmpeg")
+FFPROBE_BINARY = os.getenv("FFPROBE_BINARY", "ffprobe")
+
+# Segments aim for this length and are cut at the nearest silence
+SEGMENT_TARGET_SECONDS = float(os.getenv("SEGMENT_TARGET_SECONDS", "300"))
+# How far from the target a silence may be and still be used as a cut point
+SEGMENT_SEARCH_WINDOW_SECONDS = float(os.getenv("SEGMENT_SEARCH_WINDOW_SECONDS", "60"))
+SILENCE_NOISE_DB = float(os.getenv("SILENCE_NOISE_DB", "-30"))
+SILENCE_MIN_SECONDS = float(os.getenv("SILENCE_MIN_SECONDS", "0.4"))
+
+# Speech-to-text only needs narrowband mono audio
+TRANSCODE_SAMPLE_RATE = int(os.getenv("TRANSCODE_SAMPLE_RATE", "16000"))
+TRANSCODE_BITRATE = os.getenv("TRANSCODE_BITRATE", "24k")
+TRANSCODE_CHUNK_BYTES = 64 * 1024
+
+# Matroska takes any codec, so stream-copied segments of unrecognised uploads still mux
+FALLBACK_CONTAINER_EXTENSION = ".mka"
+
+# A slice of the source audio starting `offset` seconds into the recording
+Segment = namedtuple("Segment", ["index", "path", "offset", "duration"])
+
+_SILENCE_START_RE = re.compile(r"silence_start:\s*(-?[\d.]+)")
+_SILENCE_END_RE = re.compile(r"silence_end:\s*(-?[\d.]+)")
+
+_transcode_counters = {"runs": 0, "failures": 0, "input_bytes": 0, "output_bytes": 0}
+
+
+class AudioProcessingError(Exception):
+    """
+    Raised when ffmpeg or ffprobe fails on an input.
+    """
+
+
+def container_extension(filename: Optional[str], content_type: Optional[str]) -> str:
+    """
+    File extension ffmpeg can pick a muxer from for an upload: the filename's
+    or the MIME type's when either names an audio or video format, otherwise
+    FALLBACK_CONTAINER_EXTENSION.
+    """
+    candidates = [os.path.splitext(filename or "")[1].lower()]
+    if content_type:
+        candidates.append(mimetypes.guess_extension(content_type.split(";")[0].strip()) or "")
+    for extension in candidates:
+        media_type = mimetypes.guess_type(f"file{extension}")[0] or ""
+        if extension and media_type.startswith(("audio/", "video/")):
+            return extension
+    return FALLBACK_CONTAINER_EXTENSION
+
+
+async def _run(*args: str) -> Tuple[bytes, bytes]:
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+    except FileNotFoundError:
+        raise AudioProcessingError(f"{args[0]} is not installed")
+
+    try:
+        stdout, stderr = await process.communicate()
+    except asyncio.CancelledError:
+        process.kill()
+        raise
+    if process.returncode != 0:
+        raise AudioProcessingError(stderr.decode("utf-8", "replace")[-500:])
+    return stdout, stderr
+
+
+async def probe_duration(path: str) -> float:
+    """
+    Duration of an audio file in seconds.
+    """
+    stdout, _ = await _run(
+        FFPROBE_BINARY, "-v", "error",
+        "-show_entries", "format=duration",
+        "-of", "default=noprint_wrappers=1:nokey=1",
+        path,
+    )
+    try:
+        return float(stdout.decode().strip())
+    except ValueError:
+        raise AudioProcessingError("Could not determine audio duration")
+
+
+async def detect_silences(path: str) -> List[Tuple[float, float]]:
+    """
+    Return (start, end) pairs of the silent stretches in an audio file.
+    """
+    _, stderr = await _run(
+        FFMPEG_BINARY, "-hide_banner", "-nostats", "-i", path,
+        "-af", f"silencedetect=noise={SILENCE_NOISE_DB}dB:d={SILENCE_MIN_SECONDS}",
+        "-f", "null", "-",
+    )
+    silences = []
+    silence_start = None
+    for line in stderr.decode("utf-8", "replace").splitlines():
+        match = _SILENCE_START_RE.search(line)
+        if match:
+            silence_start = max(0.0, float(match.group(1)))
+            continue
+        match = _SILENCE_END_RE.search(line)
+        if match and silence_start is not None:
+            silences.append((silence_start, float(match.group(1))))
+            silence_start = None
+    return silences
+
+
+def choose_split_points(
+    duration: float,
+    silences: List[Tuple[float, float]],
+    target_seconds: float = SEGMENT_TARGET_SECONDS,
+    window_seconds: float = SEGMENT_SEARCH_WINDOW_SECONDS,
+) -> List[float]:
+    """
+    Pick cut points roughly every `target_seconds`, each at the middle of the
+    silence closest to the target, or a hard cut when none is within the window.
+    """
+    midpoints = [(start + end) / 2.0 for start, end in silences]
+    points = []
+    position = 0.0
+    while duration - position > target_seconds + window_seconds:
+        target = position + target_seconds
+        candidates = [m for m in midpoints if abs(m - target) <= window_seconds and m > position]
+        cut = min(candidates, key=lambda m: abs(m - target)) if candidates else target
+        points.append(round(cut, 3))
+        position = cut
+    return points
+
+
+async def cut_segment(source_path: str, start: float, duration: Optional[float], output_path: str):
+    """
+    Copy [start, start + duration) of the source into output_path without re-encoding.
+    """
+    args = [FFMPEG_BINARY, "-hide_banner", "-loglevel", "error", "-y", "-ss", str(start), "-i", source_path]
+    if duration is not None:
+        args += ["-t", str(duration)]
+    args += ["-vn", "-c", "copy", output_path]
+    await _run(*args)
+
+
+async def split_on_silence(
+    source_path: str,
+    workdir: str,
+    target_seconds: float = SEGMENT_TARGET_SECONDS,
+) -> List[Segment]:
+    """
+    Split an audio file into segments of about `target_seconds`, cutting at
+    silences. Short recordings come back as a single segment of the source.
+    """
+    duration = await probe_duration(source_path)
+    if duration <= target_seconds:
+        return [Segment(0, source_path, 0.0, duration)]
+
+    silences = await detect_silences(source_path)
+    points = choose_split_points(duration, silences, target_seconds)
+    bounds = list(zip([0.0] + points, points + [duration]))
+
+    extension = container_extension(source_path, None)
+    segments = [
+        Segment(i, os.path.join(workdir, f"segment_{i:04d}{extension}"), start, end - start)
+        for i, (start, end) in enumerate(bounds)
+    ]
+    await asyncio.gather(*(
+        cut_segment(source_path, segment.offset, None if i == len(segments) - 1 else segment.duration, segment.path)
+        for i, segment in enumerate(segments)
+    ))
+    return segments
+
+
+async def transcode_stream(
+    chunks: AsyncIterator[bytes],
+    sample_rate: int = TRANSCODE_SAMPLE_RATE,
+    bitrate: str = TRANSCODE_BITRATE,
+) -> AsyncIterator[bytes]:
+    """
+    Pipe audio through ffmpeg, downmixing to mono Opus in an Ogg container.
+
+    Input chunks are fed to ffmpeg's stdin while its stdout is yielded as it
+    is produced, so neither side is held in memory. Raises
+    AudioProcessingError if ffmpeg is missing or cannot decode the input.
+    """
+    try:
+        process = await asyncio.create_subprocess_exec(
+            FFMPEG_BINARY, "-hide_banner", "-loglevel", "error",
+            "-i", "pipe:0",
+            "-vn", "-ac", "1", "-ar", str(sample_rate),
+            "-c:a", "libopus", "-b:a", bitrate, "-application", "voip",
+            "-f", "ogg", "pipe:1",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+    except FileNotFoundError:
+        _transcode_counters["failures"] += 1
+        raise AudioProcessingError(f"{FFMPEG_BINARY} is not installed")
+
+    counters = {"input_bytes": 0, "output_bytes": 0}
+
+    async def feed():
+        try:
+            async for chunk in chunks:
+                counters["input_bytes"] += len(chunk)
+                process.stdin.write(chunk)
+                await process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            # ffmpeg exited early; its exit status explains why
+            pass
+        finally:
+            process.stdin.close()
+
+    feeder = asyncio.ensure_future(feed())
+    # Drain stderr concurrently so a chatty ffmpeg cannot block on a full pipe
+    stderr_reader = asyncio.ensure_future(process.stderr.read())
+    try:
+        while True:
+            data = await process.stdout.read(TRANSCODE_CHUNK_BYTES)
+            if not data:
+                break
+            counters["output_bytes"] += len(data)
+            yield data
+
+        await feeder
+        returncode = await process.wait()
+        if returncode != 0:
+            stderr = await stderr_reader
+            raise AudioProcessingError(stderr.decode("utf-8", "replace")[-500:])
+    except Exception:
+        _transcode_counters["failures"] += 1
+        raise
+    finally:
+        feeder.cancel()
+        stderr_reader.cancel()
+        if process.returncode is None:
+            process.kill()
+
+    _transcode_counters["runs"] += 1
+    _transcode_counters["input_bytes"] += counters["input_bytes"]
+    _transcode_counters["output_bytes"] += counters["output_bytes"]
+
+
+def transcode_stats() -> Dict[str, float]:
+    """
+    Counters for completed transcodes, including the overall compression ratio.
+    """
+    output_bytes = _transcode_counters["output_bytes"]
+    return {
+        **_transcode_counters,
+        "compression_ratio": round(_transcode_counters["input_bytes"] / output_bytes, 2) if output_bytes else 0.0,
+    }
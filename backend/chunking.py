@@ -0,0 +1,132 @@
+import re
+from collections import deque, namedtuple
+from typing import Callable, Iterator, List, Tuple
+
+# A chunk is a span of the original text: text[start:end], about `tokens` tokens long
+Chunk = namedtuple("Chunk", ["start", "end", "tokens"])
+
+# Sentence ends at terminal punctuation (plus closing quotes/brackets) followed by
+# whitespace, or at a blank line / line break between paragraphs
+_SENTENCE_BREAK_RE = re.compile(r"(?<=[.!?])[\"'\)\]]*\s+|\n\s*\n")
+_WORD_RE = re.compile(r"\S+")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count (about 4 characters per token for English text)
+    """
+    return len(text) // 4 + 1
+
+
+def iter_sentence_spans(text: str) -> Iterator[Tuple[int, int]]:
+    """
+    Yield (start, end) offsets of each sentence in `text`, without the
+    surrounding whitespace, in one scan.
+    """
+    position = 0
+    for match in _SENTENCE_BREAK_RE.finditer(text):
+        end = match.start()
+        # Include closing quotes/brackets that belong to the sentence
+        while end < match.end() and not text[end].isspace():
+            end += 1
+        span = _trim(text, position, end)
+        if span:
+            yield span
+        position = match.end()
+    span = _trim(text, position, len(text))
+    if span:
+        yield span
+
+
+def _trim(text: str, start: int, end: int):
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return (start, end) if end > start else None
+
+
+def _split_long_sentence(
+    text: str,
+    start: int,
+    end: int,
+    max_tokens: int,
+    count_tokens: Callable[[str], int],
+) -> Iterator[Tuple[int, int, int]]:
+    """
+    Break a sentence longer than max_tokens into word-aligned pieces.
+    Word token counts are summed, which slightly overestimates the piece size.
+    """
+    piece_start = piece_end = None
+    piece_tokens = 0
+    for match in _WORD_RE.finditer(text, start, end):
+        word_tokens = count_tokens(match.group())
+        if piece_start is not None and piece_tokens + word_tokens > max_tokens:
+            yield piece_start, piece_end, piece_tokens
+            piece_start = None
+            piece_tokens = 0
+        if piece_start is None:
+            piece_start = match.start()
+        piece_end = match.end()
+        piece_tokens += word_tokens
+    if piece_start is not None:
+        yield piece_start, piece_end, piece_tokens
+
+
+def chunk_spans(
+    text: str,
+    max_tokens: int = 128,
+    overlap_tokens: int = 0,
+    count_tokens: Callable[[str], int] = estimate_tokens,
+) -> List[Chunk]:
+    """
+    Split `text` into chunks of whole sentences of at most `max_tokens`
+    tokens, returned as offsets into `text` rather than copies.
+
+    Consecutive chunks share up to `overlap_tokens` of trailing sentences.
+    Sentences longer than max_tokens are split between words. Every sentence
+    is counted once and enters and leaves the window once, so the pass is
+    linear in the length of the text.
+    """
+    if max_tokens < 1:
+        raise ValueError("max_tokens must be positive")
+    overlap_tokens = max(0, min(overlap_tokens, max_tokens - 1))
+
+    chunks = []
+    window = deque()  # (start, end, tokens) of the sentences in the current chunk
+    window_tokens = 0
+    # Sentences added since the last emitted chunk; a window made only of overlap is not emitted
+    fresh = 0
+
+    def units():
+        for start, end in iter_sentence_spans(text):
+            tokens = count_tokens(text[start:end])
+            if tokens <= max_tokens:
+                yield start, end, tokens
+            else:
+                yield from _split_long_sentence(text, start, end, max_tokens, count_tokens)
+
+    for unit in units():
+        if fresh and window_tokens + unit[2] > max_tokens:
+            chunks.append(Chunk(window[0][0], window[-1][1], window_tokens))
+            fresh = 0
+            # Keep the trailing sentences that fit in the overlap
+            while window and window_tokens > overlap_tokens:
+                window_tokens -= window.popleft()[2]
+        # Drop overlap that would leave no room for the new sentence
+        while window and window_tokens + unit[2] > max_tokens:
+            window_tokens -= window.popleft()[2]
+        window.append(unit)
+        window_tokens += unit[2]
+        fresh += 1
+
+    if fresh:
+        chunks.append(Chunk(window[0][0], window[-1][1], window_tokens))
+    return chunks
+
+
+def chunk_texts(text: str, chunks: List[Chunk]) -> List[str]:
+    """
+    Materialize chunk spans as strings.
+    """
+    return [text[chunk.start:chunk.end] for chunk in chunks]
@@ -0,0 +1,173 @@
+import os
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from chunking import estimate_tokens
+
+# Load environment variables
+load_dotenv()
+
+# Context windows in tokens; unknown models get DEFAULT_CONTEXT_WINDOW
+MODEL_CONTEXT_WINDOWS = {
+    "llama-3.3-70b-versatile": 131072,
+    "llama-3.1-8b-instant": 131072,
+    "mixtral-8x7b-32768": 32768,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+
+# Cap on prompt plus completion tokens per request. Documents are trimmed to
+# this budget rather than the model's full window, which would let a single
+# summary or quiz request run to ~120k tokens; longer texts go through
+# map-reduce instead. Raise it to trade cost and latency for more context per
+# request, or set 0 to use the whole window.
+LLM_MAX_REQUEST_TOKENS = int(os.getenv("LLM_MAX_REQUEST_TOKENS", "8192"))
+# tiktoken encoding used to count tokens; close to the Llama 3 tokenizer for English
+TOKENIZER_ENCODING = os.getenv("TOKENIZER_ENCODING", "cl100k_base")
+
+# Chat formatting tokens added per message
+MESSAGE_OVERHEAD_TOKENS = 4
+# Share of the window held back because counts are approximate for these models;
+# larger when falling back to the character heuristic
+TOKENIZER_SAFETY_MARGIN = 0.05
+HEURISTIC_SAFETY_MARGIN = 0.15
+
+_encoding = None
+_encoding_loaded = False
+
+
+def _get_encoding():
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding(TOKENIZER_ENCODING)
+        except Exception:
+            print("Warning: tiktoken not available, estimating tokens from character counts")
+            _encoding = None
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """
+    Number of tokens in `text`, using tiktoken when installed.
+    """
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def tokenizer_name() -> str:
+    """
+    Name of the tokenizer count_tokens uses, for keys of data derived from token counts
+    """
+    return TOKENIZER_ENCODING if _get_encoding() is not None else "chars/4"
+
+
+def count_message_tokens(messages: List[Dict[str, str]]) -> int:
+    return sum(count_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS for message in messages)
+
+
+def truncate_to_tokens(text: str, max_tokens: int, marker: str = "") -> str:
+    """
+    Cut `text` to at most `max_tokens` tokens, appending `marker` when it is cut.
+    """
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+
+    keep = max_tokens - count_tokens(marker)
+    if keep <= 0:
+        return ""
+    encoding = _get_encoding()
+    if encoding is None:
+        # estimate_tokens counts one token per four characters, plus one
+        return text[:(keep - 1) * 4] + marker
+    return encoding.decode(encoding.encode(text, disallowed_special=())[:keep]) + marker
+
+
+def context_window(model: str) -> int:
+    window = MODEL_CONTEXT_WINDOWS.get(model, DEFAULT_CONTEXT_WINDOW)
+    if LLM_MAX_REQUEST_TOKENS > 0:
+        window = min(window, LLM_MAX_REQUEST_TOKENS)
+    return window
+
+
+class ContextBudget:
+    """
+    Token budget for one LLM request.
+
+    Starts from the model's context window minus the completion's
+    `max_tokens` and a safety margin. Fixed parts of the prompt are
+    reserved first; documents and chat history are then trimmed to
+    whatever remains.
+    """
+
+    def __init__(self, model: str, max_tokens: int = 1024):
+        window = context_window(model)
+        margin = TOKENIZER_SAFETY_MARGIN if _get_encoding() is not None else HEURISTIC_SAFETY_MARGIN
+        self.model = model
+        self.total = max(0, int(window * (1 - margin)) - max_tokens)
+        self.used = 0
+
+    @property
+    def remaining(self) -> int:
+        return max(0, self.total - self.used)
+
+    def reserve(self, *texts: str) -> int:
+        """
+        Account for prompt text that is always sent, e.g. system prompts and templates.
+        """
+        tokens = sum(count_tokens(text) for text in texts) + MESSAGE_OVERHEAD_TOKENS
+        self.used += tokens
+        return tokens
+
+    def reserve_messages(self, messages: List[Dict[str, str]]) -> int:
+        tokens = count_message_tokens(messages)
+        self.used += tokens
+        return tokens
+
+    def fit(self, text: str, max_tokens: Optional[int] = None, marker: str = "") -> str:
+        """
+        Trim `text` to the remaining budget (or `max_tokens` if smaller) and reserve it.
+        """
+        limit = self.remaining if max_tokens is None else min(max_tokens, self.remaining)
+        fitted = truncate_to_tokens(text, limit, marker)
+        self.used += count_tokens(fitted)
+        return fitted
+
+    def fit_messages(self, messages: List[Dict[str, str]], max_tokens: Optional[int] = None) -> List[Dict[str, str]]:
+        """
+        Keep the most recent messages that fit, dropping the oldest first.
+        The latest message is always kept, trimmed if it is too long on its own.
+        """
+        limit = self.remaining if max_tokens is None else min(max_tokens, self.remaining)
+        kept = []
+        used = 0
+        for message in reversed(messages):
+            tokens = count_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+            if used + tokens > limit:
+                if not kept:
+                    content = truncate_to_tokens(message["content"], limit - MESSAGE_OVERHEAD_TOKENS)
+                    kept.append({**message, "content": content})
+                    used += count_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+                break
+            kept.append(message)
+            used += tokens
+        self.used += used
+        kept.reverse()
+        return kept
+
+
+def fit_document(text: str, model: str, max_tokens: int, *fixed_parts: str, marker: str = "") -> str:
+    """
+    Trim a document to whatever room the rest of a single-request prompt leaves.
+    """
+    budget = ContextBudget(model, max_tokens)
+    budget.reserve(*fixed_parts)
+    return budget.fit(text, marker=marker)
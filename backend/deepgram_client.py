@@ -0,0 +1,105 @@
+import os
+from typing import Any, AsyncIterator, Dict, Optional, Union
+
+import httpx
+from dotenv import load_dotenv
+
+import http_pool
+
+# Load environment variables
+load_dotenv()
+
+DEEPGRAM_API_KEY = os.getenv("DEEPGRAM_API_KEY")
+# Point at a local fake server in development and tests
+DEEPGRAM_API_URL = os.getenv("DEEPGRAM_API_URL", "https://api.deepgram.com/v1/listen")
+DEEPGRAM_TIMEOUT_SECONDS = float(os.getenv("DEEPGRAM_TIMEOUT_SECONDS", "600"))
+
+# Same options the prerecorded SDK call used
+DEEPGRAM_OPTIONS = {
+    "smart_format": "true",
+    "model": "nova-2",
+    "language": "en-US",
+    "utterances": "true",  # Enable utterances to get paragraph breaks
+    "detect_topics": "true",  # Detect topic changes
+    "punctuate": "true",
+    "diarize": "true",  # Speaker diarization if multiple speakers
+}
+
+
+class DeepgramError(Exception):
+    """
+    Raised when Deepgram rejects a request or returns an unexpected payload.
+    `retryable` is set for transport errors, rate limiting and server errors,
+    which may succeed on another attempt.
+    """
+
+    def __init__(self, message: str, retryable: bool = False):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+def parse_transcription(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Pull the transcript and sentence timestamps out of a Deepgram response.
+    """
+    try:
+        alternative = payload["results"]["channels"][0]["alternatives"][0]
+    except (KeyError, IndexError, TypeError):
+        raise DeepgramError("Unexpected response from Deepgram")
+
+    formatted_sentences = []
+    paragraphs = (alternative.get("paragraphs") or {}).get("paragraphs", [])
+    for paragraph in paragraphs:
+        for sentence in paragraph.get("sentences", []):
+            formatted_sentences.append({
+                "text": sentence["text"],
+                "start": sentence["start"],
+                "end": sentence["end"]
+            })
+
+    return {
+        "transcript": alternative.get("transcript", ""),
+        "sentences": formatted_sentences
+    }
+
+
+async def transcribe(
+    body: Union[bytes, AsyncIterator[bytes]],
+    content_type: str,
+    content_length: Optional[int] = None,
+    timeout: Optional[float] = None,
+) -> Dict[str, Any]:
+    """
+    Send audio to Deepgram's prerecorded API over the shared async HTTP client.
+
+    `body` may be bytes or an async iterator of chunks, which is streamed to
+    Deepgram as it is produced. Returns {"transcript", "sentences"}.
+    """
+    if not DEEPGRAM_API_KEY:
+        raise DeepgramError("Missing DEEPGRAM_API_KEY environment variable")
+
+    headers = {
+        "Authorization": f"Token {DEEPGRAM_API_KEY}",
+        "Content-Type": content_type or "application/octet-stream",
+    }
+    if content_length is not None:
+        headers["Content-Length"] = str(content_length)
+
+    try:
+        response = await http_pool.get_http_client().post(
+            DEEPGRAM_API_URL,
+            params=DEEPGRAM_OPTIONS,
+            headers=headers,
+            content=body,
+            timeout=httpx.Timeout(timeout or DEEPGRAM_TIMEOUT_SECONDS, connect=10.0),
+        )
+    except httpx.HTTPError as e:
+        raise DeepgramError(f"Could not reach Deepgram: {str(e)}", retryable=isinstance(e, httpx.TransportError))
+
+    if response.status_code != 200:
+        raise DeepgramError(
+            f"Deepgram returned {response.status_code}: {response.text[:500]}",
+            retryable=response.status_code == 429 or response.status_code >= 500,
+        )
+
+    return parse_transcription(response.json())
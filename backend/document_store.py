@@ -0,0 +1,229 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+DOCUMENT_STORE_PATH = os.getenv("DOCUMENT_STORE_PATH", os.path.join("cache", "documents.sqlite3"))
+# Documents unused for this long are dropped
+DOCUMENT_STORE_TTL_SECONDS = float(os.getenv("DOCUMENT_STORE_TTL_SECONDS", str(30 * 24 * 3600)))
+# Characters of decompressed text kept in memory for recently used documents
+DOCUMENT_STORE_MEMORY_CHARS = int(os.getenv("DOCUMENT_STORE_MEMORY_CHARS", str(64 * 1024 * 1024)))
+# Last-used timestamps are refreshed at most this often per document
+DOCUMENT_TOUCH_INTERVAL_SECONDS = 3600
+# Expired documents are deleted by a sweep run from put() at most this often
+DOCUMENT_STORE_SWEEP_INTERVAL_SECONDS = float(os.getenv("DOCUMENT_STORE_SWEEP_INTERVAL_SECONDS", "600"))
+
+
+def document_id(text: str) -> str:
+    """
+    Content hash identifying a document; also keys its indexes and caches
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class DocumentStore:
+    """
+    SQLite-backed store of transcripts and extracted document text, keyed
+    by content hash.
+
+    Clients register a document once and refer to it by ID afterwards, so
+    chat turns and generation requests no longer carry the full text.
+    Documents are zlib-compressed on disk, with the most recently used ones
+    kept decompressed in an in-memory LRU, and expire after `ttl_seconds`
+    without use. Expired rows are deleted when read and by a sweep that
+    put() runs at most every `sweep_interval_seconds`.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttl_seconds: float = 30 * 24 * 3600,
+        max_memory_chars: int = 64 * 1024 * 1024,
+        sweep_interval_seconds: float = 600,
+    ):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_memory_chars = max_memory_chars
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self._last_sweep = 0.0
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # doc_id -> (text, last touched on disk)
+        self._memory_chars = 0
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "expired": 0, "writes": 0, "swept_expired": 0}
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS documents (
+                    doc_id TEXT PRIMARY KEY,
+                    content BLOB NOT NULL,
+                    chars INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.commit()
+
+    def put(self, text: str) -> str:
+        """
+        Store `text` if it is not stored yet and return its document ID.
+
+        Hashes and, for new documents, compresses the text, so async callers
+        run it in a worker thread. Known documents cost a lookup, plus a
+        last-used update at most every DOCUMENT_TOUCH_INTERVAL_SECONDS.
+        """
+        doc_id = document_id(text)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(doc_id)
+            if entry is not None and entry[1] + DOCUMENT_TOUCH_INTERVAL_SECONDS > now:
+                self._remember(doc_id, text, entry[1])
+                return doc_id
+            row = self._conn.execute(
+                "SELECT last_used_at FROM documents WHERE doc_id = ?",
+                (doc_id,),
+            ).fetchone()
+            if row is not None:
+                touched_at = row[0]
+                if touched_at + DOCUMENT_TOUCH_INTERVAL_SECONDS <= now:
+                    self._touch(doc_id, now)
+                    touched_at = now
+                self._remember(doc_id, text, touched_at)
+                return doc_id
+
+        # New document: compress outside the lock
+        content = zlib.compress(text.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documents (doc_id, content, chars, created_at, last_used_at) VALUES (?, ?, ?, ?, ?)",
+                (doc_id, content, len(text), now, now),
+            )
+            self._conn.commit()
+            self._counters["writes"] += 1
+            self._remember(doc_id, text, now)
+
+        if now - self._last_sweep >= self.sweep_interval_seconds:
+            self.sweep()
+        return doc_id
+
+    def sweep(self) -> int:
+        """
+        Delete documents unused past the TTL and return how many were deleted.
+        """
+        now = time.time()
+        with self._lock:
+            self._last_sweep = now
+            cursor = self._conn.execute(
+                "DELETE FROM documents WHERE last_used_at + ? <= ?",
+                (self.ttl_seconds, now),
+            )
+            self._conn.commit()
+            removed = cursor.rowcount
+            self._counters["swept_expired"] += removed
+            for doc_id, (text, touched_at) in list(self._memory.items()):
+                if touched_at + self.ttl_seconds <= now:
+                    del self._memory[doc_id]
+                    self._memory_chars -= len(text)
+        return removed
+
+    def get(self, doc_id: str) -> Optional[str]:
+        """
+        Return the text of a registered document, or None if it is unknown or expired.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(doc_id)
+            if entry is not None and entry[1] + self.ttl_seconds <= now:
+                # Unused past its TTL; the disk lookup below expires it
+                self._memory_chars -= len(self._memory.pop(doc_id)[0])
+                entry = None
+            if entry is not None:
+                text, touched_at = entry
+                self._counters["memory_hits"] += 1
+                if touched_at + DOCUMENT_TOUCH_INTERVAL_SECONDS <= now:
+                    self._touch(doc_id, now)
+                    touched_at = now
+                self._remember(doc_id, text, touched_at)
+                return text
+
+            row = self._conn.execute(
+                "SELECT content, last_used_at FROM documents WHERE doc_id = ?",
+                (doc_id,),
+            ).fetchone()
+            if row is None:
+                self._counters["misses"] += 1
+                return None
+
+            content, last_used_at = row
+            if last_used_at + self.ttl_seconds <= now:
+                self._conn.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,))
+                self._conn.commit()
+                self._counters["expired"] += 1
+                self._counters["misses"] += 1
+                return None
+
+            self._counters["disk_hits"] += 1
+            self._touch(doc_id, now)
+            text = zlib.decompress(content).decode("utf-8")
+            self._remember(doc_id, text, now)
+        return text
+
+    def _touch(self, doc_id: str, now: float):
+        self._conn.execute("UPDATE documents SET last_used_at = ? WHERE doc_id = ?", (now, doc_id))
+        self._conn.commit()
+
+    def _remember(self, doc_id: str, text: str, touched_at: float):
+        previous = self._memory.pop(doc_id, None)
+        if previous is not None:
+            self._memory_chars -= len(previous[0])
+        if len(text) > self.max_memory_chars:
+            return
+        self._memory[doc_id] = (text, touched_at)
+        self._memory_chars += len(text)
+        while self._memory_chars > self.max_memory_chars:
+            _, (evicted, _) = self._memory.popitem(last=False)
+            self._memory_chars -= len(evicted)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Hit/miss counters, document count and stored sizes.
+        """
+        with self._lock:
+            count, chars, compressed = self._conn.execute(
+                "SELECT COUNT(*), SUM(chars), SUM(LENGTH(content)) FROM documents"
+            ).fetchone()
+            counters = dict(self._counters)
+            counters["memory_entries"] = len(self._memory)
+            counters["memory_chars"] = self._memory_chars
+
+        lookups = counters["memory_hits"] + counters["disk_hits"] + counters["misses"]
+        hits = counters["memory_hits"] + counters["disk_hits"]
+        counters["hit_rate"] = round(hits / lookups, 4) if lookups else 0.0
+        counters["documents"] = count
+        counters["chars"] = chars or 0
+        counters["compressed_bytes"] = compressed or 0
+        return counters
+
+
+# Shared instance used by the document endpoints in app.py
+document_store = DocumentStore(
+    DOCUMENT_STORE_PATH,
+    ttl_seconds=DOCUMENT_STORE_TTL_SECONDS,
+    max_memory_chars=DOCUMENT_STORE_MEMORY_CHARS,
+    sweep_interval_seconds=DOCUMENT_STORE_SWEEP_INTERVAL_SECONDS,
+)
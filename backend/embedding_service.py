@@ -0,0 +1,212 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List
+
+import numpy as np
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_MAX_BATCH_SIZE = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "64"))
+EMBEDDING_MAX_WAIT_MS = float(os.getenv("EMBEDDING_MAX_WAIT_MS", "10"))
+
+# The model is loaded once per process and shared by every request
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_model():
+    """
+    Returns the process-wide SentenceTransformer, loading it on first use.
+    """
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from sentence_transformers import SentenceTransformer
+                _model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+    return _model
+
+
+class EmbeddingService:
+    """
+    Dynamic-batching front end for the embedding model.
+
+    Texts from concurrent callers are queued and encoded together in batches
+    of up to `max_batch_size`, waiting at most `max_wait_ms` after the first
+    queued text for more work to arrive.
+
+    Queries and bulk work (index builds) wait in separate lanes, and batches
+    are filled from the query lane first. A bulk caller enqueues one batch
+    worth of texts at a time, so a chat query waits behind at most one batch
+    of another document's index build rather than all of it.
+    """
+
+    def __init__(self, max_batch_size: int = 64, max_wait_ms: float = 10):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queries = deque()
+        self._bulk = deque()
+        self._wakeup = None
+        self._worker = None
+        self._stats = {
+            "requests": 0,
+            "bulk_requests": 0,
+            "texts": 0,
+            "batches": 0,
+            "encode_seconds": 0.0,
+            "queue_wait_seconds": 0.0,
+            "max_batch_seen": 0,
+        }
+
+    def _ensure_worker(self):
+        if self._worker is None or self._worker.done():
+            # Texts queued for a worker that stopped would otherwise wait forever
+            self._fail_queued(RuntimeError("Embedding worker stopped"))
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def embed(self, texts: List[str], bulk: bool = False) -> np.ndarray:
+        """
+        Embed `texts`, returning a float32 array of shape (len(texts), dim).
+
+        Pass `bulk=True` for large background jobs such as index builds so
+        they yield to queries.
+        """
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        self._ensure_worker()
+        self._stats["bulk_requests" if bulk else "requests"] += 1
+        if not bulk:
+            vectors = await self._submit(self._queries, texts)
+        else:
+            vectors = []
+            for start in range(0, len(texts), self.max_batch_size):
+                vectors.extend(await self._submit(self._bulk, texts[start:start + self.max_batch_size]))
+        return np.stack(vectors).astype(np.float32, copy=False)
+
+    async def _submit(self, lane: deque, texts: List[str]) -> List[np.ndarray]:
+        loop = asyncio.get_running_loop()
+        enqueued_at = time.perf_counter()
+        futures = []
+        for text in texts:
+            future = loop.create_future()
+            lane.append((text, future, enqueued_at))
+            futures.append(future)
+        self._wakeup.set()
+        return await asyncio.gather(*futures)
+
+    def _take(self, batch: list):
+        for lane in (self._queries, self._bulk):
+            while lane and len(batch) < self.max_batch_size:
+                batch.append(lane.popleft())
+
+    @staticmethod
+    def _fail(items, error: BaseException):
+        for _, future, _ in items:
+            if not future.done():
+                future.set_exception(error)
+
+    def _fail_queued(self, error: BaseException):
+        for lane in (self._queries, self._bulk):
+            self._fail(lane, error)
+            lane.clear()
+
+    async def _run(self):
+        batch = []
+        try:
+            while True:
+                batch = []
+                await self._fill_batch(batch)
+                try:
+                    await self._process(batch)
+                except Exception as e:
+                    # A bad batch fails its own callers only
+                    self._fail(batch, e)
+        finally:
+            # Cancelled (e.g. at shutdown): nobody is left to serve queued callers
+            error = RuntimeError("Embedding worker stopped")
+            self._fail(batch, error)
+            self._fail_queued(error)
+
+    async def _fill_batch(self, batch: list):
+        """
+        Fill `batch` in place, so the worker can fail the taken items if it is cancelled midway
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            while not self._queries and not self._bulk:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+
+            self._take(batch)
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                self._take(batch)
+
+            # Drop work whose caller has already gone away
+            batch[:] = [item for item in batch if not item[1].done()]
+            if batch:
+                return
+
+    async def _process(self, batch: list):
+        loop = asyncio.get_running_loop()
+        texts = [item[0] for item in batch]
+        started = time.perf_counter()
+        vectors = await loop.run_in_executor(None, self._encode, texts)
+        finished = time.perf_counter()
+        if len(vectors) != len(batch):
+            raise RuntimeError(f"Embedding model returned {len(vectors)} vectors for {len(batch)} texts")
+
+        self._stats["batches"] += 1
+        self._stats["texts"] += len(batch)
+        self._stats["encode_seconds"] += finished - started
+        self._stats["queue_wait_seconds"] += sum(started - item[2] for item in batch)
+        self._stats["max_batch_seen"] = max(self._stats["max_batch_seen"], len(batch))
+
+        for (_, future, _), vector in zip(batch, vectors):
+            if not future.done():
+                future.set_result(vector)
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        return get_model().encode(texts, batch_size=len(texts), convert_to_numpy=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Throughput and latency counters for the batching queue.
+        """
+        stats = dict(self._stats)
+        batches = stats["batches"]
+        texts = stats["texts"]
+        stats["model"] = EMBEDDING_MODEL_NAME
+        stats["model_loaded"] = _model is not None
+        stats["max_batch_size"] = self.max_batch_size
+        stats["max_wait_ms"] = self.max_wait * 1000.0
+        stats["avg_batch_size"] = round(texts / batches, 2) if batches else 0.0
+        stats["avg_encode_ms"] = round(stats["encode_seconds"] * 1000.0 / batches, 2) if batches else 0.0
+        stats["avg_queue_wait_ms"] = round(stats["queue_wait_seconds"] * 1000.0 / texts, 2) if texts else 0.0
+        stats["texts_per_second"] = round(texts / stats["encode_seconds"], 1) if stats["encode_seconds"] else 0.0
+        stats["queued"] = len(self._queries)
+        stats["bulk_queued"] = len(self._bulk)
+        return stats
+
+
+# Shared instance used by the retrieval helpers
+embedding_service = EmbeddingService(
+    max_batch_size=EMBEDDING_MAX_BATCH_SIZE,
+    max_wait_ms=EMBEDDING_MAX_WAIT_MS,
+)
@@ -0,0 +1,166 @@
+import asyncio
+import hashlib
+import os
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+import llm_gateway
+from response_cache import response_cache
+
+# Load environment variables
+load_dotenv()
+
+# The most recent turns (user + assistant message pairs) are always sent verbatim
+CHAT_HISTORY_KEEP_TURNS = int(os.getenv("CHAT_HISTORY_KEEP_TURNS", "4"))
+# Older messages are folded into the summary once at least this many are pending
+CHAT_HISTORY_FOLD_MIN_MESSAGES = int(os.getenv("CHAT_HISTORY_FOLD_MIN_MESSAGES", "4"))
+CHAT_HISTORY_SUMMARY_MODEL = os.getenv("CHAT_HISTORY_SUMMARY_MODEL", "llama-3.1-8b-instant")
+CHAT_HISTORY_SUMMARY_MAX_TOKENS = 512
+CHAT_HISTORY_MAX_SUMMARIES = int(os.getenv("CHAT_HISTORY_MAX_SUMMARIES", "2048"))
+# Bump when the summary prompt changes
+CHAT_HISTORY_PROMPT_VERSION = "chat-history-v1"
+
+
+def prefix_hashes(messages: List[Dict[str, str]]) -> List[str]:
+    """
+    Rolling hashes identifying each prefix of a conversation:
+    result[n] identifies messages[:n].
+    """
+    digest = hashlib.sha256(b"").hexdigest()
+    hashes = [digest]
+    for message in messages:
+        digest = hashlib.sha256(
+            f"{digest}\0{message['role']}\0{message['content']}".encode("utf-8")
+        ).hexdigest()
+        hashes.append(digest)
+    return hashes
+
+
+class HistoryCompactor:
+    """
+    Keeps chat prompts bounded by folding older turns into a running summary.
+
+    Summaries are addressed by the hash of the conversation prefix they
+    cover, so clients need no conversation ID: any request whose history
+    starts with a summarized prefix reuses it. Folding happens in background
+    tasks, off the request path; until a fold lands, the messages it will
+    cover are still sent verbatim.
+    """
+
+    def __init__(self, keep_turns: int = 4, fold_min_messages: int = 4, max_summaries: int = 2048):
+        self.keep_messages = keep_turns * 2
+        self.fold_min_messages = fold_min_messages
+        self.max_summaries = max_summaries
+        self._summaries = OrderedDict()  # prefix hash -> summary text
+        self._in_flight = {}  # target prefix hash -> fold task
+        self._counters = {"compacted_requests": 0, "folds": 0, "fold_errors": 0, "messages_folded": 0}
+
+    async def compact(self, messages: List[Dict[str, str]]) -> Tuple[Optional[str], List[Dict[str, str]]]:
+        """
+        Return (summary, messages to send verbatim) for a conversation.
+
+        The summary covers the longest already-summarized prefix of the older
+        messages. A fold of the remaining older messages is scheduled in the
+        background when enough of them are pending.
+        """
+        older_count = len(messages) - self.keep_messages
+        if older_count <= 0:
+            return None, messages
+
+        hashes = prefix_hashes(messages[:older_count])
+        covered, summary = await self._find_summary(hashes)
+        if covered:
+            self._counters["compacted_requests"] += 1
+
+        if older_count - covered >= self.fold_min_messages and llm_gateway.is_available():
+            self._schedule_fold(summary, messages[covered:older_count], hashes[older_count])
+
+        return summary, messages[covered:]
+
+    async def _find_summary(self, hashes: List[str]) -> Tuple[int, Optional[str]]:
+        for covered in range(len(hashes) - 1, 0, -1):
+            summary = self._summaries.get(hashes[covered])
+            if summary is not None:
+                self._summaries.move_to_end(hashes[covered])
+                return covered, summary
+
+        # After a restart only the full prefix is looked up on disk
+        summary = await response_cache.get(self._cache_key(hashes[-1]))
+        if summary is not None:
+            self._remember(hashes[-1], summary)
+            return len(hashes) - 1, summary
+        return 0, None
+
+    def _schedule_fold(self, summary: Optional[str], pending: List[Dict[str, str]], target_hash: str):
+        if target_hash in self._in_flight:
+            return
+        task = asyncio.ensure_future(self._fold(summary, pending, target_hash))
+        self._in_flight[target_hash] = task
+        task.add_done_callback(lambda _: self._in_flight.pop(target_hash, None))
+
+    async def _fold(self, summary: Optional[str], pending: List[Dict[str, str]], target_hash: str):
+        transcript = "\n".join(f"{message['role']}: {message['content']}" for message in pending)
+        prompt = f"""
+        Update the running summary of a tutoring conversation with the new messages below.
+
+        Keep every fact, question, misconception and conclusion the student or the tutor
+        has raised, so the conversation can continue without the original messages.
+        Write plain prose, at most 250 words.
+
+        Summary so far:
+        {summary or "(none)"}
+
+        New messages:
+        {transcript}
+        """
+        try:
+            new_summary = await llm_gateway.chat_completion(
+                model=CHAT_HISTORY_SUMMARY_MODEL,
+                messages=[
+                    {"role": "system", "content": "You maintain concise, faithful summaries of conversations."},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.2,
+                max_tokens=CHAT_HISTORY_SUMMARY_MAX_TOKENS
+            )
+        except Exception as e:
+            self._counters["fold_errors"] += 1
+            print(f"Warning: could not summarize chat history: {e}")
+            return
+
+        self._remember(target_hash, new_summary)
+        await response_cache.set(self._cache_key(target_hash), new_summary)
+        self._counters["folds"] += 1
+        self._counters["messages_folded"] += len(pending)
+
+    @staticmethod
+    def _cache_key(prefix_hash: str) -> str:
+        return response_cache.make_key(
+            kind="chat_history",
+            version=CHAT_HISTORY_PROMPT_VERSION,
+            model=CHAT_HISTORY_SUMMARY_MODEL,
+            prefix=prefix_hash,
+        )
+
+    def _remember(self, prefix_hash: str, summary: str):
+        self._summaries[prefix_hash] = summary
+        self._summaries.move_to_end(prefix_hash)
+        while len(self._summaries) > self.max_summaries:
+            self._summaries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._counters,
+            "summaries": len(self._summaries),
+            "folds_in_flight": len(self._in_flight),
+        }
+
+
+# Shared instance used by the chat endpoints
+history_compactor = HistoryCompactor(
+    keep_turns=CHAT_HISTORY_KEEP_TURNS,
+    fold_min_messages=CHAT_HISTORY_FOLD_MIN_MESSAGES,
+    max_summaries=CHAT_HISTORY_MAX_SUMMARIES,
+)
@@ -0,0 +1,40 @@
+import os
+
+import httpx
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+HTTP_POOL_MAX_CONNECTIONS = int(os.getenv("HTTP_POOL_MAX_CONNECTIONS", "100"))
+HTTP_POOL_TIMEOUT_SECONDS = float(os.getenv("HTTP_POOL_TIMEOUT_SECONDS", "30"))
+
+# Lazily created so the client binds to the running event loop
+_client = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Returns the shared async HTTP client used for outbound downloads.
+    """
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=HTTP_POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_POOL_MAX_CONNECTIONS,
+            ),
+            timeout=httpx.Timeout(HTTP_POOL_TIMEOUT_SECONDS),
+            follow_redirects=True,
+        )
+    return _client
+
+
+async def close():
+    """
+    Close the pooled connections. Called on application shutdown.
+    """
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
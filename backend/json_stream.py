@@ -0,0 +1,86 @@
+import json
+from typing import Any, List
+
+
+class JsonArrayStream:
+    """
+    Incremental parser for the objects of a JSON array that arrives in pieces.
+
+    Feed it text as a model streams it; each object element of the first
+    array in the document is returned as soon as its closing brace arrives.
+    The array may be the document itself or a value inside a top-level
+    object (e.g. {"questions": [...]}). Text before the document starts is
+    skipped. Every character is scanned once, and text is dropped from the
+    buffer once the object it belongs to has been returned.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._position = 0  # next character of the buffer to scan
+        self._depth = 0
+        self._array_depth = None  # depth inside the array being read
+        self._element_start = None  # buffer offset of the current element
+        self._in_string = False
+        self._escaped = False
+        self._started = False
+        self.finished = False
+
+    def feed(self, text: str) -> List[Any]:
+        """
+        Add streamed text and return the array elements completed by it.
+        """
+        if self.finished:
+            return []
+        self._buffer += text
+        elements = []
+        buffer = self._buffer
+        position = self._position
+        length = len(buffer)
+
+        while position < length:
+            char = buffer[position]
+            position += 1
+
+            if not self._started:
+                if char in "{[":
+                    self._started = True
+                else:
+                    continue
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+                if char == "[" and self._array_depth is None:
+                    self._array_depth = self._depth
+                elif char == "{" and self._array_depth is not None and self._depth == self._array_depth + 1:
+                    self._element_start = position - 1
+            elif char in "}]":
+                if self._element_start is not None and char == "}" and self._depth == self._array_depth + 1:
+                    try:
+                        elements.append(json.loads(buffer[self._element_start:position]))
+                    except ValueError:
+                        # A malformed element is skipped; the rest of the array can still be read
+                        pass
+                    self._element_start = None
+                elif char == "]" and self._depth == self._array_depth:
+                    self.finished = True
+                    break
+                self._depth -= 1
+
+        # Keep only the unfinished element, if any
+        keep_from = self._element_start if self._element_start is not None else position
+        self._buffer = buffer[keep_from:]
+        self._position = position - keep_from
+        if self._element_start is not None:
+            self._element_start = 0
+        return elements
@@ -0,0 +1,144 @@
+import asyncio
+import os
+from typing import AsyncIterator, Dict, List, Optional
+
+import httpx
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+
+# Default model used by the tutor, summary and quiz endpoints
+DEFAULT_MODEL = "llama-3.3-70b-versatile"
+
+# Gateway tuning, all overridable from the environment
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+LLM_CONNECT_TIMEOUT_SECONDS = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "5"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "64"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+
+# Lazily created so the client and semaphore bind to the running event loop
+_client = None
+_semaphore = None
+
+
+def is_available() -> bool:
+    """
+    Returns True when an API key is configured and the groq package is installed.
+    """
+    if not GROQ_API_KEY:
+        return False
+    try:
+        import groq  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def get_client():
+    """
+    Returns the shared AsyncGroq client backed by a pooled HTTP connection.
+    """
+    global _client
+    if _client is None:
+        from groq import AsyncGroq
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_CONNECTIONS,
+            ),
+            timeout=httpx.Timeout(LLM_TIMEOUT_SECONDS, connect=LLM_CONNECT_TIMEOUT_SECONDS),
+        )
+        _client = AsyncGroq(
+            api_key=GROQ_API_KEY,
+            http_client=http_client,
+            max_retries=LLM_MAX_RETRIES,
+        )
+    return _client
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    return _semaphore
+
+
+async def chat_completion(
+    messages: List[Dict[str, str]],
+    model: str = DEFAULT_MODEL,
+    temperature: float = 0.7,
+    max_tokens: int = 1024,
+    response_format: Optional[Dict[str, str]] = None,
+    timeout: Optional[float] = None,
+) -> str:
+    """
+    Run a chat completion through the shared client and return the message content.
+
+    The call waits for a free concurrency slot, then is bounded by `timeout`
+    (defaults to LLM_TIMEOUT_SECONDS). Raises asyncio.TimeoutError on timeout.
+    """
+    kwargs = {
+        "model": model,
+        "messages": messages,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+    }
+    if response_format:
+        kwargs["response_format"] = response_format
+
+    async with _get_semaphore():
+        response = await asyncio.wait_for(
+            get_client().chat.completions.create(**kwargs),
+            timeout=timeout or LLM_TIMEOUT_SECONDS,
+        )
+    return response.choices[0].message.content
+
+
+async def stream_chat_completion(
+    messages: List[Dict[str, str]],
+    model: str = DEFAULT_MODEL,
+    temperature: float = 0.7,
+    max_tokens: int = 1024,
+    timeout: Optional[float] = None,
+) -> AsyncIterator[str]:
+    """
+    Stream a chat completion, yielding content deltas as they arrive.
+
+    A concurrency slot is held for the lifetime of the stream. `timeout` bounds
+    the time to open the stream; the upstream response is closed when the
+    consumer stops iterating.
+    """
+    async with _get_semaphore():
+        stream = await asyncio.wait_for(
+            get_client().chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True,
+            ),
+            timeout=timeout or LLM_TIMEOUT_SECONDS,
+        )
+        try:
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                content = chunk.choices[0].delta.content
+                if content:
+                    yield content
+        finally:
+            await stream.close()
+
+
+async def close():
+    """
+    Close the pooled HTTP connection. Called on application shutdown.
+    """
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
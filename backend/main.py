@@ -3,13 +3,16 @@ from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Optional, List
 import json
-from groq import Groq
+import asyncio
+import llm_gateway
+from transcript_store import transcript_store
+from subtitle_parser import parse_subtitles
+import pdf_extractor
+from context_budget import ContextBudget, fit_document
+from session_store import session_store
 import os
-import yt_dlp
-import fitz  # PyMuPDF for PDF processing
 from dotenv import load_dotenv
 from youtube_transcript_api import YouTubeTranscriptApi
-import re
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
@@ -25,14 +28,28 @@ app.add_middleware(
 )
 
 load_dotenv()
-# Initialize Groq client
-groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+# Groq calls go through the shared async gateway in llm_gateway.py
 
 # Add this with your other environment variables
 YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
 
+LLM_MODEL = "mixtral-8x7b-32768"
+LLM_MAX_TOKENS = 1000
+# Room held back for the quiz prompts' instructions and JSON format
+QUIZ_FORMAT_INSTRUCTIONS = (
+    "Generate 5 multiple choice questions based on the following content. "
+    "Format your response as a JSON object with this exact structure: "
+    '{"questions": [{"question": "Question text here", "options": ["(Correct) Option A", "Option B", "Option C", "Option D"]}]}'
+)
+
 print("")
 
+@app.on_event("shutdown")
+async def shutdown_llm_gateway():
+    await llm_gateway.close()
+    pdf_extractor.close()
+    await session_store.close()
+
 class ChatMessage(BaseModel):
     session_id: str
     message: str
@@ -60,115 +77,142 @@ class TopicRequest(BaseModel):
 class GenerateResponse(BaseModel):
     explanation: str
 
-@app.get("/fetch-transcript-video/{video_id}/{input}", response_model=TranscriptResponse)
-async def fetch_transcript(video_id: str, input: str):
+def fetch_caption_text(video_id: str) -> str:
+    """
+    Fetch the captions of a YouTube video as plain text, checking the shared
+    transcript store before calling out to YouTube
+    """
+    # Serve transcripts fetched before by any ingest path: English when there
+    # is one, otherwise the track the Data API fallback resolved to
+    stored = transcript_store.find(video_id, preferred_langs=("en",))
+    if stored:
+        return stored["transcript"]
+
+    # First try YouTubeTranscriptApi
     try:
-        # First try YouTubeTranscriptApi
+        transcript = YouTubeTranscriptApi.get_transcript(video_id)
+        full_text = " ".join([entry['text'] for entry in transcript])
+        provider = "youtube_transcript_api"
+        lang = "en"
+    except Exception as transcript_error:
+        # Fallback to YouTube Data API
         try:
-            transcript = YouTubeTranscriptApi.get_transcript(video_id)
-            full_text = " ".join([entry['text'] for entry in transcript])
-        except Exception as transcript_error:
-            # Fallback to YouTube Data API
-            try:
-                youtube = build('youtube', 'v3', developerKey=YOUTUBE_API_KEY)
-                
-                # Get captions track
-                captions_response = youtube.captions().list(
-                    part='snippet',
-                    videoId=video_id
-                ).execute()
-                
-                if not captions_response.get('items'):
-                    raise HTTPException(
-                        status_code=400,
-                        detail="No captions available for this video"
-                    )
-                
-                # Get the first English caption track or default to the first available
-                caption_id = None
-                for item in captions_response['items']:
-                    if item['snippet']['language'] == 'en':
-                        caption_id = item['id']
-                        break
-                if not caption_id:
-                    caption_id = captions_response['items'][0]['id']
-                
-                # Download the caption track
-                caption = youtube.captions().download(
-                    id=caption_id,
-                    tfmt='srt'
-                ).execute()
-                
-                # Convert caption to text (remove timecodes and formatting)
-                full_text = ' '.join(
-                    line for line in caption.decode('utf-8').split('\n')
-                    if not line.strip().isdigit() and 
-                    not '-->' in line and 
-                    line.strip()
-                )
-                
-            except HttpError as api_error:
+            youtube = build('youtube', 'v3', developerKey=YOUTUBE_API_KEY)
+
+            # Get captions track
+            captions_response = youtube.captions().list(
+                part='snippet',
+                videoId=video_id
+            ).execute()
+
+            if not captions_response.get('items'):
                 raise HTTPException(
                     status_code=400,
-                    detail=f"YouTube API error: {str(api_error)}"
+                    detail="No captions available for this video"
                 )
 
+            # Get the first English caption track or default to the first available
+            track = None
+            for item in captions_response['items']:
+                if item['snippet']['language'] == 'en':
+                    track = item
+                    break
+            if not track:
+                track = captions_response['items'][0]
+            # Stored under the track's own language, so English lookups never get another language
+            lang = track['snippet'].get('language') or "und"
+
+            # Download the caption track
+            caption = youtube.captions().download(
+                id=track['id'],
+                tfmt='srt'
+            ).execute()
+
+            # Convert caption to text (remove timecodes, formatting and repeated lines)
+            full_text, _ = parse_subtitles(caption.decode('utf-8'))
+            provider = "youtube_data_api"
+
+        except HttpError as api_error:
+            raise HTTPException(
+                status_code=400,
+                detail=f"YouTube API error: {str(api_error)}"
+            )
+
+    transcript_store.put(video_id, full_text, provider=provider, lang=lang)
+    return full_text
+
+@app.get("/fetch-transcript-video/{video_id}/{input}", response_model=TranscriptResponse)
+async def fetch_transcript(video_id: str, input: str):
+    try:
+        # The YouTube clients are synchronous, so keep them off the event loop
+        full_text = await asyncio.to_thread(fetch_caption_text, video_id)
+
+        # Trim the captions to what the model's context window leaves room for
+        full_text = fit_document(full_text, LLM_MODEL, LLM_MAX_TOKENS, input, "Generate insights from the following content: and focus on the following topic: and return the content in markdown format")
+
         if input == "":       
             prompt = f"Modify the following text to a markdown format: {full_text}"
         else:
             prompt = f"Generate insights from the following content: {full_text} and focus on the following topic: {input} and return the content in markdown format"
             
-        response = groq_client.chat.completions.create(
-            model="mixtral-8x7b-32768",
+        content = await llm_gateway.chat_completion(
+            model=LLM_MODEL,
             messages=[{"role": "user", "content": prompt}], 
             temperature=0.7,
-            max_tokens=1000
+            max_tokens=LLM_MAX_TOKENS
         )
-        content = response.choices[0].message.content
         return TranscriptResponse(transcript=content)
         
     except Exception as e:
         print(f"Error: {str(e)}")  # Debug print
         raise HTTPException(status_code=400, detail=str(e))
 
-# In-memory session storage
-session_store = {}
+@app.get("/metrics")
+async def metrics():
+    """
+    Session store size and eviction counters
+    """
+    return {"sessions": await session_store.stats()}
 
 @app.post("/n0-chat")
 async def chat_endpoint(chat_message: ChatMessage):
-    # Get session context from in-memory store
-    context = session_store.get(chat_message.session_id, {"history": []})
+    # Get the session history; the store caps and evicts it
+    history = await session_store.get_history(chat_message.session_id)
     
-    # Prepare message for LLM
+    # Prepare message for LLM, dropping the oldest turns that no longer fit the context window
+    system_prompt = "You are a helpful training assistant. Guide the user through their learning material and help them understand the content."
+    budget = ContextBudget(LLM_MODEL, LLM_MAX_TOKENS)
+    budget.reserve(system_prompt)
     messages = [
-        {"role": "system", "content": "You are a helpful training assistant. Guide the user through their learning material and help them understand the content."},
-        *[{"role": "user" if i % 2 == 0 else "assistant", "content": msg} 
-          for i, msg in enumerate(context["history"])],
-        {"role": "user", "content": chat_message.message}
+        {"role": "system", "content": system_prompt},
+        *budget.fit_messages([
+            *[{"role": "user" if i % 2 == 0 else "assistant", "content": msg} 
+              for i, msg in enumerate(history)],
+            {"role": "user", "content": chat_message.message}
+        ])
     ]
     
     # Get response from Groq
-    response = groq_client.chat.completions.create(
-        model="mixtral-8x7b-32768",
+    content = await llm_gateway.chat_completion(
+        model=LLM_MODEL,
         messages=messages,
         temperature=0.7,
-        max_tokens=1000
+        max_tokens=LLM_MAX_TOKENS
     )
     
     # Update session history
-    context["history"].extend([chat_message.message, response.choices[0].message.content])
-    session_store[chat_message.session_id] = context  # Update in-memory store
-    content = response.choices[0].message.content
+    await session_store.append(chat_message.session_id, chat_message.message, content)
 
+    quiz_content = fit_document(content, LLM_MODEL, 1024, QUIZ_FORMAT_INSTRUCTIONS)
     prompt = f"""
     Generate 5 multiple choice questions based on the following content:
-    {content.response[:2000]}  # Limiting content length
+    {quiz_content}
     
     Format each question with 4 options and mark the correct answer.
     """
     
-    response = groq_client.chat.completions.create(
-        model="mixtral-8x7b-32768",
+    response = await llm_gateway.chat_completion(
+        model=LLM_MODEL,
         messages=[{"role": "user", "content": prompt}],
         temperature=0.7
     )
@@ -178,23 +222,13 @@ async def chat_endpoint(chat_message: ChatMessage):
 @app.post("/upload/pdf")
 async def upload_pdf(file: UploadFile = File(...)):
     try:
-        # Save PDF temporarily
-        content = await file.read()
-        pdf_path = f"temp_{file.filename}"
-        with open(pdf_path, "wb") as f:
-            f.write(content)
-        
-        # Extract text from PDF
-        doc = fitz.open(pdf_path)
-        text = ""
-        for page in doc:
-            text += page.get_text()
-        
-        # Clean up
-        doc.close()
-        os.remove(pdf_path)
+        # Extract text straight from the uploaded bytes, no temp file
+        extracted = await pdf_extractor.extract_pdf(await file.read())
         
-        return {"content": text}
+        return {
+            "content": extracted.text,
+            "pages": [{"page": page.number, "offset": page.offset} for page in extracted.pages]
+        }
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -202,10 +236,12 @@ async def upload_pdf(file: UploadFile = File(...)):
 @app.post("/generate_quiz")
 async def generate_quiz(resource: Resource):
 
-    # Use Groq to generate quiz questions based on content
+    # Use Groq to generate quiz questions based on content, trimmed to leave
+    # room for the instructions and the requested answer
+    content = fit_document(resource.content, LLM_MODEL, LLM_MAX_TOKENS, QUIZ_FORMAT_INSTRUCTIONS)
     prompt = f"""
     Generate 5 multiple choice questions based on the following content:
-    {resource.content}
+    {content}
     
     Format your response as a JSON object with this exact structure:
     {{
@@ -218,17 +254,17 @@ async def generate_quiz(resource: Resource):
     }}
     """
     
-    quiz_response = groq_client.chat.completions.create(
-        model="mixtral-8x7b-32768",
+    quiz_text = await llm_gateway.chat_completion(
+        model=LLM_MODEL,
         messages=[{"role": "user", "content": prompt}],
         temperature=0.1,
-        max_tokens=1000
+        max_tokens=LLM_MAX_TOKENS
     )
     
     # Parse and structure the quiz questions
     try:
         # First, get the response content and parse it as JSON
-        quiz_content = json.loads(quiz_response.choices[0].message.content)
+        quiz_content = json.loads(quiz_text)
         questions = []
         
         for q in quiz_content["questions"]:
@@ -245,7 +281,7 @@ async def generate_quiz(resource: Resource):
         
         return {"questions": questions}
     except json.JSONDecodeError as e:
-        print("Failed to parse JSON:", quiz_response.choices[0].message.content)
+        print("Failed to parse JSON:", quiz_text)
         raise HTTPException(status_code=500, detail="Failed to generate valid quiz questions")
     except Exception as e:
         print("Error processing quiz:", str(e))
@@ -257,39 +293,42 @@ def find_correct_option(options):
 @app.post("/chat")
 async def generate_content(request: TopicRequest):
 
-    # Get session context from in-memory store
-    context = session_store.get(request.session_id, {"history": []})
+    # Get the session history; the store caps and evicts it
+    history = await session_store.get_history(request.session_id)
 
-    # Prepare message for LLM
+    # Prepare message for LLM, dropping the oldest turns that no longer fit the context window
+    system_prompt = "You are a helpful training assistant. Guide the user through their learning material and help them understand the content."
+    budget = ContextBudget(LLM_MODEL, LLM_MAX_TOKENS)
+    budget.reserve(system_prompt)
     messages = [
-        {"role": "system", "content": "You are a helpful training assistant. Guide the user through their learning material and help them understand the content."},
-        *[{"role": "user" if i % 2 == 0 else "assistant", "content": msg} 
-          for i, msg in enumerate(context["history"])],
-        {"role": "user", "content": request.text}
+        {"role": "system", "content": system_prompt},
+        *budget.fit_messages([
+            *[{"role": "user" if i % 2 == 0 else "assistant", "content": msg} 
+              for i, msg in enumerate(history)],
+            {"role": "user", "content": request.text}
+        ])
     ]
     
     # Get response from Groq
-    response = groq_client.chat.completions.create(
-        model="mixtral-8x7b-32768",
+    content = await llm_gateway.chat_completion(
+        model=LLM_MODEL,
         messages=messages,
         temperature=0.7,
-        max_tokens=1000
+        max_tokens=LLM_MAX_TOKENS
     )
     
     # Update session history
-    context["history"].extend([request.text, response.choices[0].message.content])
-    session_store[request.session_id] = context  # Update in-memory store
-    content = response.choices[0].message.content
+    await session_store.append(request.session_id, request.text, content)
 
     # Generate explanation about the topic
-    explanation_prompt = f"Explain the following topic in detail: {content[:2000]} with markdown formatting."
-    explanation_response = groq_client.chat.completions.create(
-        model="mixtral-8x7b-32768",
+    topic = fit_document(content, LLM_MODEL, LLM_MAX_TOKENS, "Explain the following topic in detail: with markdown formatting.")
+    explanation_prompt = f"Explain the following topic in detail: {topic} with markdown formatting."
+    explanation = await llm_gateway.chat_completion(
+        model=LLM_MODEL,
         messages=[{"role": "user", "content": explanation_prompt}],
         temperature=0.7,
-        max_tokens=1000
+        max_tokens=LLM_MAX_TOKENS
     )
-    explanation = explanation_response.choices[0].message.content
     return {"explanation": explanation}
 
 if __name__ == "__main__":
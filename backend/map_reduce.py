@@ -0,0 +1,129 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Sequence, Tuple
+
+
+async def bounded_map(
+    items: Sequence[Any],
+    map_fn: Callable[[int, Any], Awaitable[Any]],
+    max_concurrency: int = 4,
+) -> Tuple[List[Any], Dict[str, float]]:
+    """
+    Apply `map_fn(index, item)` to every item concurrently, with at most
+    `max_concurrency` calls in flight. Results keep the input order.
+
+    If a call fails or this is cancelled, the calls still running are
+    cancelled and awaited before the error propagates, so none outlives the
+    resources (temp files, connections) its caller is about to release.
+    Failures of other calls are logged rather than lost.
+
+    Returns (results, timings) where timings holds the wall-clock time of the
+    stage and the slowest single call, in milliseconds.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    durations = [0.0] * len(items)
+
+    async def run(index: int, item: Any):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                return await map_fn(index, item)
+            finally:
+                durations[index] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    tasks = [asyncio.ensure_future(run(i, item)) for i, item in enumerate(items)]
+    try:
+        results = await asyncio.gather(*tasks)
+    except BaseException as error:
+        for task in tasks:
+            task.cancel()
+        outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+        for outcome in outcomes:
+            if isinstance(outcome, Exception) and outcome is not error:
+                print(f"Warning: concurrent map call also failed: {outcome!r}")
+        raise
+    elapsed = time.perf_counter() - started
+
+    return list(results), {
+        "map_ms": round(elapsed * 1000.0, 1),
+        "slowest_map_ms": round(max(durations, default=0.0) * 1000.0, 1),
+    }
+
+
+async def map_reduce(
+    items: Sequence[Any],
+    map_fn: Callable[[int, Any], Awaitable[Any]],
+    reduce_fn: Callable[[List[Any]], Awaitable[Any]],
+    max_concurrency: int = 4,
+) -> Tuple[Any, Dict[str, float]]:
+    """
+    Run `map_fn` over the items under a bounded semaphore, then combine the
+    partial results with a single `reduce_fn` pass.
+
+    Returns (result, timings) with per-stage wall-clock times in milliseconds.
+    """
+    partials, timings = await bounded_map(items, map_fn, max_concurrency)
+
+    started = time.perf_counter()
+    result = await reduce_fn(partials)
+    timings["reduce_ms"] = round((time.perf_counter() - started) * 1000.0, 1)
+    timings["chunks"] = len(items)
+    return result, timings
+
+
+def group_by_budget(
+    parts: Sequence[Any],
+    max_tokens: int,
+    count_tokens: Callable[[Any], int],
+    part_overhead_tokens: int = 0,
+) -> List[List[Any]]:
+    """
+    Split parts into runs of consecutive parts whose token counts, plus
+    `part_overhead_tokens` each, add up to at most `max_tokens`. A part too
+    large for the budget on its own gets a group of its own.
+    """
+    groups = []
+    group = []
+    used = 0
+    for part in parts:
+        tokens = count_tokens(part) + part_overhead_tokens
+        if group and used + tokens > max_tokens:
+            groups.append(group)
+            group = []
+            used = 0
+        group.append(part)
+        used += tokens
+    if group:
+        groups.append(group)
+    return groups
+
+
+async def reduce_to_fit(
+    partials: Sequence[Any],
+    reduce_fn: Callable[[List[Any]], Awaitable[Any]],
+    combine: Callable[[List[Any]], Any],
+    max_tokens: int,
+    count_tokens: Callable[[Any], int],
+    max_concurrency: int = 4,
+    part_overhead_tokens: int = 0,
+) -> Tuple[List[Any], int]:
+    """
+    Reduce partial results level by level until `combine(partials)` fits in
+    `max_tokens`. Each level groups consecutive partials that fit the budget
+    together and replaces every group with `reduce_fn(group)`, run
+    concurrently under a bounded semaphore.
+
+    Returns (partials, levels): the partials that fit and the number of
+    levels it took.
+    """
+    partials = list(partials)
+    levels = 0
+    while len(partials) > 1 and count_tokens(combine(partials)) > max_tokens:
+        groups = group_by_budget(partials, max_tokens, count_tokens, part_overhead_tokens)
+        if len(groups) == len(partials):
+            # No two partials fit together; pair them up so every level still halves the count
+            groups = [partials[i:i + 2] for i in range(0, len(partials), 2)]
+        partials, _ = await bounded_map(groups, lambda _, group: reduce_fn(group), max_concurrency)
+        levels += 1
+    return partials, levels
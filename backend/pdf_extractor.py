@@ -0,0 +1,128 @@
+import asyncio
+import multiprocessing
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Optional
+
+import fitz  # PyMuPDF
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Documents with fewer pages are extracted on a thread instead of the process pool
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "40"))
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(min(os.cpu_count() or 1, 8))))
+# Pages per step when a small document is extracted with progress reporting
+PDF_PROGRESS_BATCH_PAGES = 8
+
+# Pages in the assembled text are separated by a blank line
+PAGE_SEPARATOR = "\n\n"
+
+# One page of extracted text; `offset` is where it starts in ExtractedPdf.text
+Page = namedtuple("Page", ["number", "text", "offset"])
+ExtractedPdf = namedtuple("ExtractedPdf", ["text", "pages"])
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+class PDFExtractionError(Exception):
+    """
+    Raised when the uploaded bytes cannot be read as a PDF.
+    """
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn keeps workers clear of locks held by the server's threads at fork time
+        _pool = ProcessPoolExecutor(
+            max_workers=PDF_EXTRACT_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+def _open(data: bytes):
+    try:
+        return fitz.open(stream=data, filetype="pdf")
+    except Exception as e:
+        raise PDFExtractionError(f"Error reading PDF: {str(e)}")
+
+
+def _page_count(data: bytes) -> int:
+    with _open(data) as doc:
+        return doc.page_count
+
+
+def _extract_range(data: bytes, start: int, stop: int) -> List[str]:
+    """
+    Text of pages [start, stop). Runs in a pool worker for large documents.
+    """
+    with _open(data) as doc:
+        return [doc[number].get_text().strip() for number in range(start, stop)]
+
+
+def _assemble(page_texts: List[str]) -> ExtractedPdf:
+    pages = []
+    parts = []
+    offset = 0
+    for number, text in enumerate(page_texts):
+        if parts:
+            offset += len(PAGE_SEPARATOR)
+        pages.append(Page(number + 1, text, offset))
+        parts.append(text)
+        offset += len(text)
+    return ExtractedPdf(PAGE_SEPARATOR.join(parts), pages)
+
+
+async def extract_pdf(
+    data: bytes,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+) -> ExtractedPdf:
+    """
+    Extract text from PDF bytes held in memory, page by page.
+
+    Large documents are split into contiguous page ranges extracted in
+    parallel worker processes; small ones are read on a thread.
+    on_progress(pages_done, pages_total) is called as ranges finish.
+    Returns the joined text and a Page (number, text, offset) per page.
+    """
+    page_count = await asyncio.to_thread(_page_count, data)
+    progress = {"pages": 0}
+
+    def report(texts):
+        progress["pages"] += len(texts)
+        if on_progress:
+            on_progress(progress["pages"], page_count)
+        return texts
+
+    if page_count < PDF_PARALLEL_MIN_PAGES or PDF_EXTRACT_WORKERS <= 1:
+        step = PDF_PROGRESS_BATCH_PAGES if on_progress else max(page_count, 1)
+        page_texts = []
+        for start in range(0, page_count, step):
+            texts = await asyncio.to_thread(_extract_range, data, start, min(start + step, page_count))
+            page_texts.extend(report(texts))
+        return _assemble(page_texts)
+
+    loop = asyncio.get_running_loop()
+    pool = _get_pool()
+    step = -(-page_count // PDF_EXTRACT_WORKERS)
+    ranges = [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+
+    async def extract(start, stop):
+        return report(await loop.run_in_executor(pool, _extract_range, data, start, stop))
+
+    results = await asyncio.gather(*(extract(start, stop) for start, stop in ranges))
+    return _assemble([text for texts in results for text in texts])
+
+
+def close():
+    """
+    Shut down the worker pool on app shutdown.
+    """
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
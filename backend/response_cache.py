@@ -0,0 +1,228 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+RESPONSE_CACHE_DIR = os.getenv("RESPONSE_CACHE_DIR", os.path.join("cache", "responses"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "512"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+# Disk tier caps, enforced by a periodic sweep that also removes expired files
+RESPONSE_CACHE_MAX_DISK_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_DISK_ENTRIES", "20000"))
+RESPONSE_CACHE_MAX_DISK_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_DISK_BYTES", str(512 * 1024 * 1024)))
+RESPONSE_CACHE_SWEEP_INTERVAL_SECONDS = float(os.getenv("RESPONSE_CACHE_SWEEP_INTERVAL_SECONDS", "600"))
+
+
+class ResponseCache:
+    """
+    Two-tier cache for generated content: an in-memory LRU in front of
+    one JSON file per entry on disk. Entries expire after `ttl_seconds`.
+
+    Memory hits are served on the event loop; disk reads and writes run in
+    a worker thread. Writes schedule a background sweep of the disk tier at
+    most every `sweep_interval_seconds`; it removes expired files, including
+    ones that are never read again, and evicts the oldest files while the
+    tier exceeds `max_disk_entries` or `max_disk_bytes`.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_entries: int = 512,
+        ttl_seconds: float = 7 * 24 * 3600,
+        max_disk_entries: int = 20000,
+        max_disk_bytes: int = 512 * 1024 * 1024,
+        sweep_interval_seconds: float = 600,
+    ):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_entries = max_disk_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self._last_sweep = 0.0
+        self._sweep_task = None
+        self._disk = {"entries": 0, "bytes": 0}
+        self._memory = OrderedDict()
+        self._counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "writes": 0,
+            "evictions": 0,
+            "expired": 0,
+            "swept_expired": 0,
+            "swept_evicted": 0,
+        }
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def make_key(**parts: Any) -> str:
+        """
+        Hash the given request parts (transcript, prompt version, model, ...) into a cache key.
+        """
+        payload = json.dumps(parts, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    async def get(self, key: str) -> Optional[Any]:
+        """
+        Return the cached value for `key`, or None on a miss or expired entry.
+        """
+        now = time.time()
+
+        entry = self._memory.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > now:
+                self._memory.move_to_end(key)
+                self._counters["memory_hits"] += 1
+                return value
+            del self._memory[key]
+            self._counters["expired"] += 1
+
+        entry, expired = await asyncio.to_thread(self._read_file, self._path(key), now)
+        if entry is None:
+            if expired:
+                self._counters["expired"] += 1
+            self._counters["misses"] += 1
+            return None
+
+        self._remember(key, entry["expires_at"], entry["value"])
+        self._counters["disk_hits"] += 1
+        return entry["value"]
+
+    async def set(self, key: str, value: Any):
+        """
+        Store a JSON-serializable value in both tiers.
+        """
+        expires_at = time.time() + self.ttl_seconds
+        self._remember(key, expires_at, value)
+        await asyncio.to_thread(self._write_file, self._path(key), {"expires_at": expires_at, "value": value})
+        self._counters["writes"] += 1
+
+        sweeping = self._sweep_task is not None and not self._sweep_task.done()
+        if not sweeping and time.time() - self._last_sweep >= self.sweep_interval_seconds:
+            self._last_sweep = time.time()
+            self._sweep_task = asyncio.ensure_future(asyncio.to_thread(self.sweep))
+
+    def _read_file(self, path: str, now: float):
+        """
+        Return (entry, expired) for an entry file; expired files are removed.
+        """
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None, False
+        if entry.get("expires_at", 0) <= now:
+            self._remove_file(path)
+            return None, True
+        return entry, False
+
+    @staticmethod
+    def _write_file(path: str, entry: Dict[str, Any]):
+        tmp_path = f"{path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Warning: could not write response cache entry: {e}")
+
+    def sweep(self):
+        """
+        Remove expired entry files, then the oldest ones while the disk tier
+        is over its entry or byte cap. Entries are written with a fixed TTL,
+        so a file's mtime tells when it expires without reading it.
+
+        Blocking; set() runs it in a worker thread.
+        """
+        now = time.time()
+        self._last_sweep = now
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if name.endswith(".tmp"):
+                    # Left behind by an interrupted write
+                    if stat.st_mtime + self.sweep_interval_seconds <= now:
+                        self._remove_file(path)
+                    continue
+                if stat.st_mtime + self.ttl_seconds <= now:
+                    self._remove_file(path)
+                    self._counters["swept_expired"] += 1
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+
+        files.sort()
+        total_bytes = sum(size for _, size, _ in files)
+        evict = 0
+        while evict < len(files) and (
+            len(files) - evict > self.max_disk_entries or total_bytes > self.max_disk_bytes
+        ):
+            _, size, path = files[evict]
+            self._remove_file(path)
+            total_bytes -= size
+            evict += 1
+        self._counters["swept_evicted"] += evict
+        self._disk = {"entries": len(files) - evict, "bytes": total_bytes}
+
+    def _remember(self, key: str, expires_at: float, value: Any):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    @staticmethod
+    def _remove_file(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Hit/miss counters and current memory tier size.
+        """
+        hits = self._counters["memory_hits"] + self._counters["disk_hits"]
+        lookups = hits + self._counters["misses"]
+        return {
+            **self._counters,
+            "hits": hits,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            # As of the last sweep
+            "disk_entries": self._disk["entries"],
+            "disk_bytes": self._disk["bytes"],
+            "max_disk_entries": self.max_disk_entries,
+            "max_disk_bytes": self.max_disk_bytes,
+        }
+
+
+# Shared instance used by the generation endpoints
+response_cache = ResponseCache(
+    RESPONSE_CACHE_DIR,
+    max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+    ttl_seconds=RESPONSE_CACHE_TTL_SECONDS,
+    max_disk_entries=RESPONSE_CACHE_MAX_DISK_ENTRIES,
+    max_disk_bytes=RESPONSE_CACHE_MAX_DISK_BYTES,
+    sweep_interval_seconds=RESPONSE_CACHE_SWEEP_INTERVAL_SECONDS,
+)
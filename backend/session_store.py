@@ -0,0 +1,238 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# "memory" keeps sessions in this process; "redis" shares them across workers
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")
+SESSION_REDIS_URL = os.getenv("SESSION_REDIS_URL", os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+SESSION_KEY_PREFIX = os.getenv("SESSION_KEY_PREFIX", "mentormind:session:")
+# Sessions untouched for this long are dropped
+SESSION_IDLE_TTL_SECONDS = float(os.getenv("SESSION_IDLE_TTL_SECONDS", str(3600)))
+# Per-session caps; the oldest exchanges are dropped first
+SESSION_MAX_MESSAGES = int(os.getenv("SESSION_MAX_MESSAGES", "40"))
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(256 * 1024)))
+# Process-wide caps for the in-memory backend, enforced by evicting least recently used sessions
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "10000"))
+SESSION_MAX_TOTAL_BYTES = int(os.getenv("SESSION_MAX_TOTAL_BYTES", str(64 * 1024 * 1024)))
+
+
+def _message_bytes(message: str) -> int:
+    return len(message.encode("utf-8"))
+
+
+def _trim_history(history: List[str], max_messages: int, max_bytes: int) -> int:
+    """
+    Drop the oldest user/assistant pairs from `history` in place until it is
+    within both caps, keeping at least the latest exchange.
+    Pairs are dropped together so user and assistant turns stay aligned.
+    Returns the number of bytes removed.
+    """
+    removed = 0
+    size = sum(_message_bytes(message) for message in history)
+    while len(history) > 2 and (len(history) > max_messages or size > max_bytes):
+        for message in history[:2]:
+            size -= _message_bytes(message)
+            removed += _message_bytes(message)
+        del history[:2]
+    return removed
+
+
+class InMemorySessionStore:
+    """
+    Chat histories held in this process.
+
+    Sessions are kept in LRU order and dropped when idle for longer than
+    `idle_ttl_seconds`, or when the session count or the total size of all
+    histories exceeds its cap. Each history is capped in messages and bytes.
+    """
+
+    def __init__(
+        self,
+        idle_ttl_seconds: float = 3600,
+        max_messages: int = 40,
+        max_bytes: int = 256 * 1024,
+        max_sessions: int = 10000,
+        max_total_bytes: int = 64 * 1024 * 1024,
+    ):
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        self.max_sessions = max_sessions
+        self.max_total_bytes = max_total_bytes
+        self._sessions = OrderedDict()  # session_id -> (last_access, history, size in bytes)
+        self._total_bytes = 0
+        self._counters = {"evicted_idle": 0, "evicted_lru": 0, "trimmed_messages": 0}
+
+    async def get_history(self, session_id: str) -> List[str]:
+        """
+        Alternating user/assistant messages for the session, oldest first.
+        """
+        self._expire_idle()
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return []
+        _, history, size = entry
+        self._sessions[session_id] = (time.monotonic(), history, size)
+        self._sessions.move_to_end(session_id)
+        return list(history)
+
+    async def append(self, session_id: str, *messages: str):
+        """
+        Add messages to the session's history, trimming and evicting as needed.
+        """
+        _, history, size = self._sessions.pop(session_id, (None, [], 0))
+        self._total_bytes -= size
+
+        history.extend(messages)
+        before = len(history)
+        _trim_history(history, self.max_messages, self.max_bytes)
+        self._counters["trimmed_messages"] += before - len(history)
+        size = sum(_message_bytes(message) for message in history)
+
+        self._sessions[session_id] = (time.monotonic(), history, size)
+        self._total_bytes += size
+        self._expire_idle()
+        while len(self._sessions) > 1 and (
+            len(self._sessions) > self.max_sessions or self._total_bytes > self.max_total_bytes
+        ):
+            self._evict_oldest()
+            self._counters["evicted_lru"] += 1
+
+    async def delete(self, session_id: str):
+        _, _, size = self._sessions.pop(session_id, (None, [], 0))
+        self._total_bytes -= size
+
+    def _evict_oldest(self):
+        _, (_, _, size) = self._sessions.popitem(last=False)
+        self._total_bytes -= size
+
+    def _expire_idle(self):
+        # LRU order is also idle order, so expired sessions are at the front
+        cutoff = time.monotonic() - self.idle_ttl_seconds
+        while self._sessions:
+            last_access = next(iter(self._sessions.values()))[0]
+            if last_access >= cutoff:
+                break
+            self._evict_oldest()
+            self._counters["evicted_idle"] += 1
+
+    async def close(self):
+        self._sessions.clear()
+        self._total_bytes = 0
+
+    async def stats(self) -> Dict[str, Any]:
+        self._expire_idle()
+        return {
+            "backend": "memory",
+            **self._counters,
+            "sessions": len(self._sessions),
+            "total_bytes": self._total_bytes,
+            "max_sessions": self.max_sessions,
+            "max_total_bytes": self.max_total_bytes,
+        }
+
+
+class RedisSessionStore:
+    """
+    Chat histories in Redis, shared by every worker.
+
+    Each session is a Redis list whose expiry is refreshed on every access,
+    which gives the idle TTL. Per-session caps are enforced on write. Global
+    LRU eviction is left to the server's maxmemory-policy (e.g. allkeys-lru).
+    """
+
+    def __init__(
+        self,
+        url: str,
+        key_prefix: str = "mentormind:session:",
+        idle_ttl_seconds: float = 3600,
+        max_messages: int = 40,
+        max_bytes: int = 256 * 1024,
+    ):
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(url, decode_responses=True)
+        self.key_prefix = key_prefix
+        self.idle_ttl_seconds = int(idle_ttl_seconds)
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        self._counters = {"trimmed_messages": 0}
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.key_prefix}{session_id}"
+
+    async def get_history(self, session_id: str) -> List[str]:
+        key = self._key(session_id)
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.lrange(key, 0, -1)
+            pipe.expire(key, self.idle_ttl_seconds)
+            history, _ = await pipe.execute()
+        return history
+
+    async def append(self, session_id: str, *messages: str):
+        key = self._key(session_id)
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.rpush(key, *messages)
+            pipe.lrange(key, 0, -1)
+            _, history = await pipe.execute()
+
+        before = len(history)
+        _trim_history(history, self.max_messages, self.max_bytes)
+        dropped = before - len(history)
+        async with self._redis.pipeline(transaction=True) as pipe:
+            if dropped:
+                # Drop from the front by count, so turns appended concurrently are kept
+                pipe.ltrim(key, dropped, -1)
+            pipe.expire(key, self.idle_ttl_seconds)
+            await pipe.execute()
+        self._counters["trimmed_messages"] += dropped
+
+    async def delete(self, session_id: str):
+        await self._redis.delete(self._key(session_id))
+
+    async def stats(self) -> Dict[str, Any]:
+        memory = await self._redis.info("memory")
+        return {
+            "backend": "redis",
+            **self._counters,
+            "used_memory_bytes": memory.get("used_memory"),
+            "maxmemory_policy": memory.get("maxmemory_policy"),
+        }
+
+    async def close(self):
+        await self._redis.close()
+
+
+def create_session_store():
+    """
+    Build the session store selected by SESSION_BACKEND, falling back to
+    the in-memory store when the redis package is not installed.
+    """
+    if SESSION_BACKEND == "redis":
+        try:
+            return RedisSessionStore(
+                SESSION_REDIS_URL,
+                key_prefix=SESSION_KEY_PREFIX,
+                idle_ttl_seconds=SESSION_IDLE_TTL_SECONDS,
+                max_messages=SESSION_MAX_MESSAGES,
+                max_bytes=SESSION_MAX_BYTES,
+            )
+        except ImportError:
+            print("Warning: redis package not installed, keeping chat sessions in memory")
+    return InMemorySessionStore(
+        idle_ttl_seconds=SESSION_IDLE_TTL_SECONDS,
+        max_messages=SESSION_MAX_MESSAGES,
+        max_bytes=SESSION_MAX_BYTES,
+        max_sessions=SESSION_MAX_SESSIONS,
+        max_total_bytes=SESSION_MAX_TOTAL_BYTES,
+    )
+
+
+# Shared instance used by main.py's chat endpoints
+session_store = create_session_store()
@@ -0,0 +1,301 @@
+import asyncio
+import os
+import time
+from json.encoder import encode_basestring
+from typing import Any, AsyncIterator, Dict, Optional
+
+from dotenv import load_dotenv
+
+from context_budget import count_tokens
+
+# Load environment variables
+load_dotenv()
+
+# Idle streams get an SSE comment this often so proxies keep the connection open
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+# How often a stream waiting on the model checks whether the client is still there
+SSE_DISCONNECT_POLL_SECONDS = float(os.getenv("SSE_DISCONNECT_POLL_SECONDS", "0.5"))
+# Chunk coalescing: frame size bounds and the longest a delta may wait in the buffer
+SSE_COALESCE_MIN_CHARS = int(os.getenv("SSE_COALESCE_MIN_CHARS", "10"))
+SSE_COALESCE_MAX_CHARS = int(os.getenv("SSE_COALESCE_MAX_CHARS", "512"))
+SSE_COALESCE_MAX_DELAY_MS = float(os.getenv("SSE_COALESCE_MAX_DELAY_MS", "200"))
+
+# Frames are sized to hold the text that arrives while this many frames drain
+DRAIN_HEADROOM = 2.0
+# Weight of the latest measurement in the moving average of frame drain time
+DRAIN_EWMA_ALPHA = 0.2
+
+# Comment frame, ignored by EventSource and by the frontend's stream reader
+HEARTBEAT_FRAME = ": keep-alive\n\n"
+DONE_FRAME = 'data: {"done": true}\n\n'
+# Response headers for event streams: no caching, no proxy buffering (nginx)
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def encode_chunk_frame(text: str) -> str:
+    """
+    SSE frame for {"chunk": text}, built around the C string escaper
+    instead of a json.dumps call per frame
+    """
+    return 'data: {"chunk": ' + encode_basestring(text) + '}\n\n'
+
+
+class CoalescingPolicy:
+    """
+    Decides when buffered deltas become a frame.
+
+    The first delta is sent on its own so time to first token is not held
+    back. After that, deltas are batched until the buffer reaches the
+    target size or its oldest delta has waited `max_delay_seconds`. The
+    target is the text that arrives while frames drain to the client, so a
+    fast client gets small, smooth frames and a slow one fewer, larger
+    frames instead of a backlog, bounded by min_chars and max_chars.
+    """
+
+    def __init__(self, min_chars: int = 10, max_chars: int = 512, max_delay_seconds: float = 0.2):
+        self.min_chars = min_chars
+        self.max_chars = max(min_chars, max_chars)
+        self.max_delay_seconds = max_delay_seconds
+
+    def target_chars(self, chars_per_second: float, drain_seconds: float) -> int:
+        target = chars_per_second * drain_seconds * DRAIN_HEADROOM
+        return int(min(self.max_chars, max(self.min_chars, target)))
+
+    def should_flush(
+        self,
+        frames_sent: int,
+        buffered_chars: int,
+        buffered_seconds: float,
+        chars_per_second: float,
+        drain_seconds: float,
+    ) -> bool:
+        if not buffered_chars:
+            return False
+        return (
+            frames_sent == 0
+            or buffered_seconds >= self.max_delay_seconds
+            or buffered_chars >= self.target_chars(chars_per_second, drain_seconds)
+        )
+
+
+class StreamRelay:
+    """
+    Relays model output to a server-sent event stream as pre-encoded frames.
+
+    The upstream stream is read in a task so the relay can keep an eye on
+    the client and the coalescing deadline while waiting for tokens: when
+    the client disconnects, the pending read is cancelled and the upstream
+    request closed straight away instead of generating into the void.
+
+    Tokens generated for and avoided by cancelled streams are counted, as
+    are time to first frame, gaps between frames and frames per response.
+    """
+
+    def __init__(
+        self,
+        policy: CoalescingPolicy,
+        heartbeat_seconds: float = 15,
+        poll_seconds: float = 0.5,
+    ):
+        self.policy = policy
+        self.heartbeat_seconds = heartbeat_seconds
+        self.poll_seconds = poll_seconds
+        self._active = 0
+        self._counters = {
+            "streams": 0,
+            "completed": 0,
+            "cancelled": 0,
+            "errors": 0,
+            "heartbeats": 0,
+            "tokens_streamed": 0,
+            "cancelled_tokens": 0,
+            "tokens_avoided": 0,
+        }
+        self._timing = {
+            "responses": 0,
+            "frames": 0,
+            "frame_chars": 0,
+            "ttft_seconds": 0.0,
+            "max_ttft_seconds": 0.0,
+            "gaps": 0,
+            "gap_seconds": 0.0,
+            "max_gap_seconds": 0.0,
+            "drain_seconds": 0.0,
+        }
+
+    async def frames(
+        self,
+        source: AsyncIterator[str],
+        request=None,
+        max_tokens: Optional[int] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Yield SSE frames for the deltas of `source`, coalesced per the
+        policy, plus heartbeat comments while the model is silent.
+
+        Stops early when `request` (a Starlette Request) reports that the
+        client disconnected, or when the consumer stops iterating. Either
+        way `source` is closed before this returns. The caller sends the
+        final done frame.
+        """
+        self._counters["streams"] += 1
+        self._active += 1
+        outcome = "completed"
+        parts = []
+        pending = None
+
+        started = last_frame = last_check = time.monotonic()
+        first_delta_at = None
+        received_chars = 0
+        buffer = []
+        buffered_chars = 0
+        buffered_since = started
+        drain = 0.0
+        timing = {"frames": 0, "chars": 0, "ttft": None, "gap_total": 0.0, "gap_max": 0.0, "drain_total": 0.0}
+        try:
+            while True:
+                if pending is None:
+                    pending = asyncio.ensure_future(source.__anext__())
+                timeout = self.poll_seconds
+                if buffer:
+                    deadline = buffered_since + self.policy.max_delay_seconds
+                    timeout = max(0.0, min(timeout, deadline - time.monotonic()))
+                await asyncio.wait({pending}, timeout=timeout)
+                now = time.monotonic()
+
+                if pending.done():
+                    try:
+                        delta = pending.result()
+                    except StopAsyncIteration:
+                        pending = None
+                        break
+                    pending = None
+                    parts.append(delta)
+                    if first_delta_at is None:
+                        first_delta_at = now
+                    if not buffer:
+                        buffered_since = now
+                    buffer.append(delta)
+                    buffered_chars += len(delta)
+                    received_chars += len(delta)
+
+                if request is not None and now - last_check >= self.poll_seconds:
+                    last_check = now
+                    if await request.is_disconnected():
+                        outcome = "cancelled"
+                        break
+
+                chars_per_second = received_chars / max(now - first_delta_at, 1e-3) if first_delta_at else 0.0
+                if self.policy.should_flush(timing["frames"], buffered_chars, now - buffered_since, chars_per_second, drain):
+                    text = "".join(buffer)
+                    buffer = []
+                    buffered_chars = 0
+                    self._frame_sent(timing, len(text), now, started, last_frame)
+                    last_frame = now
+                    # Keep reading upstream while the frame drains
+                    if pending is None:
+                        pending = asyncio.ensure_future(source.__anext__())
+                    sent = time.monotonic()
+                    yield encode_chunk_frame(text)
+                    # Time to resume is the time the server took to hand the frame to the client
+                    frame_drain = time.monotonic() - sent
+                    drain += DRAIN_EWMA_ALPHA * (frame_drain - drain)
+                    timing["drain_total"] += frame_drain
+                elif not buffer and now - last_frame >= self.heartbeat_seconds:
+                    self._counters["heartbeats"] += 1
+                    last_frame = now
+                    yield HEARTBEAT_FRAME
+
+            if buffer:
+                text = "".join(buffer)
+                now = time.monotonic()
+                self._frame_sent(timing, len(text), now, started, last_frame)
+                sent = time.monotonic()
+                yield encode_chunk_frame(text)
+                timing["drain_total"] += time.monotonic() - sent
+        except (asyncio.CancelledError, GeneratorExit):
+            # The server dropped the response or the consumer stopped reading
+            outcome = "cancelled"
+            raise
+        except Exception:
+            outcome = "errors"
+            raise
+        finally:
+            self._active -= 1
+            if pending is not None:
+                # Let the cancelled read unwind before closing the generator it is running in
+                pending.cancel()
+                await asyncio.gather(pending, return_exceptions=True)
+            await source.aclose()
+            self._record(outcome, count_tokens("".join(parts)), max_tokens, timing)
+
+    @staticmethod
+    def _frame_sent(timing: Dict[str, Any], chars: int, now: float, started: float, last_frame: float):
+        if timing["ttft"] is None:
+            timing["ttft"] = now - started
+        else:
+            gap = now - last_frame
+            timing["gap_total"] += gap
+            timing["gap_max"] = max(timing["gap_max"], gap)
+        timing["frames"] += 1
+        timing["chars"] += chars
+
+    def _record(self, outcome: str, tokens: int, max_tokens: Optional[int], timing: Dict[str, Any]):
+        self._counters[outcome] += 1
+        if outcome == "cancelled":
+            self._counters["cancelled_tokens"] += tokens
+            # Upper bound: the answer could have run to max_tokens
+            if max_tokens:
+                self._counters["tokens_avoided"] += max(0, max_tokens - tokens)
+        else:
+            self._counters["tokens_streamed"] += tokens
+
+        if timing["ttft"] is None:
+            return
+        totals = self._timing
+        totals["responses"] += 1
+        totals["frames"] += timing["frames"]
+        totals["frame_chars"] += timing["chars"]
+        totals["ttft_seconds"] += timing["ttft"]
+        totals["max_ttft_seconds"] = max(totals["max_ttft_seconds"], timing["ttft"])
+        totals["gaps"] += timing["frames"] - 1
+        totals["gap_seconds"] += timing["gap_total"]
+        totals["max_gap_seconds"] = max(totals["max_gap_seconds"], timing["gap_max"])
+        totals["drain_seconds"] += timing["drain_total"]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Stream outcomes, token counts and frame timing.
+        """
+        totals = self._timing
+        responses = totals["responses"]
+        frames = totals["frames"]
+        gaps = totals["gaps"]
+        return {
+            **self._counters,
+            "active": self._active,
+            "responses_with_frames": responses,
+            "frames": frames,
+            "avg_frames_per_response": round(frames / responses, 2) if responses else 0.0,
+            "avg_frame_chars": round(totals["frame_chars"] / frames, 1) if frames else 0.0,
+            "avg_ttft_ms": round(totals["ttft_seconds"] * 1000.0 / responses, 1) if responses else 0.0,
+            "max_ttft_ms": round(totals["max_ttft_seconds"] * 1000.0, 1),
+            "avg_gap_ms": round(totals["gap_seconds"] * 1000.0 / gaps, 1) if gaps else 0.0,
+            "max_gap_ms": round(totals["max_gap_seconds"] * 1000.0, 1),
+            "avg_drain_ms": round(totals["drain_seconds"] * 1000.0 / frames, 2) if frames else 0.0,
+            "coalesce_min_chars": self.policy.min_chars,
+            "coalesce_max_chars": self.policy.max_chars,
+            "coalesce_max_delay_ms": self.policy.max_delay_seconds * 1000.0,
+        }
+
+
+# Shared instance used by the streaming chat endpoints
+stream_relay = StreamRelay(
+    CoalescingPolicy(
+        min_chars=SSE_COALESCE_MIN_CHARS,
+        max_chars=SSE_COALESCE_MAX_CHARS,
+        max_delay_seconds=SSE_COALESCE_MAX_DELAY_MS / 1000.0,
+    ),
+    heartbeat_seconds=SSE_HEARTBEAT_SECONDS,
+    poll_seconds=SSE_DISCONNECT_POLL_SECONDS,
+)
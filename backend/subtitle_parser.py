@@ -0,0 +1,123 @@
+import html
+import io
+import re
+from collections import namedtuple
+from typing import Iterable, Iterator, List, Tuple, Union
+
+# A caption cue with start/end offsets in seconds
+Cue = namedtuple("Cue", ["start", "end", "text"])
+
+_TIMING_RE = re.compile(
+    r"(?:(\d+):)?(\d{1,2}):(\d{2})[.,](\d{1,3})\s*-->\s*(?:(\d+):)?(\d{1,2}):(\d{2})[.,](\d{1,3})"
+)
+_TAG_RE = re.compile(r"<[^>]*>")
+_SPACE_RE = re.compile(r"\s+")
+_SENTENCE_START_RE = re.compile(r"([.!?])\s*([a-z])")
+
+# How many trailing words of the previous caption are compared against a new line
+_OVERLAP_WINDOW = 24
+# Shorter overlaps are treated as coincidence rather than a rolling repeat
+_MIN_OVERLAP = 2
+
+
+def _seconds(hours, minutes, seconds, millis) -> float:
+    total = int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds) + int(millis.ljust(3, "0")) / 1000.0
+    return round(total, 3)
+
+
+def _clean_line(line: str) -> str:
+    line = _TAG_RE.sub("", line)
+    line = html.unescape(line)
+    return _SPACE_RE.sub(" ", line).strip()
+
+
+def iter_cues(source: Union[str, Iterable[str]]) -> Iterator[Cue]:
+    """
+    Parse WebVTT or SRT content in a single pass, yielding one Cue per caption
+    block with inline tags removed. Cue text keeps its lines separated by newlines.
+
+    `source` may be the whole file as a string or any iterable of lines.
+    """
+    lines = io.StringIO(source) if isinstance(source, str) else source
+
+    start = end = None
+    text_lines = []
+    for raw_line in lines:
+        # Only a truly empty line ends a cue; YouTube pads cues with lines holding a single space
+        is_blank = raw_line.rstrip("\r\n") == ""
+        line = raw_line.strip()
+
+        if start is None:
+            match = _TIMING_RE.search(line)
+            if match:
+                groups = match.groups()
+                start = _seconds(*groups[:4])
+                end = _seconds(*groups[4:])
+            # Headers, NOTE/STYLE blocks and SRT sequence numbers are skipped
+            continue
+
+        if not is_blank:
+            cleaned = _clean_line(line)
+            if cleaned:
+                text_lines.append(cleaned)
+            continue
+
+        # A blank line ends the cue
+        if text_lines:
+            yield Cue(start, end, "\n".join(text_lines))
+        start = end = None
+        text_lines = []
+
+    if start is not None and text_lines:
+        yield Cue(start, end, "\n".join(text_lines))
+
+
+def _strip_overlap(previous_words: List[str], words: List[str]) -> List[str]:
+    """
+    Drop the leading words of `words` that repeat the tail of `previous_words`.
+    """
+    longest = min(len(previous_words), len(words))
+    for size in range(longest, _MIN_OVERLAP - 1, -1):
+        if previous_words[-size:] == words[:size]:
+            return words[size:]
+    return words
+
+
+def dedupe_rolling_captions(cues: Iterable[Cue]) -> Iterator[Cue]:
+    """
+    Remove text repeated across overlapping cues, as in YouTube's rolling
+    auto-captions where every cue repeats the previous line before adding a
+    new one. Yields cues holding only their new text, with original timings.
+    """
+    previous_line = None
+    previous_words = []
+    for cue in cues:
+        new_words = []
+        for line in cue.text.split("\n"):
+            if line == previous_line:
+                continue
+            words = _strip_overlap(previous_words, line.split(" "))
+            previous_line = line
+            if not words:
+                continue
+            new_words.extend(words)
+            previous_words = (previous_words + words)[-_OVERLAP_WINDOW:]
+
+        if new_words:
+            yield Cue(cue.start, cue.end, " ".join(new_words))
+
+
+def assemble_transcript(cues: Iterable[Cue]) -> str:
+    """
+    Join cue texts into one transcript with sentence capitalization fixed up.
+    """
+    text = " ".join(cue.text.replace("\n", " ") for cue in cues)
+    return _SENTENCE_START_RE.sub(lambda m: m.group(1) + " " + m.group(2).upper(), text).strip()
+
+
+def parse_subtitles(source: Union[str, Iterable[str]]) -> Tuple[str, List[Cue]]:
+    """
+    Parse WebVTT/SRT content into (transcript, deduplicated cues).
+    """
+    cues = list(dedupe_rolling_captions(iter_cues(source)))
+    return assemble_transcript(cues), cues
@@ -0,0 +1,18 @@
+import os
+import sys
+import tempfile
+
+# Backend modules are flat and imported by name, as app.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep the shared store instances created at import time out of the working tree
+_cache_root = tempfile.mkdtemp(prefix="mentormind-tests-")
+os.environ.setdefault("RESPONSE_CACHE_DIR", os.path.join(_cache_root, "responses"))
+os.environ.setdefault("VECTOR_INDEX_DIR", os.path.join(_cache_root, "indexes"))
+os.environ.setdefault("DOCUMENT_STORE_PATH", os.path.join(_cache_root, "documents.sqlite3"))
+os.environ.setdefault("TRANSCRIPT_STORE_PATH", os.path.join(_cache_root, "transcripts.sqlite3"))
+os.environ.setdefault("AUDIO_CACHE_DIR", os.path.join(_cache_root, "audio"))
+
+# app.py refuses to import without these; tests never call the real services
+os.environ.setdefault("DEEPGRAM_API_KEY", "test-deepgram-key")
+os.environ.setdefault("SUPADATA_API_KEY", "test-supadata-key")
@@ -0,0 +1,12 @@
+from audio_segmenter import FALLBACK_CONTAINER_EXTENSION, container_extension
+
+
+def test_container_extension_keeps_recognised_audio_extensions():
+    assert container_extension("lecture.MP3", "application/octet-stream") == ".mp3"
+    assert container_extension("upload", "audio/mpeg") == ".mp3"
+
+
+def test_container_extension_falls_back_to_a_real_container():
+    assert container_extension(None, "application/octet-stream") == FALLBACK_CONTAINER_EXTENSION
+    assert container_extension("recording.bin", None) == FALLBACK_CONTAINER_EXTENSION
+    assert FALLBACK_CONTAINER_EXTENSION == ".mka"
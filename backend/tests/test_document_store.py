@@ -0,0 +1,57 @@
+import os
+
+from document_store import DocumentStore
+
+
+def _age(store, doc_id, seconds):
+    store._conn.execute(
+        "UPDATE documents SET last_used_at = last_used_at - ? WHERE doc_id = ?",
+        (seconds, doc_id),
+    )
+    store._conn.commit()
+    text, touched_at = store._memory[doc_id]
+    store._memory[doc_id] = (text, touched_at - seconds)
+
+
+def test_sweep_deletes_documents_that_are_never_read_again(tmp_path):
+    store = DocumentStore(os.path.join(str(tmp_path), "documents.sqlite3"), ttl_seconds=60, sweep_interval_seconds=3600)
+    stale = store.put("old transcript")
+    fresh = store.put("new transcript")
+    _age(store, stale, 120)
+
+    assert store.sweep() == 1
+
+    assert store.get(stale) is None
+    assert store.get(fresh) == "new transcript"
+    stats = store.stats()
+    assert stats["documents"] == 1
+    assert stats["swept_expired"] == 1
+    assert stats["memory_entries"] == 1
+
+
+def test_put_sweeps_once_the_interval_has_passed(tmp_path):
+    store = DocumentStore(os.path.join(str(tmp_path), "documents.sqlite3"), ttl_seconds=60, sweep_interval_seconds=3600)
+    stale = store.put("old transcript")
+    _age(store, stale, 120)
+
+    store.put("second transcript")
+    assert store.stats()["documents"] == 2
+
+    store._last_sweep = 0.0
+    store.put("third transcript")
+    assert store.stats()["documents"] == 2
+    assert store.stats()["swept_expired"] == 1
+
+
+def test_put_of_a_stored_document_does_not_rewrite_it(tmp_path):
+    path = os.path.join(str(tmp_path), "documents.sqlite3")
+    store = DocumentStore(path, sweep_interval_seconds=3600)
+    doc_id = store.put("a transcript")
+
+    # Not in memory, as after a restart
+    restarted = DocumentStore(path, sweep_interval_seconds=3600)
+    assert restarted.put("a transcript") == doc_id
+    assert restarted.put("a transcript") == doc_id
+
+    assert restarted.stats()["writes"] == 0
+    assert restarted.get(doc_id) == "a transcript"
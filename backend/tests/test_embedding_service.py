@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from embedding_service import EmbeddingService
+
+
+class RecordingService(EmbeddingService):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.batches = []
+
+    def _encode(self, texts):
+        self.batches.append(list(texts))
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+
+def test_queries_are_batched_ahead_of_a_bulk_index_build():
+    service = RecordingService(max_batch_size=4, max_wait_ms=5)
+
+    async def scenario():
+        build = asyncio.ensure_future(service.embed([f"chunk {i}" for i in range(12)], bulk=True))
+        await asyncio.sleep(0)
+        query = await service.embed(["question"])
+        await build
+        return query
+
+    query = asyncio.run(scenario())
+
+    assert query.shape == (1, 4)
+    # The build enqueues one batch at a time, so the query rides in the second batch at the latest
+    position = next(i for i, batch in enumerate(service.batches) if "question" in batch)
+    assert position <= 1
+    assert all(len(batch) <= 4 for batch in service.batches)
+    assert sum(len(batch) for batch in service.batches) == 13
+    assert service.stats()["bulk_requests"] == 1
+
+
+class FailingService(RecordingService):
+    def _encode(self, texts):
+        if "bad" in texts:
+            raise ValueError("cannot encode")
+        return super()._encode(texts)
+
+
+def test_a_failing_batch_fails_only_its_own_callers():
+    service = FailingService(max_batch_size=4, max_wait_ms=0)
+
+    async def scenario():
+        with pytest.raises(ValueError):
+            await service.embed(["bad"])
+        # The worker survives and keeps serving
+        return await service.embed(["fine"])
+
+    assert asyncio.run(scenario()).shape == (1, 4)
+
+
+def test_restarting_a_dead_worker_fails_texts_queued_for_it():
+    service = RecordingService(max_batch_size=4, max_wait_ms=0)
+
+    async def scenario():
+        service._ensure_worker()
+        service._worker.cancel()
+        await asyncio.gather(service._worker, return_exceptions=True)
+        future = asyncio.get_running_loop().create_future()
+        service._queries.append(("orphan", future, 0.0))
+
+        vectors = await service.embed(["new"])
+        with pytest.raises(RuntimeError):
+            await future
+        return vectors
+
+    assert asyncio.run(scenario()).shape == (1, 4)
@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+from map_reduce import bounded_map, group_by_budget, reduce_to_fit
+
+
+def _words(text):
+    return len(text.split())
+
+
+def test_group_by_budget_keeps_groups_within_the_budget():
+    parts = ["a b c", "d e", "f g h i", "j"]
+
+    groups = group_by_budget(parts, max_tokens=5, count_tokens=_words)
+
+    assert groups == [["a b c", "d e"], ["f g h i", "j"]]
+
+
+def test_reduce_to_fit_recurses_until_the_combined_partials_fit():
+    notes = [" ".join(f"n{i}w{j}" for j in range(10)) for i in range(8)]
+    reduced_groups = []
+
+    async def reduce_group(group):
+        reduced_groups.append(len(group))
+        # Each reduction is as long as one note, so one level is not enough
+        return " ".join(f"r{len(reduced_groups)}w{j}" for j in range(10))
+
+    partials, levels = asyncio.run(
+        reduce_to_fit(notes, reduce_group, " ".join, max_tokens=25, count_tokens=_words)
+    )
+
+    assert levels == 2
+    # 8 notes -> 4 summaries of two notes -> 2 summaries of two summaries
+    assert reduced_groups == [2, 2, 2, 2, 2, 2]
+    assert len(partials) == 2
+    assert _words(" ".join(partials)) <= 25
+
+
+def test_reduce_to_fit_leaves_partials_that_already_fit():
+    async def reduce_group(group):
+        raise AssertionError("nothing to reduce")
+
+    partials, levels = asyncio.run(
+        reduce_to_fit(["a b", "c d"], reduce_group, " ".join, max_tokens=10, count_tokens=_words)
+    )
+
+    assert partials == ["a b", "c d"]
+    assert levels == 0
+
+
+def test_bounded_map_cancels_running_calls_when_one_fails():
+    finished = []
+    cancelled = []
+
+    async def call(index, delay):
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            cancelled.append(index)
+            raise
+        if index == 0:
+            raise RuntimeError("segment failed")
+        finished.append(index)
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            await bounded_map([0.01, 10, 10], call, max_concurrency=3)
+        # Every call has stopped by the time the error reaches the caller
+        return [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+
+    leftover = asyncio.run(scenario())
+
+    assert leftover == []
+    assert sorted(cancelled) == [1, 2]
+    assert finished == []
@@ -0,0 +1,57 @@
+import asyncio
+import json
+
+import pytest
+
+app = pytest.importorskip("app")
+
+QUESTION = {"question": "What is discussed?", "options": ["A", "B", "C", "D"], "correct_answer": 1}
+
+
+@pytest.fixture
+def model(monkeypatch):
+    calls = {"stream": None, "json": {"questions": [QUESTION]}, "json_calls": 0}
+
+    async def stream_chat_completion(**kwargs):
+        for delta in calls["stream"]:
+            yield delta
+
+    async def chat_completion(**kwargs):
+        calls["json_calls"] += 1
+        return json.dumps(calls["json"])
+
+    monkeypatch.setattr(app.llm_gateway, "is_available", lambda: True)
+    monkeypatch.setattr(app.llm_gateway, "stream_chat_completion", stream_chat_completion)
+    monkeypatch.setattr(app.llm_gateway, "chat_completion", chat_completion)
+    return calls
+
+
+async def _collect(transcript, num_questions=1):
+    return [question async for question in app.stream_quiz_questions(transcript, num_questions)]
+
+
+def test_prose_output_falls_back_to_json_mode(model):
+    model["stream"] = ["Sure! Here are some ", "questions about the lecture."]
+
+    questions = asyncio.run(_collect("a transcript answered in prose"))
+
+    assert questions == [QUESTION]
+    assert model["json_calls"] == 1
+
+
+def test_unterminated_array_falls_back_to_json_mode(model):
+    model["stream"] = ['[{"question": "What is', ' discussed?", "options": ["A", "B"']
+
+    questions = asyncio.run(_collect("a transcript cut off mid question"))
+
+    assert questions == [QUESTION]
+    assert model["json_calls"] == 1
+
+
+def test_streamed_questions_do_not_fall_back(model):
+    model["stream"] = [json.dumps([QUESTION])[:30], json.dumps([QUESTION])[30:]]
+
+    questions = asyncio.run(_collect("a transcript with a streamed quiz"))
+
+    assert questions == [QUESTION]
+    assert model["json_calls"] == 0
@@ -0,0 +1,76 @@
+import asyncio
+import os
+import time
+
+from response_cache import ResponseCache
+
+
+def _age(cache, key, seconds):
+    path = cache._path(key)
+    old = time.time() - seconds
+    os.utime(path, (old, old))
+
+
+def test_sweep_removes_expired_entries_that_are_never_read(tmp_path):
+    cache = ResponseCache(str(tmp_path), ttl_seconds=60, sweep_interval_seconds=3600)
+    asyncio.run(cache.set("stale", "old value"))
+    asyncio.run(cache.set("fresh", "new value"))
+    _age(cache, "stale", 120)
+
+    cache.sweep()
+
+    assert not os.path.exists(cache._path("stale"))
+    assert os.path.exists(cache._path("fresh"))
+    assert cache.stats()["swept_expired"] == 1
+    assert cache.stats()["disk_entries"] == 1
+
+
+def test_sweep_evicts_oldest_files_past_the_entry_cap(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_disk_entries=2, sweep_interval_seconds=3600)
+    for i, key in enumerate(["a", "b", "c"]):
+        asyncio.run(cache.set(key, key))
+        _age(cache, key, 30 - i)
+
+    cache.sweep()
+
+    assert not os.path.exists(cache._path("a"))
+    assert os.path.exists(cache._path("b"))
+    assert os.path.exists(cache._path("c"))
+    assert cache.stats()["swept_evicted"] == 1
+
+
+def test_sweep_evicts_past_the_byte_cap(tmp_path):
+    cache = ResponseCache(str(tmp_path), sweep_interval_seconds=3600)
+    asyncio.run(cache.set("a", "x" * 1000))
+    _age(cache, "a", 10)
+    asyncio.run(cache.set("b", "y" * 1000))
+    cache.max_disk_bytes = 1500
+
+    cache.sweep()
+
+    assert not os.path.exists(cache._path("a"))
+    assert os.path.exists(cache._path("b"))
+
+
+def test_set_sweeps_once_the_interval_has_passed(tmp_path):
+    cache = ResponseCache(str(tmp_path), ttl_seconds=60, sweep_interval_seconds=0)
+    asyncio.run(cache.set("stale", "old value"))
+    _age(cache, "stale", 120)
+
+    async def write_and_wait_for_sweep():
+        await cache.set("fresh", "new value")
+        # The sweep runs in the background, off the request path
+        await cache._sweep_task
+
+    asyncio.run(write_and_wait_for_sweep())
+
+    assert not os.path.exists(cache._path("stale"))
+
+
+def test_get_reads_entries_back_from_disk(tmp_path):
+    cache = ResponseCache(str(tmp_path), sweep_interval_seconds=3600)
+    asyncio.run(cache.set("key", {"summary": "text"}))
+    cache._memory.clear()
+
+    assert asyncio.run(cache.get("key")) == {"summary": "text"}
+    assert cache.stats()["disk_hits"] == 1
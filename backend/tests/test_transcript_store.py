@@ -0,0 +1,28 @@
+import os
+
+from transcript_store import TranscriptStore
+
+
+def _store(tmp_path):
+    return TranscriptStore(os.path.join(str(tmp_path), "transcripts.sqlite3"))
+
+
+def test_find_returns_the_resolved_language_when_no_english_track_is_stored(tmp_path):
+    store = _store(tmp_path)
+    store.put("video", "Bonjour à tous", provider="youtube_data_api", lang="fr")
+
+    stored = store.find("video")
+
+    assert stored["transcript"] == "Bonjour à tous"
+    assert stored["lang"] == "fr"
+    assert store.get("video") is None
+
+
+def test_find_prefers_english(tmp_path):
+    store = _store(tmp_path)
+    store.put("video", "Bonjour", provider="youtube_data_api", lang="fr")
+    store.put("video", "Hello", provider="youtube_transcript_api", lang="en")
+    store.put("other", "Hallo", provider="youtube_data_api", lang="de")
+
+    assert store.find("video")["lang"] == "en"
+    assert store.find("missing") is None
@@ -0,0 +1,71 @@
+import asyncio
+
+import httpx
+import pytest
+
+app = pytest.importorskip("app")
+
+from audio_segmenter import Segment
+from deepgram_client import DeepgramError
+
+
+def _failure(cause):
+    try:
+        raise app.HTTPException(status_code=500, detail="Error during transcription") from cause
+    except app.HTTPException as e:
+        return e
+
+
+def test_transport_errors_and_server_errors_are_transient():
+    assert app.is_transient_transcription_error(_failure(DeepgramError("timed out", retryable=True)))
+    assert app.is_transient_transcription_error(_failure(httpx.ReadTimeout("timed out")))
+
+
+def test_rejected_requests_are_not_retried():
+    assert not app.is_transient_transcription_error(_failure(DeepgramError("Deepgram returned 400: bad audio")))
+    assert not app.is_transient_transcription_error(_failure(ValueError("unexpected")))
+
+
+def _chunked_run(monkeypatch, tmp_path, failures):
+    """
+    Transcribe a one-segment recording whose attempts raise `failures` in turn
+    """
+    segment = Segment(0, str(tmp_path / "segment_0.mka"), 0.0, 10.0)
+    open(segment.path, "wb").close()
+    attempts = []
+
+    async def split_on_silence(source_path, workdir):
+        return [segment]
+
+    async def transcribe_audio(segment_file, content_type):
+        attempts.append(segment_file.name)
+        if len(attempts) <= len(failures):
+            raise app.HTTPException(status_code=500, detail="failed") from failures[len(attempts) - 1]
+        return {"transcript": "hello", "sentences": []}
+
+    async def no_backoff(_):
+        pass
+
+    monkeypatch.setattr(app, "split_on_silence", split_on_silence)
+    monkeypatch.setattr(app, "transcribe_audio", transcribe_audio)
+    monkeypatch.setattr(app.asyncio, "sleep", no_backoff)
+
+    with open(segment.path, "rb") as audio:
+        try:
+            return asyncio.run(app.transcribe_audio_chunked(audio, "audio/mpeg", "lecture.mp3")), len(attempts)
+        except app.HTTPException:
+            return None, len(attempts)
+
+
+def test_chunked_transcription_retries_transient_failures(monkeypatch, tmp_path):
+    result, attempts = _chunked_run(monkeypatch, tmp_path, [httpx.ConnectError("connection reset")])
+
+    assert result["transcript"] == "hello"
+    assert attempts == 2
+
+
+def test_chunked_transcription_does_not_retry_rejected_audio(monkeypatch, tmp_path):
+    result, attempts = _chunked_run(monkeypatch, tmp_path, [DeepgramError("Deepgram returned 400: bad audio")])
+
+    assert result is None
+    assert attempts == 1
@@ -0,0 +1,51 @@
+import asyncio
+import hashlib
+
+import pytest
+
+upload_spool = pytest.importorskip("upload_spool")
+
+BOUNDARY = "testboundary"
+AUDIO = bytes(range(256)) * 64
+
+
+def _body():
+    return (
+        f"--{BOUNDARY}\r\n"
+        'Content-Disposition: form-data; name="note"\r\n\r\n'
+        "not the file\r\n"
+        f"--{BOUNDARY}\r\n"
+        'Content-Disposition: form-data; name="file"; filename="lecture.mp3"\r\n'
+        "Content-Type: audio/mpeg\r\n\r\n"
+    ).encode() + AUDIO + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+async def _chunks(data, size=1000):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def test_spool_multipart_file_hashes_the_file_part_while_spooling():
+    async def scenario():
+        spool, filename, content_type = await upload_spool.spool_multipart_file(
+            _chunks(_body()), f"multipart/form-data; boundary={BOUNDARY}"
+        )
+        try:
+            return spool.digest, spool.size, spool.file.read(), filename, content_type
+        finally:
+            spool.close()
+
+    digest, size, content, filename, content_type = asyncio.run(scenario())
+
+    assert content == AUDIO
+    assert size == len(AUDIO)
+    assert digest == hashlib.sha256(AUDIO).hexdigest()
+    assert filename == "lecture.mp3"
+    assert content_type == "audio/mpeg"
+
+
+def test_spool_multipart_file_rejects_a_body_without_the_file_field():
+    body = f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="note"\r\n\r\nhi\r\n--{BOUNDARY}--\r\n'.encode()
+
+    with pytest.raises(ValueError):
+        asyncio.run(upload_spool.spool_multipart_file(_chunks(body), f"multipart/form-data; boundary={BOUNDARY}"))
@@ -0,0 +1,51 @@
+import os
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from vector_index import VectorIndex, VectorIndexStore
+
+
+def _index(chunks=2):
+    embeddings = [[float(i), 1.0] for i in range(chunks)]
+    texts = [f"chunk {i}" for i in range(chunks)]
+    return VectorIndex.build(embeddings, texts, [(i, i + 1) for i in range(chunks)])
+
+
+def _age(store, doc_id, seconds):
+    old = time.time() - seconds
+    os.utime(store._path(doc_id), (old, old))
+
+
+def test_sweep_removes_indexes_unused_past_the_ttl(tmp_path):
+    store = VectorIndexStore(str(tmp_path), ttl_seconds=60, sweep_interval_seconds=3600)
+    store.put("stale", _index())
+    store.put("fresh", _index())
+    _age(store, "stale", 120)
+
+    store.sweep()
+
+    assert not os.path.exists(store._path("stale"))
+    assert store.get("stale") is None
+    assert store.get("fresh") is not None
+    assert store.stats()["swept_expired"] == 1
+
+
+def test_sweep_evicts_least_recently_used_indexes_past_the_byte_cap(tmp_path):
+    store = VectorIndexStore(str(tmp_path), sweep_interval_seconds=3600)
+    for i, doc_id in enumerate(["a", "b", "c"]):
+        store.put(doc_id, _index())
+        _age(store, doc_id, 30 - i)
+    # Reading "a" makes it the most recently used
+    assert store.get("a") is not None
+    size = sum(entry.stat().st_size for entry in os.scandir(store._path("a")))
+    store.max_disk_bytes = size * 2
+
+    store.sweep()
+
+    assert os.path.exists(store._path("a"))
+    assert not os.path.exists(store._path("b"))
+    assert os.path.exists(store._path("c"))
+    assert store.stats()["swept_evicted"] == 1
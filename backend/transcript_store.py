@@ -0,0 +1,143 @@
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, Optional, Sequence
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+TRANSCRIPT_STORE_PATH = os.getenv("TRANSCRIPT_STORE_PATH", os.path.join("cache", "transcripts.sqlite3"))
+TRANSCRIPT_STORE_TTL_SECONDS = float(os.getenv("TRANSCRIPT_STORE_TTL_SECONDS", str(30 * 24 * 3600)))
+
+
+class TranscriptStore:
+    """
+    SQLite-backed store of YouTube transcripts keyed by (video_id, lang).
+
+    Transcripts are zlib-compressed, tagged with the provider they came from
+    and expire after `ttl_seconds`. Shared by every YouTube ingest path.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float = 30 * 24 * 3600):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "expired": 0, "writes": 0}
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS transcripts (
+                    video_id TEXT NOT NULL,
+                    lang TEXT NOT NULL,
+                    provider TEXT NOT NULL,
+                    title TEXT,
+                    content BLOB NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (video_id, lang)
+                )
+                """
+            )
+            self._conn.commit()
+
+    def get(self, video_id: str, lang: str = "en") -> Optional[Dict[str, Any]]:
+        """
+        Return {"transcript", "title", "provider", "created_at"} or None.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT provider, title, content, created_at FROM transcripts WHERE video_id = ? AND lang = ?",
+                (video_id, lang),
+            ).fetchone()
+
+            if row is None:
+                self._counters["misses"] += 1
+                return None
+
+            provider, title, content, created_at = row
+            if created_at + self.ttl_seconds <= time.time():
+                self._conn.execute(
+                    "DELETE FROM transcripts WHERE video_id = ? AND lang = ?",
+                    (video_id, lang),
+                )
+                self._conn.commit()
+                self._counters["expired"] += 1
+                self._counters["misses"] += 1
+                return None
+
+            self._counters["hits"] += 1
+
+        return {
+            "transcript": zlib.decompress(content).decode("utf-8"),
+            "title": title,
+            "provider": provider,
+            "created_at": created_at,
+        }
+
+    def find(self, video_id: str, preferred_langs: Sequence[str] = ("en",)) -> Optional[Dict[str, Any]]:
+        """
+        Return the stored transcript in the first of `preferred_langs` that is
+        stored, else in the most recently stored language, with its "lang"
+        added. For ingest paths that fall back to whatever track a video has.
+        """
+        with self._lock:
+            langs = [row[0] for row in self._conn.execute(
+                "SELECT lang FROM transcripts WHERE video_id = ? ORDER BY created_at DESC",
+                (video_id,),
+            )]
+        if not langs:
+            with self._lock:
+                self._counters["misses"] += 1
+            return None
+
+        lang = next((lang for lang in preferred_langs if lang in langs), langs[0])
+        stored = self.get(video_id, lang)
+        if stored is not None:
+            stored["lang"] = lang
+        return stored
+
+    def put(self, video_id: str, transcript: str, provider: str, lang: str = "en", title: Optional[str] = None):
+        """
+        Store or replace the transcript for (video_id, lang).
+        """
+        content = zlib.compress(transcript.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO transcripts (video_id, lang, provider, title, content, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (video_id, lang, provider, title, content, time.time()),
+            )
+            self._conn.commit()
+            self._counters["writes"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Hit/miss counters, row count and compressed size per provider.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT provider, COUNT(*), SUM(LENGTH(content)) FROM transcripts GROUP BY provider"
+            ).fetchall()
+            counters = dict(self._counters)
+
+        lookups = counters["hits"] + counters["misses"]
+        counters["hit_rate"] = round(counters["hits"] / lookups, 4) if lookups else 0.0
+        counters["providers"] = {
+            provider: {"entries": count, "compressed_bytes": size or 0}
+            for provider, count, size in rows
+        }
+        counters["entries"] = sum(count for _, count, _ in rows)
+        return counters
+
+
+# Shared instance used by the YouTube endpoints in app.py and main.py
+transcript_store = TranscriptStore(TRANSCRIPT_STORE_PATH, ttl_seconds=TRANSCRIPT_STORE_TTL_SECONDS)
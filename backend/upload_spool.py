@@ -0,0 +1,160 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+from typing import AsyncIterator, Optional, Tuple
+
+from dotenv import load_dotenv
+
+try:
+    import python_multipart as multipart
+    from python_multipart.multipart import parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    import multipart
+    from multipart.multipart import parse_options_header
+
+# Load environment variables
+load_dotenv()
+
+# Uploads up to this size stay in memory; larger ones spill to a temp file
+UPLOAD_SPOOL_MAX_MEMORY_BYTES = int(os.getenv("UPLOAD_SPOOL_MAX_MEMORY_BYTES", str(32 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(256 * 1024)))
+
+
+def is_on_disk(fileobj) -> bool:
+    """
+    True unless `fileobj` is a SpooledTemporaryFile still held in memory.
+    """
+    return bool(getattr(fileobj, "_rolled", True))
+
+
+class UploadSpool:
+    """
+    Buffer for a streamed upload that stays in memory up to
+    `max_memory_bytes` and spills to an anonymous temp file beyond that.
+    A SHA-256 of the content is computed as the chunks arrive.
+    """
+
+    def __init__(self, max_memory_bytes: int = UPLOAD_SPOOL_MAX_MEMORY_BYTES):
+        self.file = tempfile.SpooledTemporaryFile(max_size=max_memory_bytes)
+        self.size = 0
+        self._sha256 = hashlib.sha256()
+
+    @property
+    def digest(self) -> str:
+        return self._sha256.hexdigest()
+
+    @property
+    def on_disk(self) -> bool:
+        return is_on_disk(self.file)
+
+    async def write(self, chunk: bytes):
+        if self.on_disk:
+            await asyncio.to_thread(self.file.write, chunk)
+        else:
+            self.file.write(chunk)
+        self._sha256.update(chunk)
+        self.size += len(chunk)
+
+    def rewind(self):
+        self.file.seek(0)
+
+    def close(self):
+        self.file.close()
+
+
+async def iter_file(fileobj, chunk_size: int = UPLOAD_CHUNK_BYTES) -> AsyncIterator[bytes]:
+    """
+    Read a file object in chunks without blocking the event loop on disk reads.
+    """
+    on_disk = is_on_disk(fileobj)
+    while True:
+        chunk = await asyncio.to_thread(fileobj.read, chunk_size) if on_disk else fileobj.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+async def spool_multipart_file(
+    chunks: AsyncIterator[bytes],
+    content_type: str,
+    field_name: str = "file",
+) -> Tuple[UploadSpool, str, Optional[str]]:
+    """
+    Spool the `field_name` file of a multipart/form-data body as the body
+    streams in, so it is hashed in the same pass instead of being read back
+    after the form parser has spooled it. Other fields are discarded.
+
+    Returns (spool, filename, content type of the file part). Raises
+    ValueError when the body is malformed or has no such file field.
+    """
+    _, options = parse_options_header(content_type)
+    boundary = options.get(b"boundary")
+    if not boundary:
+        raise ValueError("Missing multipart boundary")
+
+    part = {"headers": {}, "field": b"", "value": b"", "wanted": False}
+    found = {}
+    pending = []
+
+    def on_part_begin():
+        part["headers"] = {}
+        part["wanted"] = False
+
+    def on_header_field(data, start, end):
+        part["field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        part["value"] += data[start:end]
+
+    def on_header_end():
+        part["headers"][part["field"].lower()] = part["value"]
+        part["field"] = b""
+        part["value"] = b""
+
+    def on_headers_finished():
+        _, disposition = parse_options_header(part["headers"].get(b"content-disposition", b""))
+        if disposition.get(b"name") == field_name.encode() and b"filename" in disposition and not found:
+            part["wanted"] = True
+            found["filename"] = disposition[b"filename"].decode("utf-8", "replace")
+            found["content_type"] = part["headers"].get(b"content-type", b"").decode("latin-1") or None
+
+    def on_part_data(data, start, end):
+        if part["wanted"]:
+            pending.append(data[start:end])
+
+    parser = multipart.MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+    })
+    spool = UploadSpool()
+    try:
+        async for chunk in chunks:
+            parser.write(chunk)
+            # The parser's callbacks are synchronous, so its output is spooled between chunks
+            for data in pending:
+                await spool.write(data)
+            pending.clear()
+        parser.finalize()
+        if not found:
+            raise ValueError(f"No {field_name!r} file in the upload")
+    except BaseException:
+        spool.close()
+        raise
+    spool.rewind()
+    return spool, found["filename"], found["content_type"]
+
+
+def file_size(fileobj) -> int:
+    """
+    Size of a seekable file object, leaving its position unchanged.
+    """
+    position = fileobj.tell()
+    fileobj.seek(0, os.SEEK_END)
+    size = fileobj.tell()
+    fileobj.seek(position)
+    return size
@@ -0,0 +1,261 @@
+import json
+import os
+import shutil
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", os.path.join("cache", "indexes"))
+VECTOR_INDEX_MAX_LOADED = int(os.getenv("VECTOR_INDEX_MAX_LOADED", "64"))
+# Indexes unused for this long are deleted from disk
+VECTOR_INDEX_TTL_SECONDS = float(os.getenv("VECTOR_INDEX_TTL_SECONDS", str(30 * 24 * 3600)))
+# Least recently used indexes are deleted while the directory is larger than this
+VECTOR_INDEX_MAX_DISK_BYTES = int(os.getenv("VECTOR_INDEX_MAX_DISK_BYTES", str(1024 * 1024 * 1024)))
+VECTOR_INDEX_SWEEP_INTERVAL_SECONDS = float(os.getenv("VECTOR_INDEX_SWEEP_INTERVAL_SECONDS", "600"))
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """
+    Return a C-contiguous float32 copy of `vectors` with unit-length rows.
+    """
+    vectors = np.array(vectors, dtype=np.float32, order="C", ndmin=2)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    vectors /= norms
+    return vectors
+
+
+class VectorIndex:
+    """
+    Cosine-similarity index over the chunks of a single document.
+
+    Vectors are stored pre-normalized in one contiguous float32 matrix, so a
+    query is a single matrix multiply followed by an argpartition. `spans`
+    optionally holds each chunk's (start, end) offsets in the source document.
+    """
+
+    def __init__(self, vectors: np.ndarray, chunks: List[str], spans: Optional[np.ndarray] = None):
+        if len(vectors) != len(chunks):
+            raise ValueError("Number of vectors and chunks must match")
+        if spans is not None and len(spans) != len(chunks):
+            raise ValueError("Number of spans and chunks must match")
+        self.vectors = vectors
+        self.chunks = chunks
+        self.spans = spans
+
+    @classmethod
+    def build(
+        cls,
+        embeddings: np.ndarray,
+        chunks: List[str],
+        spans: Optional[List[Tuple[int, int]]] = None,
+    ) -> "VectorIndex":
+        if spans is not None:
+            spans = np.array(spans, dtype=np.int64).reshape(-1, 2)
+        return cls(normalize_rows(embeddings), list(chunks), spans)
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def search_batch(self, queries: np.ndarray, top_k: int = 3) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score many queries at once.
+
+        Returns (indices, scores), each of shape (num_queries, k), ordered by
+        descending similarity, where k = min(top_k, len(self)).
+        """
+        queries = normalize_rows(queries)
+        k = min(top_k, len(self))
+        if k <= 0:
+            empty = np.zeros((len(queries), 0))
+            return empty.astype(np.int64), empty.astype(np.float32)
+
+        scores = queries @ self.vectors.T
+        if k < scores.shape[1]:
+            candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            candidates = np.tile(np.arange(scores.shape[1]), (len(queries), 1))
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1)
+        return (
+            np.take_along_axis(candidates, order, axis=1),
+            np.take_along_axis(candidate_scores, order, axis=1),
+        )
+
+    def search(self, query: np.ndarray, top_k: int = 3) -> List[Tuple[int, float]]:
+        """
+        Return [(chunk_index, score), ...] for a single query vector.
+        """
+        indices, scores = self.search_batch(query, top_k)
+        return [(int(i), float(s)) for i, s in zip(indices[0], scores[0])]
+
+    def save(self, directory: str):
+        """
+        Write the index to `directory` as vectors.npy plus chunks.json,
+        and spans.npy when chunk offsets are known.
+        """
+        tmp_directory = f"{directory}.tmp"
+        os.makedirs(tmp_directory, exist_ok=True)
+        np.save(os.path.join(tmp_directory, "vectors.npy"), self.vectors)
+        if self.spans is not None:
+            np.save(os.path.join(tmp_directory, "spans.npy"), self.spans)
+        with open(os.path.join(tmp_directory, "chunks.json"), "w", encoding="utf-8") as f:
+            json.dump(self.chunks, f, ensure_ascii=False)
+        if os.path.isdir(directory):
+            shutil.rmtree(directory)
+        os.replace(tmp_directory, directory)
+
+    @classmethod
+    def load(cls, directory: str) -> "VectorIndex":
+        """
+        Load an index saved with save(); the vectors are memory-mapped read-only.
+        """
+        vectors = np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r")
+        with open(os.path.join(directory, "chunks.json"), "r", encoding="utf-8") as f:
+            chunks = json.load(f)
+        spans_path = os.path.join(directory, "spans.npy")
+        spans = np.load(spans_path) if os.path.exists(spans_path) else None
+        return cls(vectors, chunks, spans)
+
+
+class VectorIndexStore:
+    """
+    Per-document indexes keyed by document ID, kept on disk and with the most
+    recently used ones held in memory.
+
+    An index directory's mtime records its last use. Writes trigger a sweep,
+    at most every `sweep_interval_seconds`, that deletes indexes unused for
+    `ttl_seconds` and then the least recently used ones while the store is
+    over `max_disk_bytes`.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_loaded: int = 64,
+        ttl_seconds: float = 30 * 24 * 3600,
+        max_disk_bytes: int = 1024 * 1024 * 1024,
+        sweep_interval_seconds: float = 600,
+    ):
+        self.directory = directory
+        self.max_loaded = max_loaded
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_bytes = max_disk_bytes
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self._last_sweep = 0.0
+        self._counters = {"swept_expired": 0, "swept_evicted": 0}
+        self._disk = {"indexes": 0, "bytes": 0}
+        self._loaded = OrderedDict()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, doc_id: str) -> str:
+        return os.path.join(self.directory, doc_id)
+
+    def get(self, doc_id: str) -> Optional[VectorIndex]:
+        index = self._loaded.get(doc_id)
+        if index is not None:
+            self._loaded.move_to_end(doc_id)
+            self._touch(doc_id)
+            return index
+
+        path = self._path(doc_id)
+        if not os.path.isdir(path):
+            return None
+        try:
+            index = VectorIndex.load(path)
+        except (OSError, ValueError) as e:
+            print(f"Warning: could not load vector index {doc_id}: {e}")
+            return None
+        self._touch(doc_id)
+        self._remember(doc_id, index)
+        return index
+
+    def put(self, doc_id: str, index: VectorIndex):
+        try:
+            index.save(self._path(doc_id))
+        except OSError as e:
+            print(f"Warning: could not save vector index {doc_id}: {e}")
+        self._remember(doc_id, index)
+
+        if time.time() - self._last_sweep >= self.sweep_interval_seconds:
+            self.sweep()
+
+    def _touch(self, doc_id: str):
+        try:
+            os.utime(self._path(doc_id))
+        except OSError:
+            pass
+
+    def sweep(self):
+        """
+        Delete expired indexes and interrupted writes, then the least
+        recently used indexes while the store is over its byte cap.
+        """
+        now = time.time()
+        self._last_sweep = now
+        indexes = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if not os.path.isdir(path):
+                continue
+            try:
+                last_used = os.stat(path).st_mtime
+                size = sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+            except OSError:
+                continue
+            if name.endswith(".tmp"):
+                if last_used + self.sweep_interval_seconds <= now:
+                    shutil.rmtree(path, ignore_errors=True)
+                continue
+            if last_used + self.ttl_seconds <= now:
+                self._delete(name)
+                self._counters["swept_expired"] += 1
+                continue
+            indexes.append((last_used, size, name))
+
+        indexes.sort()
+        total_bytes = sum(size for _, size, _ in indexes)
+        evict = 0
+        while evict < len(indexes) and total_bytes > self.max_disk_bytes:
+            _, size, name = indexes[evict]
+            self._delete(name)
+            total_bytes -= size
+            evict += 1
+        self._counters["swept_evicted"] += evict
+        self._disk = {"indexes": len(indexes) - evict, "bytes": total_bytes}
+
+    def _delete(self, doc_id: str):
+        self._loaded.pop(doc_id, None)
+        shutil.rmtree(self._path(doc_id), ignore_errors=True)
+
+    def _remember(self, doc_id: str, index: VectorIndex):
+        self._loaded[doc_id] = index
+        self._loaded.move_to_end(doc_id)
+        while len(self._loaded) > self.max_loaded:
+            self._loaded.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._counters,
+            "loaded": len(self._loaded),
+            # As of the last sweep
+            "disk_indexes": self._disk["indexes"],
+            "disk_bytes": self._disk["bytes"],
+            "max_disk_bytes": self.max_disk_bytes,
+        }
+
+
+# Shared instance used by the retrieval helpers
+vector_index_store = VectorIndexStore(
+    VECTOR_INDEX_DIR,
+    max_loaded=VECTOR_INDEX_MAX_LOADED,
+    ttl_seconds=VECTOR_INDEX_TTL_SECONDS,
+    max_disk_bytes=VECTOR_INDEX_MAX_DISK_BYTES,
+    sweep_interval_seconds=VECTOR_INDEX_SWEEP_INTERVAL_SECONDS,
+)
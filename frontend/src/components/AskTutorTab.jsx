@@ -235,7 +235,10 @@ export default function AskTutorTab({ data }) {
 						role: msg.role,
 						content: msg.content,
 					})),
-					transcript: data.transcription,
+					// Refer to the registered transcript instead of resending it every turn
+					...(data.documentId
+						? { document_id: data.documentId }
+						: { transcript: data.transcription }),
 				}),
 				signal: abortControllerRef.current.signal,
 			});
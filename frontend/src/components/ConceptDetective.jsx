@@ -73,7 +73,9 @@ export default function ConceptDetective({ data }) {
 						"Content-Type": "application/json",
 					},
 					body: JSON.stringify({
-						transcript: data.transcription,
+						...(data.documentId
+							? { document_id: data.documentId }
+							: { transcript: data.transcription }),
 					}),
 				}
 			);
@@ -287,7 +289,9 @@ export default function ConceptDetective({ data }) {
 						"Content-Type": "application/json",
 					},
 					body: JSON.stringify({
-						transcript: data.transcription,
+						...(data.documentId
+							? { document_id: data.documentId }
+							: { transcript: data.transcription }),
 						answers: gameData.levels[levelIndex].questions.map(
 							(_, questionIndex) => ({
 								levelIndex,
@@ -16,6 +16,8 @@ export default function Dashboard() {
 	const [activeTab, setActiveTab] = useState("transcription");
 	const [outputData, setOutputData] = useState({
 		transcription: "",
+		// Server-side handle for the transcript, sent instead of the full text
+		documentId: null,
 		sentences: [],
 		summary: "",
 		questions: [],
@@ -75,6 +77,10 @@ export default function Dashboard() {
 		setOutputData((prev) => ({
 			...prev,
 			transcription: transcriptionData.transcription,
+			documentId:
+				transcriptionData.transcription === prev.transcription
+					? prev.documentId
+					: null,
 			sentences: transcriptionData.sentences,
 			audioUrl: transcriptionData.audioUrl,
 			loading: transcriptionData.loading,
@@ -82,6 +88,87 @@ export default function Dashboard() {
 		}));
 	}, [transcriptionData]);
 
+	// Read a server-sent event stream, calling onEvent with each parsed payload
+	const readEventStream = async (response, onEvent) => {
+		const reader = response.body.getReader();
+		const decoder = new TextDecoder();
+		let buffer = "";
+
+		while (true) {
+			const { done, value } = await reader.read();
+			if (done) break;
+
+			buffer += decoder.decode(value, { stream: true });
+			const events = buffer.split("\n\n");
+			buffer = events.pop();
+
+			for (const event of events) {
+				if (!event.startsWith("data: ")) continue;
+				onEvent(JSON.parse(event.substring(6)));
+			}
+		}
+	};
+
+	// Generate summary and quiz in one request; the backend runs them in
+	// parallel and streams each result as a server-sent event when it is ready
+	const analyzeTranscript = async (transcript) => {
+		const response = await fetch(
+			`${process.env.NEXT_PUBLIC_API_URL}/api/analyze`,
+			{
+				method: "POST",
+				headers: {
+					"Content-Type": "application/json",
+				},
+				body: JSON.stringify({
+					transcript,
+					num_questions: 5, // Request 5 questions
+				}),
+			}
+		);
+
+		if (!response.ok) {
+			setOutputData((prev) => ({
+				...prev,
+				summary: "Failed to generate summary",
+				loading: false,
+			}));
+			return;
+		}
+
+		setOutputData((prev) => ({ ...prev, summary: "", questions: [] }));
+		await readEventStream(response, (data) => {
+			if (data.type === "document" || data.type === "transcript") {
+				setOutputData((prev) => ({ ...prev, documentId: data.document_id }));
+			} else if (data.type === "summary_delta") {
+				setOutputData((prev) => ({
+					...prev,
+					summary: (prev.summary || "") + data.delta,
+				}));
+			} else if (data.type === "summary") {
+				setOutputData((prev) => ({ ...prev, summary: data.summary }));
+			} else if (data.type === "quiz_question") {
+				// Show each question as soon as it is generated
+				setOutputData((prev) => {
+					const questions = (prev.questions || []).slice(0, data.index);
+					questions[data.index] = data.question;
+					return { ...prev, questions };
+				});
+			} else if (data.type === "quiz") {
+				setOutputData((prev) => ({ ...prev, questions: data.questions }));
+			} else if (data.type === "error") {
+				console.error(`Error generating ${data.stage}:`, data.error);
+				if (data.stage === "summary") {
+					setOutputData((prev) => ({
+						...prev,
+						summary: "Failed to generate summary",
+					}));
+				}
+			}
+		});
+
+		setOutputData((prev) => ({ ...prev, loading: false }));
+	};
+
 	const handleProcessContent = async (data) => {
 		// Close sidebar on mobile after processing
 		if (window.innerWidth < 768) {
@@ -99,64 +186,15 @@ export default function Dashboard() {
 
 				// If successful, generate summary and quiz
 				if (result) {
-					// Call backend to generate summary
-					const summaryResponse = await fetch(
-						`${process.env.NEXT_PUBLIC_API_URL}/api/generate-summary`,
-						{
-							method: "POST",
-							headers: {
-								"Content-Type": "application/json",
-							},
-							body: JSON.stringify({
-								transcript: result.transcription,
-							}),
-						}
-					);
-
-					let summary = "";
-					if (summaryResponse.ok) {
-						const summaryData = await summaryResponse.json();
-						summary = summaryData.success
-							? summaryData.summary
-							: "Failed to generate summary";
-					}
-
-					// Call backend to generate quiz questions
-					const quizResponse = await fetch(
-						`${process.env.NEXT_PUBLIC_API_URL}/api/generate-quiz`,
-						{
-							method: "POST",
-							headers: {
-								"Content-Type": "application/json",
-							},
-							body: JSON.stringify({
-								transcript: result.transcription,
-								num_questions: 5, // Request 5 questions
-							}),
-						}
-					);
-
-					let questions = [];
-					if (quizResponse.ok) {
-						const quizData = await quizResponse.json();
-						questions = quizData.success ? quizData.questions : [];
-					}
-
-					// Update output data with all information
-					setOutputData((prev) => ({
-						...prev,
-						summary,
-						questions,
-						loading: false,
-					}));
+					await analyzeTranscript(result.transcription);
 				}
 			} else if (data.type === "pdf") {
 				const formData = new FormData();
 				formData.append("file", data.file);
 
-				// Make the API call
+				// Stream extraction progress, the summary as it is written, then the quiz
 				const response = await fetch(
-					`${process.env.NEXT_PUBLIC_API_URL}/api/process-pdf`,
+					`${process.env.NEXT_PUBLIC_API_URL}/api/process-pdf-stream`,
 					{
 						method: "POST",
 						body: formData, // Send as FormData
@@ -168,23 +206,29 @@ export default function Dashboard() {
 					throw new Error(errorData.detail || "Failed to process PDF");
 				}
 
-				const result = await response.json();
+				setOutputData((prev) => ({ ...prev, summary: "", questions: [] }));
+				await readEventStream(response, (data) => {
+					if (data.type === "transcript") {
+						setOutputData((prev) => ({
+							...prev,
+							transcription: data.transcript,
+							documentId: data.document_id,
+						}));
+					} else if (data.type === "summary_delta") {
+						setOutputData((prev) => ({
+							...prev,
+							summary: (prev.summary || "") + data.delta,
+						}));
+					} else if (data.type === "summary") {
+						setOutputData((prev) => ({ ...prev, summary: data.summary }));
+					} else if (data.type === "quiz") {
+						setOutputData((prev) => ({ ...prev, questions: data.questions }));
+					} else if (data.type === "error") {
+						console.error(`Error processing PDF (${data.stage}):`, data.error);
+					}
+				});
 
-				let summary = "";
-				let questions = [];
-				let transcription = "";
-				if (result.success) {
-					summary = result.summary;
-					questions = result.questions;
-					transcription = result.transcript;
-				}
-				setOutputData((prev) => ({
-					...prev,
-					summary: summary,
-					questions: questions,
-					transcription: transcription,
-					loading: false,
-				}));
+				setOutputData((prev) => ({ ...prev, loading: false }));
 			} else if (data.type === "youtube") {
 				// Handle YouTube URL
 				const youtubeResponse = await fetch(
@@ -215,61 +259,13 @@ export default function Dashboard() {
 					setOutputData((prev) => ({
 						...prev,
 						transcription: youtubeData.transcription,
+						documentId: null, // Set from the analyze stream
 						sentences: [], // No sentences/timestamps for YouTube
 						videoTitle: youtubeData.video_title,
 						loading: true, // Still loading until summary and quiz are done
 					}));
 
-					// Call backend to generate summary
-					const summaryResponse = await fetch(
-						`${process.env.NEXT_PUBLIC_API_URL}/api/generate-summary`,
-						{
-							method: "POST",
-							headers: {
-								"Content-Type": "application/json",
-							},
-							body: JSON.stringify({
-								transcript: youtubeData.transcription,
-							}),
-						}
-					);
-
-					let summary = "";
-					if (summaryResponse.ok) {
-						const summaryData = await summaryResponse.json();
-						summary = summaryData.success
-							? summaryData.summary
-							: "Failed to generate summary";
-					}
-
-					// Call backend to generate quiz questions
-					const quizResponse = await fetch(
-						`${process.env.NEXT_PUBLIC_API_URL}/api/generate-quiz`,
-						{
-							method: "POST",
-							headers: {
-								"Content-Type": "application/json",
-							},
-							body: JSON.stringify({
-								transcript: youtubeData.transcription,
-								num_questions: 5, // Request 5 questions
-							}),
-						}
-					);
-
-					let questions = [];
-					if (quizResponse.ok) {
-						const quizData = await quizResponse.json();
-						questions = quizData.success ? quizData.questions : [];
-					}
-
-					// Update output data with all information
-					setOutputData((prev) => ({
-						...prev,
-						summary,
-						questions,
-						loading: false,
-					}));
+					await analyzeTranscript(youtubeData.transcription);
 				}
 			}
 		} catch (error) {
@@ -145,8 +145,8 @@ export default function QuizTab({ data }) {
 		);
 	};
 
-	// Loading state
-	if (data.loading) {
+	// Loading state, until the first question has streamed in
+	if (data.loading && !data.questions?.length) {
 		return (
 			<div className='flex flex-col items-center justify-center h-full'>
 				<LoadingSteps currentStep={loadingStep} />
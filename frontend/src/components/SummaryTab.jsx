@@ -178,7 +178,8 @@ export default function SummaryTab({ data }) {
 		return () => clearInterval(interval);
 	}, []);
 
-	if (data.loading) {
+	// Keep the loader until the first part of the summary has streamed in
+	if (data.loading && !data.summary) {
 		return (
 			<div className='flex flex-col items-center justify-center h-full'>
 				<LoadingSteps currentStep={loadingStep} />